@@ -0,0 +1,98 @@
+"""
+Benchmark: bulk status vs the per-subject status path
+
+Seeds a throwaway database with many dogs, then times computing every dog's
+LED status two ways:
+  per-subject  a last-event query + calculate_average_interval per dog and
+               event type (2 queries each, N x 4 round trips)
+  bulk         compute_bulk_status: one grouped query + one NumPy pass
+
+Run from the PooMasterBackend directory:
+    python benchmarks/bulk_status.py --dogs 1000 --events-per-dog 60
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+def seed_database(db_path, dogs, events_per_dog):
+    now = int(time.time())
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO dogs (household_id, name) VALUES (1, ?)",
+                     ((f"dog-{index}",) for index in range(dogs - 1)))
+    dog_ids = [row[0] for row in conn.execute("SELECT id FROM dogs")]
+    rows = []
+    for dog_id in dog_ids:
+        for event_type, spacing in (("pee", 4 * 3600), ("poo", 12 * 3600)):
+            timestamp = now - random.randint(0, spacing)
+            for _ in range(events_per_dog // 2):
+                rows.append((dog_id, event_type, timestamp))
+                timestamp -= int(spacing * random.uniform(0.7, 1.3))
+    conn.executemany("INSERT INTO events (dog_id, event_type, timestamp) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return dog_ids
+
+
+def last_event_time(main, event_type, dog_id):
+    with main.get_db() as conn:
+        row = conn.execute("SELECT MAX(timestamp) FROM events WHERE dog_id = ? AND event_type = ?",
+                           (dog_id, event_type)).fetchone()
+    return row[0]
+
+
+def per_subject(main, dog_ids):
+    statuses = []
+    for dog_id in dog_ids:
+        for event_type in ("pee", "poo"):
+            last_event = last_event_time(main, event_type, dog_id)
+            average = main.calculate_average_interval(event_type, main.STATS_WINDOW_DAYS, dog_id)
+            if last_event is None:
+                statuses.append({"r": 255, "g": 0, "b": 0})
+                continue
+            percentage = (time.time() - last_event) / 3600 / average * 100
+            statuses.append(main.calculate_led_color(percentage))
+    return statuses
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dogs", type=int, default=500)
+    parser.add_argument("--events-per-dog", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.setdefault("LOG_FILE", os.path.join(workdir, "bench.log"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+
+    main.init_db()
+    dog_ids = seed_database(main.DB_PATH, args.dogs, args.events_per_dog)
+    print(f"Seeded {len(dog_ids)} dogs x {args.events_per_dog} events")
+
+    subject_time = best_of(lambda: per_subject(main, dog_ids), args.repeat)
+    bulk_time = best_of(lambda: main.compute_bulk_status(dog_ids), args.repeat)
+
+    print(f"per-subject  {subject_time * 1000:9.2f} ms  ({subject_time * 1e6 / len(dog_ids):7.1f} us/dog)")
+    print(f"bulk         {bulk_time * 1000:9.2f} ms  ({bulk_time * 1e6 / len(dog_ids):7.1f} us/dog)")
+    print(f"speedup      {subject_time / bulk_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
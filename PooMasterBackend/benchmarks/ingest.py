@@ -0,0 +1,123 @@
+"""
+Benchmark: event ingest throughput, per-request commit vs the ingest journal
+
+Starts the app in a fresh interpreter per configuration and has --clients
+concurrent devices POST single events to /api/v1/events as fast as they get
+answers, for --seconds. Reports acknowledged events/s, p50/p99 time to
+acknowledgement, and for the journal how many events went into each fsync
+and each SQLite transaction.
+
+  direct          INSERT + commit per request (DB_SYNCHRONOUS=NORMAL, the default)
+  direct full     same with DB_SYNCHRONOUS=FULL, a real fsync per commit
+  journal         journal append + fsync per group, group-committed to SQLite
+  journal nosync  journal without fsync (INGEST_FSYNC=false)
+
+Requires httpx (pip install httpx). Run from the PooMasterBackend directory:
+    python benchmarks/ingest.py --clients 64 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATIONS = [
+    ("direct", {"INGEST_MODE": "direct"}),
+    ("direct full", {"INGEST_MODE": "direct", "DB_SYNCHRONOUS": "FULL"}),
+    ("journal", {"INGEST_MODE": "journal"}),
+    ("journal nosync", {"INGEST_MODE": "journal", "INGEST_FSYNC": "false"}),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def device(client, number, deadline, latencies):
+    sequence = 0
+    while time.perf_counter() < deadline:
+        sequence += 1
+        start = time.perf_counter()
+        response = await client.post("/api/v1/events", json={
+            "event_type": "pee" if sequence % 3 else "poo",
+            "device_id": f"bench-{number}",
+            "sequence": sequence
+        })
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def child(clients, seconds):
+    import httpx
+    import main
+
+    await main.startup_event()
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        deadline = start + seconds
+        await asyncio.gather(*(device(client, number, deadline, latencies) for number in range(clients)))
+        elapsed = time.perf_counter() - start
+    ingest = main.ingest_journal.stats()
+    await main.shutdown_event()
+
+    with main.get_db() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    print(json.dumps({
+        "events_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "acknowledged": len(latencies),
+        "stored": stored,
+        "per_fsync": ingest["written"] / ingest["fsyncs"] if ingest["fsyncs"] else None,
+        "per_commit": ingest["avg_batch"] or None,
+    }))
+
+
+def run_configuration(overrides, args):
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    env = dict(os.environ, DB_PATH=os.path.join(workdir, "bench.db"), LOG_FILE=os.path.join(workdir, "bench.log"),
+               INGEST_JOURNAL_PATH=os.path.join(workdir, "ingest.journal"), LOG_LEVEL="WARNING", **overrides)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--clients", str(args.clients),
+         "--seconds", str(args.seconds)],
+        env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent devices posting events")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per configuration")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, BACKEND_DIR)
+        asyncio.run(child(args.clients, args.seconds))
+        return
+
+    print(f"{args.clients} clients, {args.seconds:g}s per configuration\n")
+    print(f"{'configuration':<16} {'events/s':>9} {'p50':>9} {'p99':>9} {'per fsync':>10} {'per commit':>11}")
+    for label, overrides in CONFIGURATIONS:
+        result = run_configuration(overrides, args)
+        if result["stored"] != result["acknowledged"]:
+            print(f"{label}: {result['acknowledged']} acknowledged but {result['stored']} stored", file=sys.stderr)
+        per_fsync = f"{result['per_fsync']:.1f}" if result["per_fsync"] else "-"
+        per_commit = f"{result['per_commit']:.1f}" if result["per_commit"] else "-"
+        print(f"{label:<16} {result['events_per_second']:9.0f} {result['p50_ms']:7.2f}ms {result['p99_ms']:7.2f}ms "
+              f"{per_fsync:>10} {per_commit:>11}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,370 @@
+"""
+Load test: throughput and latency per endpoint under a simulated fleet
+
+Seeds synthetic databases (10k, 1M or 10M events spread over many dogs),
+then drives the app with concurrent clients:
+  pollers     ESP32 devices polling /api/v1/status for one dog each
+  loggers     devices posting /api/v1/events with device_id/sequence keys
+  dashboards  browsers reading /api/v1/history and /api/v1/analytics
+
+Each run reports req/s and p50/p95/p99 latency per endpoint, either
+in-process (httpx ASGITransport, no network) or through a local uvicorn
+server, and the results are written as JSON so runs can be compared:
+
+    python benchmarks/load_test.py --sizes 10k 1m --mode both
+    python benchmarks/load_test.py --sizes 1m --compare benchmarks/results/old.json
+
+Seeded databases are cached in --seed-dir and copied for each run, so the
+10m seed (several minutes) only has to be built once.
+
+Requires httpx and uvicorn. Run from the PooMasterBackend directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SEED_CHUNK = 100_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ----- seeding -----
+
+def seed_database(main, db_path, event_count, dogs, history_days):
+    """Create the schema with the app's migrations, bulk-insert events, then build the rollups"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    main.run_migrations(conn)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    conn.executemany("INSERT INTO dogs (household_id, name) VALUES (1, ?)",
+                     ((f"bench-dog-{index}",) for index in range(dogs - 1)))
+    dog_ids = [row[0] for row in conn.execute("SELECT id FROM dogs ORDER BY id")]
+
+    now = int(time.time())
+    start = now - history_days * 86400
+    remaining = event_count
+    while remaining:
+        chunk = min(SEED_CHUNK, remaining)
+        conn.executemany(
+            "INSERT INTO events (dog_id, event_type, timestamp) VALUES (?, ?, ?)",
+            ((random.choice(dog_ids), "pee" if random.random() < 0.75 else "poo", random.randint(start, now))
+             for _ in range(chunk))
+        )
+        conn.commit()
+        remaining -= chunk
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    main._rebuild_rollups(cursor)
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return dog_ids
+
+
+def ensure_seed(main, args, size):
+    """Return (path, dog_ids, seconds spent seeding) for a cached seed database"""
+    events = SIZES[size]
+    path = os.path.join(args.seed_dir, f"seed-{size}-{args.dogs}dogs-{args.history_days}d-v{main.SCHEMA_VERSION}.db")
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        dog_ids = [row[0] for row in conn.execute("SELECT id FROM dogs ORDER BY id")]
+        conn.close()
+        return path, dog_ids, 0.0
+
+    print(f"Seeding {events:,} events for {args.dogs} dogs into {path} ...", flush=True)
+    started = time.perf_counter()
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    dog_ids = seed_database(main, partial, events, args.dogs, args.history_days)
+    os.replace(partial, path)
+    return path, dog_ids, time.perf_counter() - started
+
+
+# ----- workload -----
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, endpoint, elapsed, ok):
+        if ok:
+            self.samples.setdefault(endpoint, []).append(elapsed * 1000)
+        else:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        results = {}
+        for endpoint in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples.get(endpoint, [])
+            results[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "req_per_s": round(len(samples) / duration, 1),
+                "p50_ms": round(percentile(samples, 50), 3) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 3) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 3) if samples else None,
+                "max_ms": round(max(samples), 3) if samples else None
+            }
+        return results
+
+
+async def timed_request(client, recorder, endpoint, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        response, ok = None, False
+    recorder.add(endpoint, time.perf_counter() - start, ok)
+    return response
+
+
+async def poller(client, recorder, deadline, dog_id, interval, conditional):
+    etag = None
+    while time.perf_counter() < deadline:
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        response = await timed_request(client, recorder, "GET /api/v1/status", "GET", "/api/v1/status",
+                                       params={"dog_id": dog_id}, headers=headers)
+        if response is not None and response.status_code == 200:
+            etag = response.headers.get("etag")
+        await asyncio.sleep(interval)
+
+
+async def event_logger(client, recorder, deadline, dog_id, device, interval):
+    sequence = 0
+    while time.perf_counter() < deadline:
+        sequence += 1
+        await timed_request(client, recorder, "POST /api/v1/events", "POST", "/api/v1/events", json={
+            "event_type": random.choice(("pee", "poo")), "dog_id": dog_id,
+            "device_id": device, "sequence": sequence
+        })
+        await asyncio.sleep(interval)
+
+
+async def dashboard(client, recorder, deadline, dog_ids, interval):
+    while time.perf_counter() < deadline:
+        dog_id = random.choice(dog_ids)
+        await timed_request(client, recorder, "GET /api/v1/history", "GET", "/api/v1/history",
+                            params={"dog_id": dog_id, "days": 30, "limit": 100})
+        await timed_request(client, recorder, "GET /api/v1/analytics", "GET", "/api/v1/analytics",
+                            params={"dog_id": dog_id, "days": 30})
+        await asyncio.sleep(interval)
+
+
+async def drive(client, config):
+    """Run the mixed workload for config['duration'] seconds and summarize per endpoint"""
+    dog_ids = config["dog_ids"]
+    recorder = Recorder()
+
+    # Warm up: one status request per dog the pollers will use
+    poller_dogs = [dog_ids[index % len(dog_ids)] for index in range(config["pollers"])]
+    for dog_id in sorted(set(poller_dogs)):
+        await client.get("/api/v1/status", params={"dog_id": dog_id})
+
+    started = time.perf_counter()
+    deadline = started + config["duration"]
+    run_id = random.randrange(1 << 30)
+    await asyncio.gather(
+        *(poller(client, recorder, deadline, dog_id, config["poll_interval"], config["conditional"])
+          for dog_id in poller_dogs),
+        *(event_logger(client, recorder, deadline, random.choice(dog_ids), f"bench-{run_id}-{index}",
+                       config["log_interval"]) for index in range(config["loggers"])),
+        *(dashboard(client, recorder, deadline, dog_ids, config["dashboard_interval"])
+          for _ in range(config["dashboards"]))
+    )
+    return recorder.summary(time.perf_counter() - started)
+
+
+# ----- runners -----
+
+def run_inprocess(db_path, config, workdir):
+    """Run the workload against the ASGI app in a fresh interpreter"""
+    env = dict(os.environ, DB_PATH=db_path, LOG_FILE=os.path.join(workdir, "inprocess.log"), LOG_LEVEL="WARNING")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--inprocess-child", json.dumps(config)],
+        env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def inprocess_child(config):
+    import httpx
+    import main
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = await drive(client, config)
+    await main.shutdown_event()
+    print(json.dumps(results))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_uvicorn(db_path, config, workdir):
+    """Run the workload over HTTP against a local uvicorn server"""
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, DB_PATH=db_path, LOG_FILE=os.path.join(workdir, "uvicorn.log"), LOG_LEVEL="WARNING")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn did not become healthy")
+
+        async def go():
+            limits = httpx.Limits(max_connections=config["pollers"] + config["loggers"] + config["dashboards"])
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+                return await drive(client, config)
+
+        return asyncio.run(go())
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# ----- reporting -----
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(size, mode, results, baseline=None):
+    print(f"\n[{size} / {mode}]")
+    print(f"  {'endpoint':<24} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for endpoint, stats in results.items():
+        line = (f"  {endpoint:<24} {stats['req_per_s']:9.1f} {stats['p50_ms'] or 0:8.2f}ms "
+                f"{stats['p95_ms'] or 0:7.2f}ms {stats['p99_ms'] or 0:7.2f}ms {stats['errors']:7d}")
+        old = (baseline or {}).get(endpoint)
+        if old and old.get("p99_ms") and stats["p99_ms"]:
+            line += (f"   vs baseline: req/s {stats['req_per_s'] - old['req_per_s']:+.1f}, "
+                     f"p99 {(stats['p99_ms'] / old['p99_ms'] - 1) * 100:+.0f}%")
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["10k"], help="Seed sizes to run")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--dogs", type=int, default=100, help="Dogs the events are spread over")
+    parser.add_argument("--history-days", type=int, default=365, help="Days of history to spread events over")
+    parser.add_argument("--pollers", type=int, default=50, help="Simulated ESP32 status pollers")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Seconds between polls per device")
+    parser.add_argument("--conditional", action="store_true", help="Pollers send If-None-Match (304s)")
+    parser.add_argument("--loggers", type=int, default=5, help="Devices posting events")
+    parser.add_argument("--log-interval", type=float, default=0.5, help="Seconds between events per logger")
+    parser.add_argument("--dashboards", type=int, default=2, help="Clients reading history and analytics")
+    parser.add_argument("--dashboard-interval", type=float, default=0.5)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per run")
+    parser.add_argument("--seed-dir", default=os.path.join(tempfile.gettempdir(), "poomaster-seeds"))
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--inprocess-child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    if args.inprocess_child:
+        asyncio.run(inprocess_child(json.loads(args.inprocess_child)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.makedirs(args.seed_dir, exist_ok=True)
+    os.environ["DB_PATH"] = os.path.join(workdir, "unused.db")
+    os.environ["LOG_FILE"] = os.path.join(workdir, "seed.log")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    import main
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("inprocess_child", "output", "compare", "seed_dir")},
+        "runs": []
+    }
+
+    for size in args.sizes:
+        seed_path, dog_ids, seed_seconds = ensure_seed(main, args, size)
+        for mode in modes:
+            db_path = os.path.join(workdir, f"run-{size}-{mode}.db")
+            shutil.copyfile(seed_path, db_path)
+            config = {
+                "dog_ids": dog_ids, "duration": args.duration, "pollers": args.pollers,
+                "poll_interval": args.poll_interval, "conditional": args.conditional,
+                "loggers": args.loggers, "log_interval": args.log_interval,
+                "dashboards": args.dashboards, "dashboard_interval": args.dashboard_interval
+            }
+            runner = run_inprocess if mode == "inprocess" else run_uvicorn
+            results = runner(db_path, config, workdir)
+            os.remove(db_path)
+
+            previous = None
+            for run in (baseline or {}).get("runs", []):
+                if run["size"] == size and run["mode"] == mode:
+                    previous = run["endpoints"]
+            print_results(size, mode, results, previous)
+            report["runs"].append({"size": size, "events": SIZES[size], "mode": mode,
+                                   "seed_seconds": round(seed_seconds, 1), "endpoints": results})
+
+    output = args.output or os.path.join(BACKEND_DIR, "benchmarks", "results",
+                                         f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,107 @@
+"""
+Benchmark: what logging costs the code that logs
+
+Measures, in the calling thread, the time spent per log call and per
+request for the synchronous handlers (RotatingFileHandler + console written
+inline) versus the QueueHandler pipeline where a background thread does
+the formatting and disk writes. Console output goes to /dev/null so the
+numbers reflect the file handler, not the terminal.
+
+Requires httpx (pip install httpx). Run from the PooMasterBackend directory:
+    python benchmarks/logging_cost.py --calls 20000 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+MODES = [
+    ("sync text", {"LOG_ASYNC": False, "LOG_FORMAT": "text"}),
+    ("sync json", {"LOG_ASYNC": False, "LOG_FORMAT": "json"}),
+    ("async text", {"LOG_ASYNC": True, "LOG_FORMAT": "text"}),
+    ("async json", {"LOG_ASYNC": True, "LOG_FORMAT": "json"}),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure(main, overrides):
+    main.logging_pipeline.configure(main.config.current.model_copy(update=dict(overrides, LOG_LEVEL="INFO")))
+
+
+def bench_calls(main, calls):
+    """Mean microseconds per logger.info call as seen by the caller"""
+    logger = main.logger
+    start = time.perf_counter()
+    for i in range(calls):
+        logger.info(f"History request: dog_id=1, event_type=pee, days=7, limit={i}")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def drain(main):
+    """Wait for the writer thread to catch up so phases don't overlap"""
+    handler = main.logging_pipeline.handler
+    while handler is not None and handler.queue.qsize():
+        time.sleep(0.01)
+
+
+async def bench_requests(main, client, path, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def run(args):
+    import httpx
+    import main
+
+    await main.startup_event()
+    await main.run_db(main.insert_event, main.DEFAULT_DOG_ID, "pee", int(time.time()) - 3600)
+
+    print(f"{'mode':<12} {'per call':>10}   {'history p50':>12} {'p99':>9}   {'history mean':>12}")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, overrides in MODES:
+            configure(main, overrides)
+            per_call = bench_calls(main, args.calls)
+            drain(main)
+            # history logs two INFO lines per request
+            samples = await bench_requests(main, client, "/api/v1/history?limit=1", args.requests)
+            main.logging_pipeline.stop()
+            print(f"{label:<12} {per_call:8.2f}us   {percentile(samples, 50):10.1f}us "
+                  f"{percentile(samples, 99):7.1f}us   {statistics.mean(samples):10.1f}us")
+
+    configure(main, {})
+    await main.shutdown_event()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000, help="Direct logger.info calls per mode")
+    parser.add_argument("--requests", type=int, default=2000, help="History requests per mode")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ["LOG_FILE"] = os.path.join(workdir, "bench.log")
+    os.environ["LOG_QUEUE_SIZE"] = str(max(args.calls, args.requests * 4) + 1000)
+    sys.stderr = open(os.devnull, "w")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,112 @@
+"""
+Benchmark: how well each interval predictor anticipates the next event
+
+Generates a synthetic schedule (regular daytime intervals with jitter, one
+long overnight gap, occasional missed or extra trips), then walks it event
+by event. Before each event every predictor makes a prediction from the
+history so far, and we record:
+  mae          mean absolute error of the predicted interval (hours)
+  early alarm  share of intervals where the 90% alarm fired with more than
+               --early of the real interval still to go, i.e. the dog
+               was nowhere near due yet
+  update       mean microseconds per incremental state update
+
+"mean" is the sliding-window mean the server uses by default.
+
+Run from the PooMasterBackend directory:
+    python benchmarks/predictors.py --days 60 --seed 1
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def synthetic_schedule(days, day_interval, night_interval, seed):
+    """Event times (epoch seconds) over `days` days ending now"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    t = now - days * 86400
+    events = []
+    while t < now:
+        events.append(t)
+        hour = time.localtime(t).tm_hour
+        if hour >= 22 or hour < 6:
+            gap = night_interval
+        else:
+            gap = rng.gauss(day_interval, day_interval * 0.15)
+            if rng.random() < 0.05:
+                gap *= 2  # walk got skipped
+        t += int(max(0.5, gap) * 3600)
+    return events
+
+
+def evaluate(predict_next, events, early_fraction, threshold=0.9):
+    errors, early = [], 0
+    for previous, current in zip(events, events[1:]):
+        predicted = predict_next(previous)
+        actual = (current - previous) / 3600
+        errors.append(abs(predicted - actual))
+        if predicted * threshold < actual * (1 - early_fraction):
+            early += 1
+    return sum(errors) / len(errors), early / len(errors)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60, help="Days of synthetic history")
+    parser.add_argument("--day-interval", type=float, default=3.0, help="Typical daytime interval (hours)")
+    parser.add_argument("--night-interval", type=float, default=8.0, help="Overnight interval (hours)")
+    parser.add_argument("--early", type=float, default=0.2, help="Fraction of the interval left that makes an alarm early")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ["LOG_FILE"] = os.path.join(workdir, "bench.log")
+    sys.stderr = open(os.devnull, "w")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+
+    events = synthetic_schedule(args.days, args.day_interval, args.night_interval, args.seed)
+    default = args.day_interval
+    print(f"{len(events)} events over {args.days} days\n")
+    print(f"{'predictor':<12} {'mae':>7} {'early alarm':>12} {'update':>9}")
+
+    window = main.STATS_WINDOW_DAYS * 86400
+    seen = []
+
+    def window_mean(last):
+        start = bisect.bisect_left(seen, last - window)
+        inside = seen[start:]
+        return (inside[-1] - inside[0]) / 3600 / (len(inside) - 1) if len(inside) > 1 else default
+
+    def mean_next(previous):
+        seen.append(previous)
+        return window_mean(previous)
+
+    mae, early = evaluate(mean_next, events, args.early)
+    print(f"{'mean':<12} {mae:6.2f}h {early:11.1%} {'-':>9}")
+
+    current = main.config.current
+    for name in ("ewma", "median", "trimmed", "time_of_day"):
+        predictor = main.make_predictor(current.model_copy(update={"PREDICTOR": name}))
+        state = predictor.new_state()
+        timings = []
+
+        def predictor_next(previous):
+            start = time.perf_counter()
+            predictor.advance(state, previous)
+            timings.append(time.perf_counter() - start)
+            return predictor.estimate(state, previous, default)
+
+        mae, early = evaluate(predictor_next, events, args.early)
+        per_update = sum(timings) / len(timings) * 1e6
+        print(f"{name:<12} {mae:6.2f}h {early:11.1%} {per_update:7.2f}us")
+
+
+if __name__ == "__main__":
+    main_cli()
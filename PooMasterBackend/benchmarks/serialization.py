@@ -0,0 +1,187 @@
+"""
+Benchmark: response serialization, pre-encoded bytes vs FastAPI's generic path
+
+Part 1 times the encoding alone, in microseconds per payload:
+  model         pydantic validation / jsonable_encoder + JSONResponse.render
+                (what FastAPI does with a returned model or dict)
+  stdlib        json_bytes with the json module fallback
+  orjson        json_bytes with orjson (skipped when it is not installed)
+For the status and history payloads, "stdlib" and "orjson" are the same
+byte templates.
+
+Part 2 measures requests/s through the whole ASGI app for the real
+endpoints and for copies registered under /bench/generic that return the
+same data as a model or dict, so FastAPI validates and encodes it.
+
+Requires httpx (pip install httpx). Run from the PooMasterBackend directory:
+    python benchmarks/serialization.py --dogs 50 --seconds 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+
+def per_call(function, seconds=0.5):
+    """Mean microseconds per call over about `seconds`"""
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        function()
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def seed(main, dogs, days):
+    with main.get_db() as conn:
+        for dog_id in range(2, dogs + 1):
+            conn.execute("INSERT OR IGNORE INTO dogs (id, household_id, name) VALUES (?, 1, ?)", (dog_id, f"dog{dog_id}"))
+        conn.commit()
+    main.dog_registry.load()
+    rng = random.Random(1)
+    now = int(time.time())
+    rows = []
+    for dog_id in range(1, dogs + 1):
+        t = now - days * 86400
+        while t < now:
+            rows.append((dog_id, rng.choice(("pee", "pee", "poo")), t, f"collar-{dog_id}", None))
+            t += rng.randint(3600, 4 * 3600)
+    main.insert_events(rows)
+    main.insert_accidents([(1, "pee", now - day * 86400, "kitchen", "on the rug" if day % 2 else None)
+                           for day in range(days)])
+
+
+def as_dicts(main, rows, columns=None):
+    """Row tuples as the dicts the generic path hands to FastAPI"""
+    columns = columns or main.EVENT_COLUMNS
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encoders(main):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+    status = main.build_led_status(1)
+    fields = status.model_dump()
+    rows_100, rows_1000 = main.fetch_events(1, None, 0, 100)[0], main.fetch_events(1, None, 0, 1000)[0]
+    history_100 = {"events": as_dicts(main, rows_100), "count": 100, "next_cursor": None}
+    history_1000 = {"events": as_dicts(main, rows_1000), "count": 1000, "next_cursor": None}
+    bulk = main.compute_bulk_status(main.dog_registry.ids())
+
+    def generic(payload):
+        return lambda: JSONResponse(jsonable_encoder(payload)).body
+
+    cases = [
+        ("status", lambda: json.dumps(main.LEDStatus(**fields).model_dump(), separators=(",", ":")).encode(),
+         lambda: main.encode_status(main.LEDStatus.model_construct(**fields)), None),
+        ("history 100", generic(history_100), lambda: main.encode_page("events", main.encode_events(rows_100), None), None),
+        ("history 1000", generic(history_1000), lambda: main.encode_page("events", main.encode_events(rows_1000), None), None),
+        (f"bulk {bulk['count']} dogs", generic(bulk), bulk, bulk),
+    ]
+    print(f"{'payload':<16} {'model':>10} {'stdlib':>10} {'orjson':>10}")
+    for label, model_path, stdlib_payload, orjson_payload in cases:
+        model_us = per_call(model_path)
+        if callable(stdlib_payload):
+            stdlib_us = orjson_us = per_call(stdlib_payload)
+        else:
+            stdlib_us = per_call(lambda: main._stdlib_json_bytes(stdlib_payload))
+            orjson_us = per_call(lambda: orjson.dumps(orjson_payload)) if orjson is not None else None
+        orjson_text = f"{orjson_us:8.1f}us" if orjson_us is not None else f"{'-':>10}"
+        print(f"{label:<16} {model_us:8.1f}us {stdlib_us:8.1f}us {orjson_text}")
+
+
+def add_generic_routes(main):
+    """Copies of the hot endpoints that hand FastAPI a model or dict"""
+    app = main.app
+
+    # Same query parameters as the real route: FastAPI's per-parameter request cost isn't serialization
+    @app.get("/bench/generic/status", response_model=main.LEDStatus)
+    async def generic_status(dog_id: Optional[int] = None, wait: Optional[float] = None, since: Optional[int] = None):
+        return main.LEDStatus(**main.status_cache.get(dog_id or 1).status.model_dump())
+
+    @app.get("/bench/generic/history")
+    async def generic_history(event_type: Optional[str] = None, days: int = 7, limit: int = 100,
+                              cursor: Optional[str] = None, dog_id: Optional[int] = None):
+        events, next_cursor = await main.run_db(main.fetch_events, dog_id or 1, event_type, 0, limit)
+        events = as_dicts(main, events)
+        return {"events": events, "count": len(events), "next_cursor": next_cursor}
+
+    @app.get("/bench/generic/accidents")
+    async def generic_accidents(days: int = 7, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                dog_id: Optional[int] = None):
+        accidents, next_cursor = await main.run_db(main.fetch_accidents, dog_id or 1, 0)
+        accidents = as_dicts(main, accidents, main.ACCIDENT_COLUMNS)
+        return {"accidents": accidents, "count": len(accidents), "next_cursor": next_cursor}
+
+    @app.get("/bench/generic/status/bulk")
+    async def generic_bulk(dog_ids: Optional[str] = None, household_id: Optional[int] = None):
+        return await main.run_db(main.compute_bulk_status, main.dog_registry.ids())
+
+
+async def requests_per_second(client, path, seconds):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = await client.get(path)
+        response.raise_for_status()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+async def end_to_end(main, seconds):
+    import httpx
+
+    add_generic_routes(main)
+    endpoints = [
+        ("status", "/api/v1/status", "/bench/generic/status"),
+        ("history 100", "/api/v1/history?days=3650&limit=100", "/bench/generic/history?days=3650&limit=100"),
+        ("history 1000", "/api/v1/history?days=3650&limit=1000", "/bench/generic/history?days=3650&limit=1000"),
+        ("accidents", "/api/v1/accidents?days=3650", "/bench/generic/accidents?days=3650"),
+        ("bulk status", "/api/v1/status/bulk", "/bench/generic/status/bulk"),
+    ]
+    print(f"\n{'endpoint':<16} {'generic':>10} {'fast':>10} {'speedup':>8}")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, fast_path, generic_path in endpoints:
+            generic = await requests_per_second(client, generic_path, seconds)
+            fast = await requests_per_second(client, fast_path, seconds)
+            print(f"{label:<16} {generic:6.0f}/s   {fast:6.0f}/s   {fast / generic:6.2f}x")
+
+
+async def run(args):
+    import main
+
+    await main.startup_event()
+    await main.run_db(seed, main, args.dogs, args.days)
+    encoders(main)
+    await end_to_end(main, args.seconds)
+    await main.shutdown_event()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dogs", type=int, default=50, help="Dogs in the synthetic database")
+    parser.add_argument("--days", type=int, default=90, help="Days of synthetic history per dog")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration per endpoint and path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ["LOG_FILE"] = os.path.join(workdir, "bench.log")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["METRICS_ENABLED"] = "false"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,156 @@
+"""
+Benchmark: cold start, split into the phases that make it up
+
+Every sample is a fresh interpreter. Reports the median and minimum of
+--runs samples for:
+  interpreter       `python -c pass`, process spawn to exit
+  dependencies      importing FastAPI, pydantic and starlette
+  main              importing main.py with its dependencies already loaded
+  main (no .pyc)    the same with an empty bytecode cache, i.e. compiling main.py
+  first startup     startup_event on a new database (all migrations)
+  restart           startup_event on a database that is already up to date
+  ready             `python -m main` spawned to the first 200 from /health
+
+Exits with status 1 when the median "main" import exceeds --budget-ms, so it
+can gate CI or a deploy on slow hardware. The budget covers main.py's own
+import-time work only; the dependencies are reported but not judged.
+
+Run from the PooMasterBackend directory:
+    python benchmarks/startup.py --runs 10 --budget-ms 60
+"""
+import argparse
+import json
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEPENDENCIES = ("fastapi", "fastapi.middleware.cors", "fastapi.responses", "pydantic", "starlette", "sqlite3",
+                "logging.handlers")
+
+
+def child(phase):
+    """Measure one phase in this (fresh) interpreter and print milliseconds"""
+    import asyncio
+    import importlib
+
+    start = time.perf_counter()
+    for name in DEPENDENCIES:
+        importlib.import_module(name)
+    dependencies = time.perf_counter() - start
+
+    sys.path.insert(0, BACKEND_DIR)
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter() - start
+
+    result = {"dependencies": dependencies * 1000, "main": imported * 1000}
+    if phase == "startup":
+        async def run():
+            began = time.perf_counter()
+            await main.startup_event()
+            elapsed = time.perf_counter() - began
+            await main.shutdown_event()
+            return elapsed
+
+        result["startup"] = asyncio.run(run()) * 1000
+    print(json.dumps(result))
+
+
+def run_child(phase, env):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", phase], env=env, cwd=BACKEND_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_interpreter():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def time_ready(env, port):
+    import http.client
+
+    env = dict(env, HOST="127.0.0.1", PORT=str(port))
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "main"], env=env, cwd=BACKEND_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            # http.client rather than httpx: a cheap probe that doesn't compete with the server for CPU
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            try:
+                connection.request("GET", "/health")
+                if connection.getresponse().status == 200:
+                    return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.005)
+            finally:
+                connection.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per phase")
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="Allowed median import time of main.py itself")
+    parser.add_argument("--port", type=int, default=8799, help="Port for the ready measurement")
+    parser.add_argument("--skip-ready", action="store_true", help="Don't start the server")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    env = dict(os.environ, LOG_FILE=os.path.join(workdir, "bench.log"), LOG_LEVEL="WARNING",
+               DB_PATH=os.path.join(workdir, "bench.db"))
+    samples = {phase: [] for phase in ("interpreter", "dependencies", "main", "main (no .pyc)", "first startup",
+                                       "restart", "ready")}
+
+    # Make sure main.py's .pyc is current, even where PYTHONDONTWRITEBYTECODE is set
+    py_compile.compile(os.path.join(BACKEND_DIR, "main.py"), doraise=True)
+    for run in range(args.runs):
+        samples["interpreter"].append(time_interpreter())
+
+        measured = run_child("import", env)
+        samples["dependencies"].append(measured["dependencies"])
+        samples["main"].append(measured["main"])
+
+        no_pyc = dict(env, PYTHONPYCACHEPREFIX=tempfile.mkdtemp(dir=workdir), PYTHONDONTWRITEBYTECODE="1")
+        samples["main (no .pyc)"].append(run_child("import", no_pyc)["main"])
+
+        fresh = dict(env, DB_PATH=os.path.join(workdir, f"fresh-{run}.db"))
+        samples["first startup"].append(run_child("startup", fresh)["startup"])
+        samples["restart"].append(run_child("startup", fresh)["startup"])
+
+        if not args.skip_ready:
+            samples["ready"].append(time_ready(env, args.port))
+
+    print(f"{args.runs} runs per phase\n")
+    print(f"{'phase':<16} {'median':>9} {'min':>9}")
+    for phase, values in samples.items():
+        if values:
+            print(f"{phase:<16} {statistics.median(values):7.1f}ms {min(values):7.1f}ms")
+
+    main_median = statistics.median(samples["main"])
+    if main_median > args.budget_ms:
+        print(f"\nmain.py import takes {main_median:.1f}ms, over the {args.budget_ms:g}ms budget", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nmain.py import is within the {args.budget_ms:g}ms budget")
+
+
+if __name__ == "__main__":
+    main_cli()
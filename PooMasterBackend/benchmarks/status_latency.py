@@ -0,0 +1,113 @@
+"""
+Load test: /api/v1/status latency while heavy history queries run
+
+Seeds a throwaway database, then measures status poll latency twice:
+once on an idle server and once while several clients hammer
+/api/v1/history?limit=1000. Because database work runs on the DB executor,
+the p99 for status should stay flat between the two runs.
+
+Requires httpx (pip install httpx). Run from the PooMasterBackend directory:
+    python benchmarks/status_latency.py --events 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+
+def seed_database(db_path, event_count):
+    """Insert synthetic events spread over the last year"""
+    now = int(time.time())
+    start = now - 365 * 86400
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO events (event_type, timestamp) VALUES (?, ?)",
+        ((random.choice(("pee", "poo")), random.randint(start, now)) for _ in range(event_count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, samples):
+    print(f"{label:<28} n={len(samples):<6} "
+          f"p50={percentile(samples, 50):7.2f}ms  "
+          f"p95={percentile(samples, 95):7.2f}ms  "
+          f"p99={percentile(samples, 99):7.2f}ms  "
+          f"max={max(samples):7.2f}ms  mean={statistics.mean(samples):7.2f}ms")
+
+
+async def poll_status(client, duration, interval, samples):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/v1/status")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def hammer_history(client, duration):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        response = await client.get("/api/v1/history", params={"days": 365, "limit": 1000})
+        response.raise_for_status()
+
+
+async def run(args):
+    import httpx
+    import main
+
+    await main.startup_event()
+    seed_database(main.DB_PATH, args.events)
+    main.interval_stats.rebuild()
+    print(f"Seeded {args.events} events into {main.DB_PATH}")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = []
+        await asyncio.gather(*(poll_status(client, args.duration, args.interval, idle)
+                               for _ in range(args.pollers)))
+
+        loaded = []
+        await asyncio.gather(
+            *(poll_status(client, args.duration, args.interval, loaded) for _ in range(args.pollers)),
+            *(hammer_history(client, args.duration) for _ in range(args.history_clients))
+        )
+
+    await main.shutdown_event()
+
+    summarize("status (idle)", idle)
+    summarize(f"status ({args.history_clients} history clients)", loaded)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000, help="Number of synthetic events to seed")
+    parser.add_argument("--pollers", type=int, default=20, help="Concurrent status pollers")
+    parser.add_argument("--history-clients", type=int, default=4, help="Concurrent heavy history clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--interval", type=float, default=0.05, help="Delay between polls per poller")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.setdefault("LOG_FILE", os.path.join(workdir, "bench.log"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
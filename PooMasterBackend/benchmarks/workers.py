@@ -0,0 +1,136 @@
+"""
+Benchmark: request throughput with 1, 2 and 4 worker processes
+
+Starts `python main.py --workers N` on a fresh database for each N, waits
+for /health, then runs --processes load generator processes, each with
+--clients concurrent connections, for --seconds. Every tenth request is an
+event POST (forwarded to the coordinator), the rest are status GETs.
+Reports requests/s and p50/p99 latency for each worker count.
+
+Scaling needs as many free cores as workers plus load generators; on a
+single core the extra workers only add scheduling overhead.
+
+Requires httpx (pip install httpx). Run from the PooMasterBackend directory:
+    python benchmarks/workers.py --workers 1 2 4 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def client_loop(client, number, deadline, latencies):
+    sequence = 0
+    while time.perf_counter() < deadline:
+        sequence += 1
+        start = time.perf_counter()
+        if sequence % 10 == 0:
+            response = await client.post("/api/v1/events", json={
+                "event_type": "pee", "device_id": f"bench-{os.getpid()}-{number}", "sequence": sequence
+            })
+        else:
+            response = await client.get("/api/v1/status")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def child(base_url, clients, seconds):
+    import httpx
+
+    latencies = []
+    # A fresh connection per request so the kernel spreads them over the workers
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client_loop(client, number, deadline, latencies) for number in range(clients)))
+    print(json.dumps(latencies))
+
+
+def wait_for_health(base_url, server, timeout=60):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become healthy")
+
+
+def run_workers(workers, args):
+    workdir = tempfile.mkdtemp(prefix="poomaster-bench-")
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, DB_PATH=os.path.join(workdir, "bench.db"), LOG_FILE=os.path.join(workdir, "bench.log"),
+               CLUSTER_SOCKET=os.path.join(workdir, "cluster.sock"), HOST="127.0.0.1", PORT=str(args.port),
+               LOG_LEVEL="WARNING")
+    server = subprocess.Popen([sys.executable, "main.py", "--workers", str(workers)], env=env, cwd=BACKEND_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_health(base_url, server)
+        start = time.perf_counter()
+        generators = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", base_url,
+                              "--clients", str(args.clients), "--seconds", str(args.seconds)],
+                             stdout=subprocess.PIPE, text=True)
+            for _ in range(args.processes)
+        ]
+        latencies = []
+        for generator in generators:
+            output, _ = generator.communicate()
+            latencies.extend(json.loads(output.strip().splitlines()[-1]))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--processes", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections per load generator")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration per worker count")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server under test")
+    parser.add_argument("--child", metavar="URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.child, args.clients, args.seconds))
+        return
+
+    print(f"{os.cpu_count()} CPUs, {args.processes}x{args.clients} clients, {args.seconds:g}s per worker count\n")
+    print(f"{'workers':>7} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    for workers in args.workers:
+        result = run_workers(workers, args)
+        print(f"{workers:>7} {result['requests_per_second']:9.0f} {result['p50_ms']:7.2f}ms {result['p99_ms']:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,132 +1,790 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
 import sqlite3
 import json
-from contextlib import contextmanager
+from json.encoder import encode_basestring as _encode_basestring
+import queue
+import io
+from contextlib import contextmanager, asynccontextmanager
+from collections import OrderedDict, deque
 import os
+import time
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+import bisect
+import calendar
+import heapq
+import itertools
+import hashlib
+import struct
+import threading
+import contextvars
+import atexit
+import signal
+import socket
+import sys
+from email.utils import formatdate, parsedate_to_datetime
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 # ===== CONFIGURATION LOADER =====
 # Priority: 1. Environment variables, 2. config.json, 3. Hardcoded defaults
 
-def load_config_from_json(config_file: str = "config.json") -> Dict[str, Any]:
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config.json")
+
+
+def load_config_from_json(config_path: str = CONFIG_FILE, strict: bool = False) -> Dict[str, Any]:
     """
     Load configuration from JSON file in the executing directory.
-    Returns empty dict if file doesn't exist or is invalid.
+    Returns empty dict if file doesn't exist or is invalid (strict: raise instead).
     """
-    config_path = os.path.join(os.path.dirname(__file__), config_file)
-
     if not os.path.exists(config_path):
         return {}
 
     try:
         with open(config_path, 'r') as f:
             config = json.load(f)
+            if not isinstance(config, dict):
+                raise ValueError("top level must be an object")
             return config
-    except (json.JSONDecodeError, IOError) as e:
+    except (json.JSONDecodeError, IOError, ValueError) as e:
+        if strict:
+            raise
         print(f"Warning: Could not load config file {config_path}: {e}")
         return {}
 
 
-def get_config_value(key: str, default: Any, value_type: type = str) -> Any:
-    """
-    Get configuration value with priority: env var > config.json > default
+class Settings(BaseModel):
+    """Typed, validated application settings"""
+    model_config = ConfigDict(frozen=True)
+
+    # Application settings
+    APP_VERSION: str = "1.0.0"
+    API_VERSION: str = "v1"
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+
+    # Database configuration
+    DB_PATH: str = os.path.join(os.path.dirname(__file__), "puppy_tracker.db")
+
+    # Connection pool configuration
+    DB_POOL_SIZE: int = Field(8, ge=1)
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_JOURNAL_MODE: str = "WAL"
+    DB_SYNCHRONOUS: str = "NORMAL"
+    DB_CACHE_SIZE: int = -16000  # negative = KiB, so ~16MB
+    DB_MMAP_SIZE: int = 134217728  # 128MB
+    DB_STATEMENT_CACHE: int = 128
+
+    # Logging configuration
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "puppy_tracker.log"
+    LOG_MAX_BYTES: int = 10485760  # 10MB default
+    LOG_BACKUP_COUNT: int = 5
+    LOG_FORMAT: str = "json"  # "json" (one object per line) or "text"
+    LOG_ASYNC: bool = True  # hand records to a background writer thread
+    LOG_QUEUE_SIZE: int = Field(10000, ge=1)  # records buffered before new ones are dropped
+    LOG_SAMPLE_EVERY: int = Field(100, ge=1)  # keep 1 in N access log lines for status/health polls
+    LOG_RATE_LIMIT: float = Field(60.0, ge=0)  # seconds between repeats of the same per-request warning
+
+    # CORS configuration
+    CORS_ORIGINS: List[str] = ["*"]
+
+    # Default intervals (in hours) when no data is available
+    DEFAULT_PEE_INTERVAL: float = Field(4.0, gt=0)
+    DEFAULT_POO_INTERVAL: float = Field(12.0, gt=0)
+
+    # Dog that requests without an explicit dog_id are attributed to
+    DEFAULT_DOG_ID: int = 1
+
+    # Number of dogs whose interval stats / status snapshots are kept in memory (LRU)
+    STATUS_CACHE_MAX_DOGS: int = Field(2048, ge=1)
+
+    # Number of (dog, window) analytics series results kept in memory (LRU)
+    ANALYTICS_CACHE_SIZE: int = Field(256, ge=1)
+
+    # Sliding window (in days) used for the running average interval
+    STATS_WINDOW_DAYS: int = Field(7, ge=1)
+
+    # Interval predictor behind the status LEDs and alarms: "mean" (sliding-window average),
+    # "ewma", "median", "trimmed" or "time_of_day". Changing it needs a restart.
+    PREDICTOR: str = "mean"
+    # EWMA smoothing factor (weight of the newest interval)
+    PREDICTOR_ALPHA: float = Field(0.3, gt=0, le=1)
+    # Number of recent intervals kept by the median and trimmed-mean predictors
+    PREDICTOR_WINDOW: int = Field(50, ge=1)
+    # Fraction cut from each end before the trimmed mean
+    PREDICTOR_TRIM: float = Field(0.1, ge=0, lt=0.5)
+    # Samples an hour-of-day bucket needs before time_of_day trusts it over the overall EWMA
+    PREDICTOR_MIN_SAMPLES: int = Field(3, ge=1)
+    # Days of history replayed to rebuild a predictor state that is missing or out of date
+    PREDICTOR_REPLAY_DAYS: int = Field(30, ge=1)
+
+    # Maximum number of events accepted by one batch request
+    EVENT_BATCH_MAX: int = Field(5000, ge=1)
+
+    # "direct" commits each request to SQLite; "journal" acknowledges events and accidents
+    # once they are fsynced to an append-only journal and group-commits them in the background
+    INGEST_MODE: str = "direct"
+    INGEST_JOURNAL_PATH: str = os.path.join(os.path.dirname(__file__), "ingest.journal")
+    # fsync the journal before acknowledging (off trades durability on power loss for latency)
+    INGEST_FSYNC: bool = True
+    # Most records per SQLite transaction, and how long the writer waits to fill one (seconds)
+    INGEST_BATCH_MAX: int = Field(2000, ge=1)
+    INGEST_COMMIT_DELAY: float = Field(0.005, ge=0)
+    # The journal is truncated once everything in it is committed and it has grown past this
+    INGEST_JOURNAL_MAX_BYTES: int = Field(16 * 1024 * 1024, ge=0)
+
+    # Rows fetched per query while streaming an export
+    EXPORT_CHUNK_SIZE: int = Field(1000, ge=1)
+
+    # Seconds a cached status snapshot is served before being rebuilt
+    STATUS_CACHE_TTL: float = Field(5.0, ge=0)
+
+    # Status push stream: keepalive period and how often LED drift is re-checked (seconds)
+    STATUS_STREAM_HEARTBEAT: float = Field(15.0, gt=0)
+    STATUS_STREAM_CHECK_INTERVAL: float = Field(10.0, gt=0)
+    # Percentages of the average interval at which alarms fire, and where to POST them
+    ALARM_THRESHOLDS: List[int] = [60, 75, 90]
+    ALARM_WEBHOOK_URLS: List[str] = []
+    ALARM_WEBHOOK_TIMEOUT: float = Field(5.0, gt=0)
+
+    # Longest a long-poll status request (?wait=) may be held open (seconds)
+    STATUS_WAIT_MAX: float = Field(120.0, ge=0)
+
+    # Prometheus metrics at /metrics; METRICS_TIMING can switch off all hot-path timing at runtime
+    METRICS_ENABLED: bool = True
+    METRICS_TIMING: bool = True
+    # A client that polled status within this many seconds counts as a connected device
+    METRICS_DEVICE_WINDOW: float = Field(300.0, gt=0)
+
+    # Events older than this many days move from SQLite to monthly column files in ARCHIVE_DIR
+    # (0 disables archiving; never less than STATS_WINDOW_DAYS or PREDICTOR_REPLAY_DAYS)
+    ARCHIVE_AFTER_DAYS: int = Field(0, ge=0)
+    ARCHIVE_DIR: str = os.path.join(os.path.dirname(__file__), "archive")
+    # How often the server looks for months that have become old enough to archive (seconds)
+    ARCHIVE_CHECK_INTERVAL: float = Field(86400.0, gt=0)
+
+    # HTTP worker processes; above 1, a coordinator process owns all writes (see CLUSTER in main.py)
+    WORKERS: int = Field(1, ge=1)
+    # Unix socket between the workers and the coordinator
+    CLUSTER_SOCKET: str = os.path.join(os.path.dirname(__file__), "poomaster.sock")
+
+    # How often config.json is checked for changes (seconds, 0 disables hot reload)
+    CONFIG_RELOAD_INTERVAL: float = Field(2.0, ge=0)
+
+    @field_validator("DB_JOURNAL_MODE", "DB_SYNCHRONOUS", "LOG_LEVEL", mode="before")
+    @classmethod
+    def _upper(cls, value):
+        return value.upper() if isinstance(value, str) else value
+
+    @field_validator("LOG_FORMAT", "PREDICTOR", "INGEST_MODE", mode="before")
+    @classmethod
+    def _lower(cls, value):
+        return value.lower() if isinstance(value, str) else value
+
+    @field_validator("LOG_FORMAT")
+    @classmethod
+    def _known_log_format(cls, value):
+        if value not in ("json", "text"):
+            raise ValueError("LOG_FORMAT must be 'json' or 'text'")
+        return value
+
+    @field_validator("PREDICTOR")
+    @classmethod
+    def _known_predictor(cls, value):
+        if value not in ("mean", "ewma", "median", "trimmed", "time_of_day"):
+            raise ValueError("PREDICTOR must be one of mean, ewma, median, trimmed, time_of_day")
+        return value
+
+    @field_validator("INGEST_MODE")
+    @classmethod
+    def _known_ingest_mode(cls, value):
+        if value not in ("direct", "journal"):
+            raise ValueError("INGEST_MODE must be 'direct' or 'journal'")
+        return value
+
+    @field_validator("LOG_LEVEL")
+    @classmethod
+    def _known_log_level(cls, value):
+        if not isinstance(logging.getLevelName(value), int):
+            raise ValueError(f"unknown log level {value}")
+        return value
+
+    @field_validator("CORS_ORIGINS", mode="before")
+    @classmethod
+    def _split_origins(cls, value):
+        return value.split(',') if isinstance(value, str) else value
 
-    Args:
-        key: Configuration key name
-        default: Default value if not found in env or config
-        value_type: Type to convert the value to (str, int, float, bool)
+    @field_validator("ALARM_THRESHOLDS", "ALARM_WEBHOOK_URLS", mode="before")
+    @classmethod
+    def _split_list(cls, value):
+        return [item.strip() for item in value.split(',') if item.strip()] if isinstance(value, str) else value
 
-    Returns:
-        Configuration value with proper type
+    @field_validator("ALARM_THRESHOLDS")
+    @classmethod
+    def _sorted_thresholds(cls, value):
+        if any(threshold <= 0 for threshold in value):
+            raise ValueError("alarm thresholds must be positive percentages")
+        return sorted(set(value))
+
+
+# Settings that can change while the server is running; everything else is
+# read once at startup (pool size, paths, ports...) and needs a restart
+HOT_RELOAD_KEYS = {
+    "LOG_LEVEL", "LOG_SAMPLE_EVERY", "LOG_RATE_LIMIT", "DEFAULT_PEE_INTERVAL", "DEFAULT_POO_INTERVAL", "EVENT_BATCH_MAX",
+    "EXPORT_CHUNK_SIZE", "METRICS_TIMING", "METRICS_DEVICE_WINDOW", "STATUS_CACHE_TTL", "STATUS_STREAM_HEARTBEAT", "STATUS_STREAM_CHECK_INTERVAL",
+    "STATUS_WAIT_MAX", "ALARM_WEBHOOK_URLS", "ALARM_WEBHOOK_TIMEOUT"
+}
+
+
+class ConfigManager:
     """
-    # 1. Check environment variable first (highest priority)
-    env_value = os.getenv(key)
-    if env_value is not None:
+    Holds the current Settings, parsed once from env + config.json.
+    config.json is polled by mtime; a valid change to a hot-reloadable key
+    replaces `current` in one assignment, so readers never see a half-applied file.
+    """
+
+    def __init__(self, path: str = CONFIG_FILE):
+        self.path = path
+        self.current: Optional[Settings] = None
+        self.sources: Dict[str, str] = {}
+        self.pending: Dict[str, Any] = {}  # restart-only keys changed in the file since startup
+        self.loaded_at: Optional[datetime] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._mtime: Optional[tuple] = None
+        self._callbacks = []
+
+    def _file_signature(self) -> Optional[tuple]:
         try:
-            if value_type == bool:
-                return env_value.lower() in ('true', '1', 'yes', 'on')
-            elif value_type == list:
-                return env_value.split(',')
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _build(self, strict: bool = False) -> tuple:
+        """
+        Merge env, config.json and defaults into validated Settings.
+        Invalid values fall back to their defaults (strict: raise instead).
+        """
+        json_config = load_config_from_json(self.path, strict)
+        raw: Dict[str, Any] = {}
+        sources: Dict[str, str] = {}
+        for key in Settings.model_fields:
+            # 1. Environment variable (highest priority), 2. config.json
+            if os.getenv(key) is not None:
+                raw[key], sources[key] = os.getenv(key), "env"
+            elif key in json_config:
+                raw[key], sources[key] = json_config[key], "config.json"
             else:
-                return value_type(env_value)
-        except (ValueError, TypeError):
-            pass
+                sources[key] = "default"
 
-    # 2. Check config.json (medium priority)
-    json_config = load_config_from_json()
-    if key in json_config:
         try:
-            value = json_config[key]
-            if value_type == list and isinstance(value, str):
-                return value.split(',')
-            elif value_type != type(value):
-                return value_type(value)
-            return value
-        except (ValueError, TypeError):
-            pass
+            return Settings(**raw), sources
+        except ValidationError as e:
+            if strict:
+                raise
+            invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+            for key in invalid:
+                print(f"Warning: Invalid {sources[key]} value for {key}: {raw[key]!r}, using default")
+                raw.pop(key)
+                sources[key] = "default"
+            return Settings(**raw), sources
+
+    def load(self) -> Settings:
+        """Initial load at import time"""
+        self._mtime = self._file_signature()
+        self.current, self.sources = self._build()
+        self.loaded_at = datetime.now()
+        return self.current
+
+    def on_change(self, callback):
+        """Register callback(old, new, changed_keys) run after a hot reload"""
+        self._callbacks.append(callback)
+
+    def reload(self) -> List[str]:
+        """Re-read config.json now; returns the hot-reloadable keys that changed"""
+        self._mtime = self._file_signature()
+        # A half-written or broken file, or any invalid value in it, keeps the previous
+        # settings rather than reverting anything to its default
+        candidate, sources = self._build(strict=True)
+        old = self.current
+
+        restart_keys = [key for key in Settings.model_fields if key not in HOT_RELOAD_KEYS]
+        self.pending = {
+            key: getattr(candidate, key) for key in restart_keys if getattr(candidate, key) != getattr(old, key)
+        }
+        for key in self.pending:
+            logger.warning(f"Config {key} changed to {self.pending[key]!r}; restart required to apply")
+
+        new = candidate.model_copy(update={key: getattr(old, key) for key in restart_keys})
+        changed = [key for key in HOT_RELOAD_KEYS if getattr(new, key) != getattr(old, key)]
+        self.sources = {key: (self.sources[key] if key in restart_keys else sources[key]) for key in sources}
+        if not changed:
+            return []
 
-    # 3. Return default (lowest priority)
-    return default
+        self.current = new
+        self.loaded_at = datetime.now()
+        self.reloads += 1
+        logger.info(f"Config reloaded: {', '.join(f'{key}={getattr(new, key)!r}' for key in sorted(changed))}")
+        for callback in self._callbacks:
+            try:
+                callback(old, new, changed)
+            except Exception as e:
+                logger.error(f"Config change handler failed: {e}", exc_info=True)
+        return changed
 
+    def check(self) -> List[str]:
+        """Reload if config.json changed on disk since the last look"""
+        if self._file_signature() == self._mtime:
+            return []
+        try:
+            changed = self.reload()
+            self.last_error = None
+            return changed
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Config reload failed, keeping previous settings: {e}")
+            return []
+
+    async def watch(self):
+        """Poll config.json for changes until cancelled"""
+        interval = self.current.CONFIG_RELOAD_INTERVAL
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            self.check()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "config_file": self.path,
+            "config_file_exists": os.path.exists(self.path),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "settings": {
+                key: {
+                    "value": getattr(self.current, key),
+                    "source": self.sources.get(key, "default"),
+                    "hot_reload": key in HOT_RELOAD_KEYS
+                }
+                for key in Settings.model_fields
+            },
+            "pending_restart": self.pending
+        }
+
+
+config = ConfigManager()
+settings = config.load()
 
 # ===== ENVIRONMENT CONFIGURATION =====
-# Configuration priority: Environment variables > config.json > Hardcoded defaults
+# Startup-only values; hot-reloadable settings are read from config.current where used
+APP_VERSION = settings.APP_VERSION
+API_VERSION = settings.API_VERSION
+HOST = settings.HOST
+PORT = settings.PORT
 
-# Application settings
-APP_VERSION = get_config_value("APP_VERSION", "1.0.0", str)
-API_VERSION = get_config_value("API_VERSION", "v1", str)
-HOST = get_config_value("HOST", "0.0.0.0", str)
-PORT = get_config_value("PORT", 8000, int)
+DB_PATH = settings.DB_PATH
+DB_POOL_SIZE = settings.DB_POOL_SIZE
+DB_POOL_TIMEOUT = settings.DB_POOL_TIMEOUT
+DB_JOURNAL_MODE = settings.DB_JOURNAL_MODE
+DB_SYNCHRONOUS = settings.DB_SYNCHRONOUS
+DB_CACHE_SIZE = settings.DB_CACHE_SIZE
+DB_MMAP_SIZE = settings.DB_MMAP_SIZE
+DB_STATEMENT_CACHE = settings.DB_STATEMENT_CACHE
 
-# Database configuration
-DB_PATH = get_config_value("DB_PATH", os.path.join(os.path.dirname(__file__), "puppy_tracker.db"), str)
+LOG_FILE = settings.LOG_FILE
+LOG_MAX_BYTES = settings.LOG_MAX_BYTES
+LOG_BACKUP_COUNT = settings.LOG_BACKUP_COUNT
 
-# Logging configuration
-LOG_LEVEL = get_config_value("LOG_LEVEL", "INFO", str).upper()
-LOG_FILE = get_config_value("LOG_FILE", "puppy_tracker.log", str)
-LOG_MAX_BYTES = get_config_value("LOG_MAX_BYTES", 10485760, int)  # 10MB default
-LOG_BACKUP_COUNT = get_config_value("LOG_BACKUP_COUNT", 5, int)
+CORS_ORIGINS = settings.CORS_ORIGINS
 
-# CORS configuration
-CORS_ORIGINS = get_config_value("CORS_ORIGINS", "*", list)
-if isinstance(CORS_ORIGINS, str):
-    CORS_ORIGINS = CORS_ORIGINS.split(',')
+DEFAULT_DOG_ID = settings.DEFAULT_DOG_ID
+STATUS_CACHE_MAX_DOGS = settings.STATUS_CACHE_MAX_DOGS
+ANALYTICS_CACHE_SIZE = settings.ANALYTICS_CACHE_SIZE
+STATS_WINDOW_DAYS = settings.STATS_WINDOW_DAYS
+PREDICTOR_REPLAY_DAYS = settings.PREDICTOR_REPLAY_DAYS
 
-# Default intervals (in hours) when no data is available
-DEFAULT_PEE_INTERVAL = get_config_value("DEFAULT_PEE_INTERVAL", 4.0, float)
-DEFAULT_POO_INTERVAL = get_config_value("DEFAULT_POO_INTERVAL", 12.0, float)
+INGEST_MODE = settings.INGEST_MODE
+
+# "single", or "coordinator" / "worker" for the processes started by run_cluster
+CLUSTER_ROLE = os.environ.get("POOMASTER_CLUSTER_ROLE", "single")
+CLUSTER_SOCKET = settings.CLUSTER_SOCKET
 
 # ===== LOGGING SETUP =====
-log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Handlers run on a QueueListener thread so rotation and disk writes never
+# happen inside request handling. Each record carries the id of the request
+# that produced it.
 
-# Rotating file handler
-file_handler = RotatingFileHandler(
-    LOG_FILE,
-    maxBytes=LOG_MAX_BYTES,
-    backupCount=LOG_BACKUP_COUNT
-)
-file_handler.setFormatter(log_formatter)
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
 
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(log_formatter)
+TEXT_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 
-# Configure root logger
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    handlers=[file_handler, console_handler]
-)
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id (runs in the logging thread of the caller)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue that counts, rather than blocks on, overflow"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep exc_info for the formatter on the writer thread, but resolve the message now
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DeferredSetupHandler(logging.Handler):
+    """Stand-in root handler: the first record that reaches it builds the real pipeline, then is passed on"""
+
+    def __init__(self, pipeline: "LoggingPipeline"):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord):
+        root = logging.getLogger()
+        if self in root.handlers:
+            self.pipeline.configure(config.current)
+        for handler in root.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class PollSampleFilter(logging.Filter):
+    """Keep 1 in LOG_SAMPLE_EVERY uvicorn access lines for the polled status/health paths"""
+
+    SAMPLED_PATHS = ("/health", "/api/v1/status")
+
+    def __init__(self):
+        super().__init__()
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        if isinstance(args, tuple) and len(args) >= 3 and str(args[2]).startswith(self.SAMPLED_PATHS):
+            self._seen += 1
+            return (self._seen - 1) % config.current.LOG_SAMPLE_EVERY == 0
+        return True
+
+
+class RateLimitedLog:
+    """
+    Log a repeating message at most once per LOG_RATE_LIMIT seconds per key,
+    reporting how many repeats were suppressed in between.
+    """
+
+    def __init__(self, log: logging.Logger):
+        self.log = log
+        self._next: Dict[Any, tuple] = {}  # key -> (next allowed monotonic time, suppressed count)
+        self._lock = threading.Lock()
+
+    def __call__(self, key: Any, level: int, message: str):
+        if not self.log.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            allowed_at, suppressed = self._next.get(key, (0.0, 0))
+            if now < allowed_at:
+                self._next[key] = (allowed_at, suppressed + 1)
+                return
+            self._next[key] = (now + config.current.LOG_RATE_LIMIT, 0)
+        if suppressed:
+            message = f"{message} ({suppressed} similar suppressed)"
+        self.log.log(level, message)
+
+
+class LoggingPipeline:
+    """Owns the log handlers and, in async mode, the queue and its writer thread"""
+
+    def __init__(self):
+        self.handler: Optional[logging.Handler] = None
+        self.listener: Optional[QueueListener] = None
+        self.outputs: List[logging.Handler] = []
+
+    def configure(self, current: Settings):
+        self.stop()
+        formatter = JsonFormatter() if current.LOG_FORMAT == "json" else logging.Formatter(TEXT_LOG_FORMAT)
+
+        # Rotating file handler
+        file_handler = RotatingFileHandler(
+            current.LOG_FILE,
+            maxBytes=current.LOG_MAX_BYTES,
+            backupCount=current.LOG_BACKUP_COUNT
+        )
+        # Console handler
+        console_handler = logging.StreamHandler()
+        outputs = self.outputs = [file_handler, console_handler]
+        for handler in outputs:
+            handler.setFormatter(formatter)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(getattr(logging, current.LOG_LEVEL))
+
+        if current.LOG_ASYNC:
+            self.handler = DroppingQueueHandler(queue.Queue(current.LOG_QUEUE_SIZE))
+            self.listener = QueueListener(self.handler.queue, *outputs, respect_handler_level=True)
+            self.listener.start()
+            handlers = [self.handler]
+        else:
+            self.handler = None
+            handlers = outputs
+
+        for handler in handlers:
+            handler.addFilter(RequestIdFilter())
+            root.addHandler(handler)
+
+        access_logger = logging.getLogger("uvicorn.access")
+        if not any(isinstance(f, PollSampleFilter) for f in access_logger.filters):
+            access_logger.addFilter(PollSampleFilter())
+
+    def configure_lazily(self, current: Settings):
+        """Defer opening LOG_FILE and starting the writer thread until something is actually logged"""
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, current.LOG_LEVEL))
+        root.addHandler(DeferredSetupHandler(self))
+
+    def stop(self):
+        """Flush queued records and stop the writer thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in self.outputs:
+            handler.close()
+        self.outputs = []
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.outputs:
+            return {"mode": "deferred"}
+        if self.listener is None:
+            return {"mode": "sync"}
+        return {
+            "mode": "async",
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped
+        }
+
+
+logging_pipeline = LoggingPipeline()
+logging_pipeline.configure_lazily(settings)
+atexit.register(logging_pipeline.stop)
 
 logger = logging.getLogger(__name__)
+rate_limited_log = RateLimitedLog(logger)
+
+# ===== METRICS =====
+# Hand-rolled Prometheus text exposition; counters and histograms are plain
+# lists updated under a lock so recording costs well under a microsecond.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """Monotonic counter with one value per label set"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.label_names, labels)))} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label set"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(dict(base, le=le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+class PollingDevices:
+    """Clients that polled status recently, keyed by address (bounded, pruned on read)"""
+
+    MAX_TRACKED = 10000
+
+    def __init__(self):
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def seen(self, client: str):
+        now = time.monotonic()
+        with self._lock:
+            self._last_seen[client] = now
+            if len(self._last_seen) > self.MAX_TRACKED:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        cutoff = now - config.current.METRICS_DEVICE_WINDOW
+        self._last_seen = {client: seen for client, seen in self._last_seen.items() if seen >= cutoff}
+
+    def count(self) -> int:
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._last_seen)
+
+
+http_requests = Counter("poomaster_http_requests_total", "HTTP requests by route, method and status",
+                        ("route", "method", "status"))
+http_latency = Histogram("poomaster_http_request_duration_seconds", "HTTP request latency by route",
+                         ("route", "method"))
+db_query_latency = Histogram("poomaster_db_query_duration_seconds", "Time spent in database helpers",
+                             ("helper",))
+events_ingested = Counter("poomaster_events_ingested_total", "Events stored (duplicates excluded)",
+                          ("event_type",))
+polling_devices = PollingDevices()
+
+# Route paths registered on the app, so metric labels stay bounded for unknown URLs
+_route_paths: Optional[Set[str]] = None
+
+
+def route_label(path: str) -> str:
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = {route.path for route in app.routes if hasattr(route, "path")}
+    return path if path in _route_paths else "other"
+
+
+def timed(helper: str):
+    """Decorator recording a database helper's duration when METRICS_TIMING is on"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not config.current.METRICS_TIMING:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                db_query_latency.observe(time.perf_counter() - start, helper)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request per route; a pass-through when METRICS_TIMING is off"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.current.METRICS_TIMING:
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope["path"])
+            method = scope["method"]
+            http_requests.inc(route, method, str(status_code))
+            # Streams stay open for minutes; their duration isn't request latency
+            if route != "/api/v1/status/stream":
+                http_latency.observe(time.perf_counter() - start, route, method)
+            if route.startswith("/api/v1/status") and scope.get("client"):
+                polling_devices.seen(scope["client"][0])
 
-# Log configuration on startup
-logger.info(f"Starting Puppy Bathroom Tracker API v{APP_VERSION}")
-logger.info(f"Configuration: DB={DB_PATH}, LOG_LEVEL={LOG_LEVEL}, HOST={HOST}, PORT={PORT}")
 
 # ===== FASTAPI APPLICATION =====
 app = FastAPI(title="Puppy Bathroom Tracker API", version=APP_VERSION)
@@ -141,10 +799,78 @@ app.add_middleware(
 )
 
 
+class RequestIdMiddleware:
+    """Give every request an id (from X-Request-ID or generated) for log records and the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or os.urandom(8).hex()
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+app.add_middleware(RequestIdMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+# ===== JSON RESPONSES =====
+# Read endpoints return JSON bytes they encode themselves. Handing FastAPI a
+# dict sends every value through jsonable_encoder before json.dumps, which
+# costs more than the query for a page of history. orjson is used when it is
+# installed (imported on first use to keep start-up cheap); the stdlib
+# fallback produces the same compact UTF-8 JSON. Payloads must be plain
+# dicts/lists of str keys and str/int/float/bool/None values.
+
+def _stdlib_json_bytes(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+_json_dumps = None
+
+
+def json_bytes(value: Any) -> bytes:
+    """Compact UTF-8 JSON encoding of a plain payload"""
+    global _json_dumps
+    if _json_dumps is None:
+        try:
+            from orjson import dumps as _json_dumps
+        except ImportError:
+            _json_dumps = _stdlib_json_bytes
+    return _json_dumps(value)
+
+
+def json_response(value: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=json_bytes(value), media_type="application/json", headers=headers)
+
+
 # Pydantic models for API
 class EventCreate(BaseModel):
     event_type: str  # "pee" or "poo"
     timestamp: Optional[datetime] = None
+    dog_id: Optional[int] = None  # defaults to DEFAULT_DOG_ID
+    device_id: Optional[str] = None  # idempotency key, together with sequence
+    sequence: Optional[int] = None  # client-side sequence number per device
 
 
 class AccidentCreate(BaseModel):
@@ -152,6 +878,16 @@ class AccidentCreate(BaseModel):
     location: str
     notes: Optional[str] = None
     event_type: str  # "pee" or "poo"
+    dog_id: Optional[int] = None  # defaults to DEFAULT_DOG_ID
+
+
+class HouseholdCreate(BaseModel):
+    name: str
+
+
+class DogCreate(BaseModel):
+    name: str
+    household_id: int
 
 
 class LEDStatus(BaseModel):
@@ -165,177 +901,3403 @@ class LEDStatus(BaseModel):
     poo_percentage: float
 
 
-# Database context manager
-@contextmanager
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+# ===== DATABASE CONNECTION POOL =====
+
+class ConnectionPool:
+    """
+    Bounded pool of persistent SQLite connections.
+    A thread that already holds a connection gets the same one back on nested
+    checkouts, so helpers can call each other without taking extra slots.
+    """
+
+    def __init__(self, db_path: str, size: int, timeout: float):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.in_use = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            self._connections.append(conn)
+        logger.debug(f"Opened pooled database connection ({len(self._connections)}/{self.size})")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # Nested checkout on the same thread
+            yield held
+            return
+
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"Timed out waiting for a database connection after {self.timeout}s")
+        waited = time.perf_counter() - start
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(conn)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics for monitoring"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open_connections": len(self._connections),
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "wait_time_total_ms": round(self.wait_time_total * 1000, 3),
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+                "wait_time_avg_ms": round(self.wait_time_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0
+            }
+
+    def close_all(self):
+        """Close every idle connection (called on shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._connections.remove(conn)
+
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+
+
+# Database context manager
+@contextmanager
+def get_db():
+    with db_pool.connection() as conn:
+        yield conn
+
+
+# ===== TIMESTAMP HELPERS =====
+# Event times are stored as integer epoch seconds so that range filters and
+# ordering are plain integer comparisons. The API still speaks ISO 8601.
+
+def to_local_naive(timestamp: datetime) -> datetime:
+    """Convert a timezone-aware timestamp to naive local time (naive values pass through)"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def to_epoch(timestamp: datetime) -> int:
+    """Convert a datetime (naive = local time) to integer epoch seconds"""
+    return int(timestamp.timestamp())
+
+
+def from_epoch(value: int) -> datetime:
+    """Convert epoch seconds to a naive local datetime"""
+    return datetime.fromtimestamp(value)
+
+
+def epoch_to_iso(value: int) -> str:
+    return from_epoch(value).isoformat()
+
+
+# ===== SCHEMA MIGRATIONS =====
+# Each migration runs once, in order, inside its own transaction and is
+# recorded in the schema_version table. Append new migrations to MIGRATIONS.
+
+def _migration_base_tables(cursor: sqlite3.Cursor):
+    """Original events and accidents tables"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            timestamp DATETIME NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS accidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            estimated_time DATETIME NOT NULL,
+            location TEXT NOT NULL,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _iso_to_epoch(value: Any) -> int:
+    """Convert a legacy ISO timestamp column value to epoch seconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    return to_epoch(datetime.fromisoformat(value))
+
+
+def _rebuild_table(cursor: sqlite3.Cursor, table: str, create_sql: str, columns: List[str], converters: Dict[str, Any]):
+    """Recreate a table with a new definition, converting columns on the way"""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    row = cursor.fetchone()
+    sequence = row[0] if row else 0
+
+    cursor.execute(create_sql.format(table=f"{table}_new"))
+    column_list = ", ".join(columns)
+    cursor.execute(f"SELECT {column_list} FROM {table}")
+    rows = [
+        tuple(converters[col](value) if col in converters else value for col, value in zip(columns, row))
+        for row in cursor.fetchall()
+    ]
+    placeholders = ", ".join("?" for _ in columns)
+    cursor.executemany(f"INSERT INTO {table}_new ({column_list}) VALUES ({placeholders})", rows)
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence, table))
+    logger.info(f"Migrated {len(rows)} rows in {table}")
+
+
+def _migration_epoch_timestamps(cursor: sqlite3.Cursor):
+    """Store event and accident times as integer epoch seconds"""
+    _rebuild_table(cursor, "events", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """, ["id", "event_type", "timestamp", "created_at"], {"timestamp": _iso_to_epoch})
+
+    _rebuild_table(cursor, "accidents", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            estimated_time INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """, ["id", "event_type", "estimated_time", "location", "notes", "created_at"], {"estimated_time": _iso_to_epoch})
+
+
+def _migration_composite_indexes(cursor: sqlite3.Cursor):
+    """Composite indexes for the per-type time range queries"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events (event_type, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accidents_type_time ON accidents (event_type, estimated_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accidents_time ON accidents (estimated_time)")
+
+
+def _migration_idempotency_keys(cursor: sqlite3.Cursor):
+    """Device id + client sequence number so replayed events are deduplicated"""
+    cursor.execute("ALTER TABLE events ADD COLUMN device_id TEXT")
+    cursor.execute("ALTER TABLE events ADD COLUMN client_seq INTEGER")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_idempotency ON events (device_id, client_seq)
+        WHERE device_id IS NOT NULL AND client_seq IS NOT NULL
+    """)
+
+
+def _migration_tenancy(cursor: sqlite3.Cursor):
+    """Households and dogs; events and accidents are partitioned by dog_id"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS households (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dogs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            household_id INTEGER NOT NULL REFERENCES households (id),
+            name TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dogs_household ON dogs (household_id)")
+
+    # Existing single-dog data belongs to the default dog
+    cursor.execute("INSERT OR IGNORE INTO households (id, name) VALUES (1, 'Default household')")
+    cursor.execute("INSERT OR IGNORE INTO dogs (id, household_id, name) VALUES (?, 1, 'Default dog')", (DEFAULT_DOG_ID,))
+    cursor.execute(f"ALTER TABLE events ADD COLUMN dog_id INTEGER NOT NULL DEFAULT {int(DEFAULT_DOG_ID)}")
+    cursor.execute(f"ALTER TABLE accidents ADD COLUMN dog_id INTEGER NOT NULL DEFAULT {int(DEFAULT_DOG_ID)}")
+
+    # Tenant-leading indexes replace the global ones
+    cursor.execute("DROP INDEX IF EXISTS idx_events_type_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_events_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_accidents_type_time")
+    cursor.execute("DROP INDEX IF EXISTS idx_accidents_time")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_dog_type_timestamp ON events (dog_id, event_type, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_dog_timestamp ON events (dog_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accidents_dog_type_time ON accidents (dog_id, event_type, estimated_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accidents_dog_time ON accidents (dog_id, estimated_time)")
+
+
+def _migration_rollups(cursor: sqlite3.Cursor):
+    """Hourly and daily rollup tables for analytics, backfilled from existing events"""
+    for table, _ in ROLLUP_TABLES:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                dog_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                event_count INTEGER NOT NULL DEFAULT 0,
+                interval_count INTEGER NOT NULL DEFAULT 0,
+                interval_sum INTEGER NOT NULL DEFAULT 0,
+                interval_min INTEGER,
+                interval_max INTEGER,
+                accident_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dog_id, event_type, bucket)
+            ) WITHOUT ROWID
+        """)
+    _rebuild_rollups(cursor)
+
+
+def _migration_predictor_state(cursor: sqlite3.Cursor):
+    """Persisted interval predictor state, filled lazily on first use"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS predictor_state (
+            dog_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            predictor TEXT NOT NULL,
+            last_event INTEGER,
+            state TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (dog_id, event_type, predictor)
+        ) WITHOUT ROWID
+    """)
+
+
+MIGRATIONS = [
+    (1, "base tables", _migration_base_tables),
+    (2, "epoch timestamps", _migration_epoch_timestamps),
+    (3, "composite indexes", _migration_composite_indexes),
+    (4, "event idempotency keys", _migration_idempotency_keys),
+    (5, "households and dogs", _migration_tenancy),
+    (6, "analytics rollups", _migration_rollups),
+    (7, "predictor state", _migration_predictor_state),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor: sqlite3.Cursor) -> int:
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        # New database, or one created before migrations were tracked
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        return 0
+
+
+def run_migrations(conn: sqlite3.Connection):
+    """Apply every pending migration in order"""
+    cursor = conn.cursor()
+    current = get_schema_version(cursor)
+    if current >= SCHEMA_VERSION:
+        # Up to date: no DDL, no write transaction
+        return
+    conn.commit()
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying schema migration {version}: {description}")
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            migrate(cursor)
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Schema migration {version} failed, rolled back")
+            raise
+
+    if current < SCHEMA_VERSION:
+        logger.info(f"Database schema upgraded from version {current} to {SCHEMA_VERSION}")
+
+
+# ===== ANALYTICS ROLLUPS =====
+# Per (dog, event_type, bucket) counts and interval statistics, hourly and daily.
+# An interval is attributed to the bucket of the event that ends it. Buckets are
+# aligned to epoch hours/days. Inserts recompute only the buckets they touch, so
+# out-of-order events (which split an existing interval) stay exact.
+
+ROLLUP_TABLES = (("rollup_hourly", 3600), ("rollup_daily", 86400))
+
+
+def _compute_rollup_bucket(cursor: sqlite3.Cursor, dog_id: int, event_type: str, start: int, size: int) -> tuple:
+    """Aggregate raw events and accidents for one bucket"""
+    cursor.execute("SELECT MAX(timestamp) FROM events WHERE dog_id = ? AND event_type = ? AND timestamp < ?",
+                   (dog_id, event_type, start))
+    previous = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT timestamp FROM events
+        WHERE dog_id = ? AND event_type = ? AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp
+    """, (dog_id, event_type, start, start + size))
+    timestamps = [row[0] for row in cursor.fetchall()]
+    previous = event_archive.merge_previous(dog_id, event_type, start, previous)
+    timestamps = event_archive.merge_timestamps(dog_id, event_type, start, start + size, timestamps)
+    cursor.execute("""
+        SELECT COUNT(*) FROM accidents
+        WHERE dog_id = ? AND event_type = ? AND estimated_time >= ? AND estimated_time < ?
+    """, (dog_id, event_type, start, start + size))
+    accidents = cursor.fetchone()[0]
+
+    intervals = []
+    for timestamp in timestamps:
+        if previous is not None:
+            intervals.append(timestamp - previous)
+        previous = timestamp
+
+    return (len(timestamps), len(intervals), sum(intervals),
+            min(intervals) if intervals else None, max(intervals) if intervals else None, accidents)
+
+
+def _store_rollup_bucket(cursor: sqlite3.Cursor, table: str, dog_id: int, event_type: str, start: int, values: tuple):
+    if values[0] == 0 and values[5] == 0:
+        cursor.execute(f"DELETE FROM {table} WHERE dog_id = ? AND event_type = ? AND bucket = ?",
+                       (dog_id, event_type, start))
+        return
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {table}
+            (dog_id, event_type, bucket, event_count, interval_count, interval_sum,
+             interval_min, interval_max, accident_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (dog_id, event_type, start) + values)
+
+
+def refresh_rollups(cursor: sqlite3.Cursor, dog_id: int, event_type: str, timestamps: List[int], events_changed: bool = True):
+    """
+    Recompute the rollup buckets affected by new rows at `timestamps`.
+    For new events that is each event's bucket plus the bucket of the next
+    event, whose interval the new event splits. Runs in the caller's transaction.
+    """
+    affected = set(timestamps)
+    if events_changed:
+        for timestamp in set(timestamps):
+            cursor.execute("SELECT MIN(timestamp) FROM events WHERE dog_id = ? AND event_type = ? AND timestamp > ?",
+                           (dog_id, event_type, timestamp))
+            following = event_archive.merge_following(dog_id, event_type, timestamp, cursor.fetchone()[0])
+            if following is not None:
+                affected.add(following)
+
+    for table, size in ROLLUP_TABLES:
+        for start in {timestamp - timestamp % size for timestamp in affected}:
+            values = _compute_rollup_bucket(cursor, dog_id, event_type, start, size)
+            _store_rollup_bucket(cursor, table, dog_id, event_type, start, values)
+
+
+def _rebuild_rollups(cursor: sqlite3.Cursor):
+    """Recompute every rollup bucket with one ordered pass over events"""
+    for table, _ in ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+
+    def flush(series, buckets):
+        for table, _ in ROLLUP_TABLES:
+            cursor.executemany(f"""
+                INSERT INTO {table}
+                    (dog_id, event_type, bucket, event_count, interval_count, interval_sum, interval_min, interval_max)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [series + (start,) + tuple(values) for start, values in buckets[table].items()])
+
+    read = cursor.connection.cursor()
+    source = "events"
+    if event_archive.boundary:
+        # Archived months are part of the history too
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archived_events (dog_id INTEGER, event_type TEXT, timestamp INTEGER)")
+        cursor.execute("DELETE FROM temp.archived_events")
+        for dog_ids, type_codes, timestamps in event_archive.series():
+            cursor.executemany("INSERT INTO temp.archived_events VALUES (?, ?, ?)", zip(
+                dog_ids.tolist(), [ARCHIVE_EVENT_TYPES[code] for code in type_codes.tolist()], timestamps.tolist()))
+        source = """(SELECT dog_id, event_type, timestamp FROM events
+                     UNION ALL SELECT dog_id, event_type, timestamp FROM temp.archived_events)"""
+    read.execute(f"SELECT dog_id, event_type, timestamp FROM {source} ORDER BY dog_id, event_type, timestamp")
+    series = None
+    previous = None
+    buckets: Dict[str, Dict[int, list]] = {}
+    total = 0
+    for dog_id, event_type, timestamp in read:
+        if (dog_id, event_type) != series:
+            if series is not None:
+                flush(series, buckets)
+            series = (dog_id, event_type)
+            previous = None
+            buckets = {table: {} for table, _ in ROLLUP_TABLES}
+
+        interval = timestamp - previous if previous is not None else None
+        previous = timestamp
+        total += 1
+        for table, size in ROLLUP_TABLES:
+            values = buckets[table].setdefault(timestamp - timestamp % size, [0, 0, 0, None, None])
+            values[0] += 1
+            if interval is not None:
+                values[1] += 1
+                values[2] += interval
+                values[3] = interval if values[3] is None else min(values[3], interval)
+                values[4] = interval if values[4] is None else max(values[4], interval)
+    if series is not None:
+        flush(series, buckets)
+
+    for table, size in ROLLUP_TABLES:
+        cursor.execute(f"""
+            INSERT INTO {table} (dog_id, event_type, bucket, accident_count)
+            SELECT dog_id, event_type, estimated_time - estimated_time % {size} AS bucket, COUNT(*)
+            FROM accidents
+            WHERE true
+            GROUP BY dog_id, event_type, bucket
+            ON CONFLICT (dog_id, event_type, bucket) DO UPDATE SET accident_count = excluded.accident_count
+        """)
+    logger.info(f"Rebuilt analytics rollups from {total} events")
+
+
+def rebuild_rollups():
+    """Backfill the rollup tables from the raw events and accidents"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            _rebuild_rollups(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# ===== EVENT ARCHIVE =====
+# Events older than ARCHIVE_AFTER_DAYS move out of SQLite into one directory
+# per calendar month (local time) under ARCHIVE_DIR, with one flat binary
+# file per column that is only ever appended to. manifest.json holds the
+# committed row count of every partition and is replaced atomically after each
+# append, so a crash mid-append leaves bytes past the count that readers
+# ignore and the next append overwrites. Readers memory-map the columns and
+# answer with NumPy masks; fetch_events, the rollup computations and the
+# analytics raw tail union the archive with the hot table. The newest event
+# per dog and type always stays in SQLite so "last event" lookups never need
+# the archive; the rollup tables keep covering archived months as well.
+# Inserts dated before the boundary also look their (device_id, sequence)
+# key up in the archive, so a device replaying an old buffer can't bring
+# archived events back as duplicates.
+
+ARCHIVE_COLUMNS = (("id", "<i8"), ("dog_id", "<i4"), ("event_type", "u1"), ("timestamp", "<i8"),
+                   ("device", "<i4"), ("client_seq", "<i8"), ("created_at", "<i8"))
+ARCHIVE_EVENT_TYPES = ("pee", "poo")
+
+
+def month_bounds(timestamp: int) -> tuple:
+    """(start, end) epoch seconds of the local calendar month containing timestamp"""
+    start = from_epoch(timestamp).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return to_epoch(start), to_epoch(end)
+
+
+class EventArchive:
+    """Month-partitioned, append-only columnar store for cold events"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._manifest_mtime: Optional[int] = None
+        self.partitions: Dict[str, Dict[str, int]] = {}  # "YYYY-MM" -> {"rows", "start", "end"}
+        self._maps: Dict[str, tuple] = {}  # month -> (rows, columns, devices)
+        self._key_indexes: Dict[str, tuple] = {}  # month -> (rows, devices, sequences, ids) sorted by key
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Pick up a manifest written by another process (e.g. main.py --archive)"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            if mtime is None:
+                self.partitions = {}
+            else:
+                with open(self.manifest_path) as f:
+                    self.partitions = json.load(f)["partitions"]
+            self._manifest_mtime = mtime
+
+    @property
+    def boundary(self) -> int:
+        """End of the newest archived month (0 without an archive); older events may be archived"""
+        self._refresh()
+        return max((part["end"] for part in self.partitions.values()), default=0)
+
+    def _columns(self, month: str) -> tuple:
+        """(columns, devices) of a partition, memory-mapped and cached until its row count changes"""
+        import numpy as np
+
+        rows = self.partitions[month]["rows"]
+        with self._lock:
+            cached = self._maps.get(month)
+            if cached is not None and cached[0] == rows:
+                return cached[1], cached[2]
+        directory = os.path.join(self.root, "events", month)
+        columns = {
+            name: np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            if rows else np.empty(0, dtype=dtype)
+            for name, dtype in ARCHIVE_COLUMNS
+        }
+        with open(os.path.join(directory, "devices.json")) as f:
+            devices = json.load(f)
+        with self._lock:
+            self._maps[month] = (rows, columns, devices)
+        return columns, devices
+
+    def _key_index(self, month: str, columns) -> tuple:
+        """(device codes, client_seqs, ids) of a partition sorted by (device, client_seq), cached like _columns"""
+        import numpy as np
+
+        rows = self.partitions[month]["rows"]
+        with self._lock:
+            cached = self._key_indexes.get(month)
+            if cached is not None and cached[0] == rows:
+                return cached[1:]
+        order = np.lexsort((columns["client_seq"], columns["device"]))
+        index = (columns["device"][order], columns["client_seq"][order], columns["id"][order])
+        with self._lock:
+            self._key_indexes[month] = (rows,) + index
+        return index
+
+    def _months(self, start: int, end: int, newest_first: bool = False) -> List[str]:
+        """Partitions overlapping [start, end)"""
+        self._refresh()
+        months = [month for month, part in self.partitions.items()
+                  if part["rows"] and part["end"] > start and part["start"] < end]
+        return sorted(months, reverse=newest_first)
+
+    def _series_mask(self, columns, dog_id: int, event_type: Optional[str]):
+        mask = columns["dog_id"] == dog_id
+        if event_type is not None:
+            mask &= columns["event_type"] == ARCHIVE_EVENT_TYPES.index(event_type)
+        return mask
+
+    def timestamps(self, dog_id: int, event_type: str, start: int, end: int) -> List[int]:
+        """Sorted archived event times in [start, end)"""
+        import numpy as np
+
+        found = []
+        for month in self._months(start, end):
+            columns, _ = self._columns(month)
+            ts = columns["timestamp"]
+            found.append(ts[self._series_mask(columns, dog_id, event_type) & (ts >= start) & (ts < end)])
+        return np.sort(np.concatenate(found)).tolist() if found else []
+
+    def previous(self, dog_id: int, event_type: str, before: int) -> Optional[int]:
+        """Latest archived event time strictly before `before`"""
+        for month in self._months(0, before, newest_first=True):
+            columns, _ = self._columns(month)
+            ts = columns["timestamp"]
+            matches = ts[self._series_mask(columns, dog_id, event_type) & (ts < before)]
+            if len(matches):
+                return int(matches.max())
+        return None
+
+    def following(self, dog_id: int, event_type: str, after: int) -> Optional[int]:
+        """Earliest archived event time strictly after `after`"""
+        for month in self._months(after + 1, 2 ** 62):
+            columns, _ = self._columns(month)
+            ts = columns["timestamp"]
+            matches = ts[self._series_mask(columns, dog_id, event_type) & (ts > after)]
+            if len(matches):
+                return int(matches.min())
+        return None
+
+    def fetch(self, dog_id: int, event_type: Optional[str], cutoff: int, limit: int,
+              before: Optional[tuple] = None) -> List[tuple]:
+        """Archived events in fetch_events order and row format, at most `limit`"""
+        import numpy as np
+
+        end = before[0] + 1 if before is not None else 2 ** 62
+        rows: List[tuple] = []
+        # Months hold disjoint time ranges, so the newest months are read first
+        # and older ones only if the page isn't full yet
+        for month in self._months(cutoff, end, newest_first=True):
+            columns, devices = self._columns(month)
+            ts, ids = columns["timestamp"], columns["id"]
+            mask = self._series_mask(columns, dog_id, event_type) & (ts >= cutoff)
+            if before is not None:
+                mask &= (ts < before[0]) | ((ts == before[0]) & (ids < before[1]))
+            selected = np.nonzero(mask)[0]
+            selected = selected[np.lexsort((-ids[selected], -ts[selected]))][:limit - len(rows)]
+            for index in selected.tolist():
+                device, client_seq, created = (int(columns["device"][index]), int(columns["client_seq"][index]),
+                                               int(columns["created_at"][index]))
+                timestamp = int(ts[index])
+                rows.append((
+                    int(ids[index]),
+                    ARCHIVE_EVENT_TYPES[columns["event_type"][index]],
+                    epoch_to_iso(timestamp),
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(created)) if created >= 0 else None,
+                    devices[device] if device >= 0 else None,
+                    client_seq if client_seq >= 0 else None,
+                    dog_id,
+                    timestamp,
+                ))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def find_key(self, device_id: str, sequence: int) -> Optional[int]:
+        """Id of the archived event stored under a (device_id, sequence) dedup key, if any"""
+        import numpy as np
+
+        for month in self._months(0, 2 ** 62, newest_first=True):
+            columns, devices = self._columns(month)
+            if device_id not in devices:
+                continue
+            code = devices.index(device_id)
+            codes, sequences, ids = self._key_index(month, columns)
+            low, high = np.searchsorted(codes, code, "left"), np.searchsorted(codes, code, "right")
+            position = low + int(np.searchsorted(sequences[low:high], sequence))
+            if position < high and sequences[position] == sequence:
+                return int(ids[position])
+        return None
+
+    def existing_ids(self, ids: List[int]) -> Set[int]:
+        """The event ids among `ids` that are archived"""
+        import numpy as np
+
+        wanted = np.asarray(ids, dtype="<i8")
+        found: Set[int] = set()
+        for month in self._months(0, 2 ** 62):
+            columns, _ = self._columns(month)
+            found.update(wanted[np.isin(wanted, columns["id"])].tolist())
+        return found
+
+    def merge_previous(self, dog_id: int, event_type: str, before: int, hot: Optional[int]) -> Optional[int]:
+        """Combine a hot-table "latest event before" lookup with the archive"""
+        if hot is not None and before >= self.boundary:
+            return hot
+        archived = self.previous(dog_id, event_type, before)
+        return hot if archived is None or (hot is not None and hot > archived) else archived
+
+    def merge_following(self, dog_id: int, event_type: str, after: int, hot: Optional[int]) -> Optional[int]:
+        """Combine a hot-table "earliest event after" lookup with the archive"""
+        if after >= self.boundary:
+            return hot
+        archived = self.following(dog_id, event_type, after)
+        return hot if archived is None or (hot is not None and hot < archived) else archived
+
+    def merge_timestamps(self, dog_id: int, event_type: str, start: int, end: int, hot: List[int]) -> List[int]:
+        """Combine sorted hot-table event times in [start, end) with the archive"""
+        if start >= self.boundary:
+            return hot
+        return sorted(hot + self.timestamps(dog_id, event_type, start, end))
+
+    def series(self):
+        """(dog_ids, event_type codes, timestamps) arrays of every partition, for rollup rebuilds"""
+        for month in self._months(0, 2 ** 62):
+            columns, _ = self._columns(month)
+            yield columns["dog_id"], columns["event_type"], columns["timestamp"]
+
+    def _append(self, month: str, start: int, end: int, rows: List[tuple]) -> int:
+        """Append (id, dog_id, event_type, timestamp, device_id, client_seq, created_at) rows to a partition"""
+        import numpy as np
+
+        self._refresh()
+        part = self.partitions.get(month, {"rows": 0, "start": start, "end": end})
+        directory = os.path.join(self.root, "events", month)
+        os.makedirs(directory, exist_ok=True)
+        devices: List[str] = []
+        if part["rows"]:
+            columns, devices = self._columns(month)
+            # Rows whose SQLite delete didn't happen (crash after the last append) are already here
+            archived = set(columns["id"].tolist())
+            rows = [row for row in rows if row[0] not in archived]
+            devices = list(devices)
+        if not rows:
+            return 0
+
+        codes = {device: code for code, device in enumerate(devices)}
+        for row in rows:
+            if row[4] is not None and row[4] not in codes:
+                codes[row[4]] = len(devices)
+                devices.append(row[4])
+        values = {
+            "id": [row[0] for row in rows],
+            "dog_id": [row[1] for row in rows],
+            "event_type": [ARCHIVE_EVENT_TYPES.index(row[2]) for row in rows],
+            "timestamp": [row[3] for row in rows],
+            "device": [codes[row[4]] if row[4] is not None else -1 for row in rows],
+            "client_seq": [row[5] if row[5] is not None else -1 for row in rows],
+            "created_at": [row[6] if row[6] is not None else -1 for row in rows],
+        }
+        for name, dtype in ARCHIVE_COLUMNS:
+            path = os.path.join(directory, f"{name}.bin")
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.truncate(part["rows"] * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.asarray(values[name], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._write_json(os.path.join(directory, "devices.json"), devices)
+
+        partitions = dict(self.partitions)
+        partitions[month] = {"rows": part["rows"] + len(rows), "start": start, "end": end}
+        self._write_json(self.manifest_path, {"partitions": partitions})
+        self._refresh()
+        return len(rows)
+
+    @staticmethod
+    def _write_json(path: str, value):
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(value, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def archive(self, horizon_days: int) -> int:
+        """Move whole months of events older than the horizon out of SQLite, returns events moved"""
+        horizon = max(horizon_days, STATS_WINDOW_DAYS, PREDICTOR_REPLAY_DAYS)
+        cutoff = to_epoch(datetime.now() - timedelta(days=horizon))
+        moved = 0
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(timestamp) FROM events WHERE timestamp < ?", (cutoff,))
+            oldest = cursor.fetchone()[0]
+            if oldest is None:
+                return 0
+            cursor.execute("SELECT dog_id, event_type, MAX(timestamp) FROM events GROUP BY dog_id, event_type")
+            newest = {tuple(row) for row in cursor.fetchall()}
+
+            start, end = month_bounds(oldest)
+            while end <= cutoff:
+                cursor.execute("""
+                    SELECT id, dog_id, event_type, timestamp, device_id, client_seq,
+                           CAST(strftime('%s', created_at) AS INTEGER)
+                    FROM events
+                    WHERE timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp, id
+                """, (start, end))
+                rows = [tuple(row) for row in cursor.fetchall() if (row[1], row[2], row[3]) not in newest]
+                if rows:
+                    month = from_epoch(start).strftime("%Y-%m")
+                    appended = self._append(month, start, end, rows)
+                    cursor.execute("BEGIN IMMEDIATE")
+                    try:
+                        cursor.execute("DELETE FROM events WHERE id IN (SELECT value FROM json_each(?))",
+                                       (json.dumps([row[0] for row in rows]),))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    moved += len(rows)
+                    logger.info(f"Archived {appended} events from {month} ({len(rows)} removed from the database)")
+                start, end = end, month_bounds(end)[1]
+        return moved
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        return {"partitions": len(self.partitions),
+                "rows": sum(part["rows"] for part in self.partitions.values()),
+                "boundary": epoch_to_iso(self.boundary) if self.partitions else None}
+
+
+event_archive = EventArchive(settings.ARCHIVE_DIR)
+
+
+def init_db():
+    """Initialize the database and bring the schema up to date"""
+    logger.info(f"Initializing database at {DB_PATH}")
+    try:
+        with get_db() as conn:
+            run_migrations(conn)
+            logger.info("Database initialized successfully")
+    except Exception as e:
+        logger.error(f"Error initializing database: {e}", exc_info=True)
+        raise
+
+
+def default_interval(event_type: str) -> float:
+    """Configured fallback interval (hours) used when there isn't enough data"""
+    current = config.current
+    return current.DEFAULT_PEE_INTERVAL if event_type == "pee" else current.DEFAULT_POO_INTERVAL
+
+
+@timed("calculate_average_interval")
+def calculate_average_interval(event_type: str, days: int = 7, dog_id: int = DEFAULT_DOG_ID) -> float:
+    """Calculate average time between events in hours"""
+    logger.debug(f"Calculating average interval for dog {dog_id} {event_type} over {days} days")
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        # Get events from last N days
+        cutoff_date = datetime.now() - timedelta(days=days)
+        cursor.execute("""
+            SELECT timestamp FROM events
+            WHERE dog_id = ? AND event_type = ? AND timestamp >= ?
+            ORDER BY timestamp ASC
+        """, (dog_id, event_type, to_epoch(cutoff_date)))
+
+        events = cursor.fetchall()
+
+        if len(events) < 2:
+            # Default averages if not enough data (from environment or hardcoded defaults)
+            default = default_interval(event_type)
+            logger.debug(f"Insufficient data for {event_type} ({len(events)} events), using default: {default}h")
+            return default
+
+        # Calculate intervals between consecutive events
+        intervals = []
+        for i in range(1, len(events)):
+            interval_hours = (events[i]['timestamp'] - events[i - 1]['timestamp']) / 3600
+            intervals.append(interval_hours)
+
+        # Return average (use environment-configured defaults as fallback)
+        avg = sum(intervals) / len(intervals) if intervals else default_interval(event_type)
+        logger.debug(f"Average interval for {event_type}: {avg:.2f}h (from {len(events)} events)")
+        return avg
+
+
+# ===== INTERVAL PREDICTORS =====
+# Alternatives to the plain sliding-window mean, which a single overnight gap
+# drags up for a week. Each predictor keeps a small JSON-serializable state
+# that advances in O(1) per event; it is persisted in predictor_state in the
+# same transaction as the events, so a restart resumes instead of re-scanning.
+# A state remembers the newest event it has seen ("last"): if that no longer
+# matches the events table (a back-dated insert, a delete) the state is
+# rebuilt by replaying recent history. States are keyed by predictor name and
+# parameters, so changing either starts from a replay too.
+
+class Predictor:
+    """Incremental interval model; subclasses fill in initial/update/predict"""
+    name = ""
+
+    def initial(self) -> Dict[str, Any]:
+        return {}
+
+    def update(self, state: Dict[str, Any], interval_hours: float, started_at: int):
+        """Fold in one interval that began at epoch `started_at`"""
+        raise NotImplementedError
+
+    def predict(self, state: Dict[str, Any], last_event: int, default: float) -> float:
+        """Expected hours until the event after `last_event`"""
+        raise NotImplementedError
+
+    @property
+    def key(self) -> str:
+        """Name plus parameters, so states built with other settings are never reused"""
+        return self.name + json.dumps(vars(self), sort_keys=True)
+
+    def new_state(self) -> Dict[str, Any]:
+        state = self.initial()
+        state.update(last=None, intervals=0)
+        return state
+
+    def advance(self, state: Dict[str, Any], timestamp: int):
+        """Feed the next event (timestamps must arrive in ascending order)"""
+        if state["last"] is not None:
+            self.update(state, (timestamp - state["last"]) / 3600, state["last"])
+            state["intervals"] += 1
+        state["last"] = timestamp
+
+    def estimate(self, state: Dict[str, Any], last_event: int, default: float) -> float:
+        if not state["intervals"]:
+            return default
+        return self.predict(state, last_event, default)
+
+
+class EWMAPredictor(Predictor):
+    """Exponentially weighted mean: recent intervals count the most"""
+    name = "ewma"
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+
+    def initial(self):
+        return {"value": None}
+
+    def update(self, state, interval_hours, started_at):
+        value = state["value"]
+        state["value"] = interval_hours if value is None else value + self.alpha * (interval_hours - value)
+
+    def predict(self, state, last_event, default):
+        return state["value"]
+
+
+class MedianPredictor(Predictor):
+    """Median of the last `window` intervals, unaffected by one-off long gaps"""
+    name = "median"
+
+    def __init__(self, window: int):
+        self.window = window
+
+    def initial(self):
+        return {"recent": []}
+
+    def update(self, state, interval_hours, started_at):
+        recent = state["recent"]
+        recent.append(round(interval_hours, 4))
+        if len(recent) > self.window:
+            del recent[0]
+
+    def predict(self, state, last_event, default):
+        import statistics
+
+        return statistics.median(state["recent"])
+
+
+class TrimmedMeanPredictor(MedianPredictor):
+    """Mean of the last `window` intervals with the shortest and longest `trim` fraction cut off"""
+    name = "trimmed"
+
+    def __init__(self, window: int, trim: float):
+        super().__init__(window)
+        self.trim = trim
+
+    def predict(self, state, last_event, default):
+        ordered = sorted(state["recent"])
+        cut = int(len(ordered) * self.trim)
+        kept = ordered[cut:len(ordered) - cut]
+        return sum(kept) / len(kept)
+
+
+class TimeOfDayPredictor(EWMAPredictor):
+    """
+    EWMA per local hour of day, keyed by the hour the interval started in, so
+    the long overnight interval only shapes predictions made late in the evening.
+    Hours with too few samples fall back to the overall EWMA.
+    """
+    name = "time_of_day"
+
+    def __init__(self, alpha: float, min_samples: int):
+        super().__init__(alpha)
+        self.min_samples = min_samples
+
+    def initial(self):
+        return {"value": None, "hours": [[None, 0] for _ in range(24)]}
+
+    def update(self, state, interval_hours, started_at):
+        super().update(state, interval_hours, started_at)
+        bucket = state["hours"][time.localtime(started_at).tm_hour]
+        bucket[0] = interval_hours if bucket[0] is None else bucket[0] + self.alpha * (interval_hours - bucket[0])
+        bucket[1] += 1
+
+    def predict(self, state, last_event, default):
+        value, samples = state["hours"][time.localtime(last_event).tm_hour]
+        return value if samples >= self.min_samples else state["value"]
+
+
+def make_predictor(current: Settings) -> Optional[Predictor]:
+    """The configured predictor, or None for the sliding-window mean"""
+    if current.PREDICTOR == "ewma":
+        return EWMAPredictor(current.PREDICTOR_ALPHA)
+    if current.PREDICTOR == "median":
+        return MedianPredictor(current.PREDICTOR_WINDOW)
+    if current.PREDICTOR == "trimmed":
+        return TrimmedMeanPredictor(current.PREDICTOR_WINDOW, current.PREDICTOR_TRIM)
+    if current.PREDICTOR == "time_of_day":
+        return TimeOfDayPredictor(current.PREDICTOR_ALPHA, current.PREDICTOR_MIN_SAMPLES)
+    return None
+
+
+predictor = make_predictor(settings)
+
+
+@timed("replay_predictor_state")
+def replay_predictor_state(cursor: sqlite3.Cursor, dog_id: int, event_type: str) -> Dict[str, Any]:
+    """Build a fresh state from the last PREDICTOR_REPLAY_DAYS of events"""
+    cutoff = to_epoch(datetime.now() - timedelta(days=PREDICTOR_REPLAY_DAYS))
+    cursor.execute("""
+        SELECT timestamp FROM events
+        WHERE dog_id = ? AND event_type = ? AND timestamp >= ?
+        ORDER BY timestamp ASC
+    """, (dog_id, event_type, cutoff))
+    state = predictor.new_state()
+    for row in cursor.fetchall():
+        predictor.advance(state, row[0])
+    return state
+
+
+def save_predictor_state(cursor: sqlite3.Cursor, dog_id: int, event_type: str, state: Dict[str, Any]):
+    cursor.execute("""
+        INSERT OR REPLACE INTO predictor_state (dog_id, event_type, predictor, last_event, state, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (dog_id, event_type, predictor.key, state["last"], json.dumps(state), int(time.time())))
+
+
+def load_predictor_state(cursor: sqlite3.Cursor, dog_id: int, event_type: str,
+                         last_event: Optional[int]) -> Dict[str, Any]:
+    """The persisted state, replayed and re-saved if it doesn't end at `last_event`"""
+    cursor.execute("SELECT state FROM predictor_state WHERE dog_id = ? AND event_type = ? AND predictor = ?",
+                   (dog_id, event_type, predictor.key))
+    row = cursor.fetchone()
+    state = json.loads(row[0]) if row else None
+    if state is None or state["last"] != last_event:
+        state = replay_predictor_state(cursor, dog_id, event_type)
+        if CLUSTER_ROLE != "worker":  # workers leave all writes to the coordinator
+            save_predictor_state(cursor, dog_id, event_type, state)
+    return state
+
+
+def update_predictor_state(cursor: sqlite3.Cursor, dog_id: int, event_type: str,
+                           timestamps: List[int]) -> Dict[str, Any]:
+    """
+    Advance a state with newly inserted events, inside the inserting transaction.
+    Events newer than everything the state has seen are folded in incrementally;
+    a back-dated event changes earlier intervals, so the state is replayed.
+    """
+    cursor.execute("SELECT state FROM predictor_state WHERE dog_id = ? AND event_type = ? AND predictor = ?",
+                   (dog_id, event_type, predictor.key))
+    row = cursor.fetchone()
+    state = json.loads(row[0]) if row else None
+    if state is not None and state["last"] is not None and min(timestamps) >= state["last"]:
+        for timestamp in sorted(timestamps):
+            predictor.advance(state, timestamp)
+    else:
+        state = replay_predictor_state(cursor, dog_id, event_type)
+    save_predictor_state(cursor, dog_id, event_type, state)
+    return state
+
+
+# ===== INTERVAL STATISTICS STORE =====
+# Running per-event-type statistics so status requests don't have to re-scan
+# the events table. Because the intervals between consecutive events telescope,
+# the sum of all intervals inside the window is simply (newest - oldest), so the
+# store only needs the sorted event times inside the window plus the last event.
+
+class IntervalStats:
+    """Sliding-window interval statistics for a single event type (epoch seconds)"""
+
+    def __init__(self, window_days: int):
+        self.window = window_days * 86400
+        self.timestamps: List[int] = []  # sorted event times inside the window
+        self.last_event: Optional[int] = None
+        self.model: Optional[Dict[str, Any]] = None  # predictor state, unless PREDICTOR is "mean"
+
+    def add(self, timestamp: int):
+        """Record a new event (may arrive out of order)"""
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+        else:
+            bisect.insort(self.timestamps, timestamp)
+        if self.last_event is None or timestamp > self.last_event:
+            self.last_event = timestamp
+
+    def expire(self, now: float):
+        """Drop events that have slid out of the window"""
+        expired = bisect.bisect_left(self.timestamps, now - self.window)
+        if expired:
+            del self.timestamps[:expired]
+
+    @property
+    def count(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def interval_sum(self) -> float:
+        """Sum of consecutive intervals inside the window, in hours"""
+        if len(self.timestamps) < 2:
+            return 0.0
+        return (self.timestamps[-1] - self.timestamps[0]) / 3600
+
+    def average_interval(self, default: float) -> float:
+        """Average interval in hours, or the default with fewer than two events"""
+        if len(self.timestamps) < 2:
+            return default
+        return self.interval_sum / (len(self.timestamps) - 1)
+
+
+class IntervalStatsStore:
+    """
+    Thread-safe LRU of per-dog IntervalStats (one per event type).
+    Dogs are loaded lazily from the events table on first use and the least
+    recently used ones are evicted once more than `capacity` dogs are cached.
+    """
+
+    def __init__(self, window_days: int, capacity: int):
+        self.window_days = window_days
+        self.capacity = capacity
+        self._dogs: "OrderedDict[int, Dict[str, IntervalStats]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}  # bumped on every write, detects races with load()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_loaded(self, dog_id: int) -> bool:
+        with self._lock:
+            return dog_id in self._dogs
+
+    def dog_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._dogs)
+
+    def _query(self, dog_id: int) -> Dict[str, IntervalStats]:
+        cutoff = to_epoch(datetime.now() - timedelta(days=self.window_days))
+        loaded: Dict[str, IntervalStats] = {}
+        with get_db() as conn:
+            cursor = conn.cursor()
+            for event_type in ("pee", "poo"):
+                stats = loaded[event_type] = IntervalStats(self.window_days)
+                cursor.execute("""
+                    SELECT timestamp FROM events
+                    WHERE dog_id = ? AND event_type = ? AND timestamp >= ?
+                    ORDER BY timestamp ASC
+                """, (dog_id, event_type, cutoff))
+                stats.timestamps = [row['timestamp'] for row in cursor.fetchall()]
+                cursor.execute("SELECT MAX(timestamp) FROM events WHERE dog_id = ? AND event_type = ?",
+                               (dog_id, event_type))
+                stats.last_event = cursor.fetchone()[0]
+                if predictor is not None:
+                    stats.model = load_predictor_state(cursor, dog_id, event_type, stats.last_event)
+            conn.commit()  # keeps any state that had to be replayed
+        return loaded
+
+    @timed("interval_stats_load")
+    def load(self, dog_id: int):
+        """Load a dog's statistics from the events table"""
+        while True:
+            with self._lock:
+                version = self._versions.get(dog_id, 0)
+            loaded = self._query(dog_id)
+            with self._lock:
+                if self._versions.get(dog_id, 0) != version:
+                    # An event was written while we were reading, read again
+                    continue
+                self.misses += 1
+                self._dogs[dog_id] = loaded
+                self._dogs.move_to_end(dog_id)
+                while len(self._dogs) > self.capacity:
+                    self._dogs.popitem(last=False)
+                return
+
+    def evict(self, dog_id: int):
+        with self._lock:
+            self._dogs.pop(dog_id, None)
+            self._versions[dog_id] = self._versions.get(dog_id, 0) + 1
+
+    def _add(self, dog_id: int, event_type: str, timestamp: int):
+        self._versions[dog_id] = self._versions.get(dog_id, 0) + 1
+        stats = self._dogs.get(dog_id)
+        if stats is not None:
+            stats[event_type].add(timestamp)
+
+    def record(self, dog_id: int, event_type: str, timestamp: int):
+        """Update the running statistics for a newly logged event"""
+        with self._lock:
+            self._add(dog_id, event_type, timestamp)
+
+    def record_many(self, events: List[tuple]):
+        """Update the running statistics for (dog_id, event_type, timestamp) rows in one pass"""
+        with self._lock:
+            for dog_id, event_type, timestamp in events:
+                self._add(dog_id, event_type, timestamp)
+
+    def set_models(self, models: Dict[tuple, Dict[str, Any]]):
+        """Install predictor states committed by insert_events, keyed by (dog_id, event_type)"""
+        with self._lock:
+            for (dog_id, event_type), model in models.items():
+                self._versions[dog_id] = self._versions.get(dog_id, 0) + 1
+                stats = self._dogs.get(dog_id)
+                if stats is not None:
+                    stats[event_type].model = model
+
+    def snapshot(self, dog_id: int, event_type: str, now: Optional[float] = None):
+        """Return (last_event epoch or None, average_interval hours) for a dog and event type"""
+        now = now if now is not None else time.time()
+        default = default_interval(event_type)
+        while True:
+            with self._lock:
+                dog = self._dogs.get(dog_id)
+                if dog is not None:
+                    self.hits += 1
+                    self._dogs.move_to_end(dog_id)
+                    stats = dog[event_type]
+                    # Predictor-backed dogs still record every event; keep the window bounded for them too
+                    stats.expire(now)
+                    if stats.model is not None:
+                        return stats.last_event, predictor.estimate(stats.model, stats.last_event, default)
+                    return stats.last_event, stats.average_interval(default)
+            self.load(dog_id)
+
+    def window_average(self, dog_id: int, event_type: str, now: Optional[float] = None) -> float:
+        """Sliding-window mean interval regardless of the configured predictor"""
+        self.snapshot(dog_id, event_type, now)
+        with self._lock:
+            stats = self._dogs[dog_id][event_type]
+            stats.expire(now if now is not None else time.time())
+            return stats.average_interval(default_interval(event_type))
+
+    def clear(self):
+        """Drop everything cached; dogs reload lazily"""
+        with self._lock:
+            for dog_id in self._dogs:
+                self._versions[dog_id] = self._versions.get(dog_id, 0) + 1
+            self._dogs.clear()
+
+    def rebuild(self):
+        """Drop everything cached and reload the default dog from the events table"""
+        self.clear()
+        self.load(DEFAULT_DOG_ID)
+
+    def check_consistency(self):
+        """Rebuild the store from the database and verify it against a full scan"""
+        self.rebuild()
+        for event_type in ("pee", "poo"):
+            cached = self.window_average(DEFAULT_DOG_ID, event_type)
+            scanned = calculate_average_interval(event_type, self.window_days, DEFAULT_DOG_ID)
+            if abs(cached - scanned) > 1e-6:
+                logger.error(f"Interval stats mismatch for {event_type}: cached={cached:.4f}h, scanned={scanned:.4f}h")
+            else:
+                logger.debug(f"Interval stats for {event_type} consistent: {cached:.2f}h")
+            if predictor is not None:
+                last_event, predicted = self.snapshot(DEFAULT_DOG_ID, event_type)
+                with get_db() as conn:
+                    replayed = replay_predictor_state(conn.cursor(), DEFAULT_DOG_ID, event_type)
+                expected = predictor.estimate(replayed, last_event, default_interval(event_type))
+                if abs(predicted - expected) > 1e-3:
+                    logger.error(f"Predictor {predictor.name} mismatch for {event_type}: "
+                                 f"persisted={predicted:.4f}h, replayed={expected:.4f}h")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"dogs_cached": len(self._dogs), "capacity": self.capacity,
+                    "hits": self.hits, "misses": self.misses}
+
+
+interval_stats = IntervalStatsStore(STATS_WINDOW_DAYS, STATUS_CACHE_MAX_DOGS)
+
+
+# ===== TENANCY =====
+
+class DogRegistry:
+    """Known dogs (id -> household id), loaded on startup and kept current by the API"""
+
+    def __init__(self):
+        self._dogs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, household_id FROM dogs")
+            dogs = {row['id']: row['household_id'] for row in cursor.fetchall()}
+        with self._lock:
+            self._dogs = dogs
+        logger.info(f"Loaded {len(dogs)} dogs")
+
+    def add(self, dog_id: int, household_id: int):
+        with self._lock:
+            self._dogs[dog_id] = household_id
+
+    def exists(self, dog_id: int) -> bool:
+        return dog_id in self._dogs
+
+    def ids(self, household_id: Optional[int] = None) -> List[int]:
+        with self._lock:
+            if household_id is None:
+                return sorted(self._dogs)
+            return sorted(dog_id for dog_id, owner in self._dogs.items() if owner == household_id)
+
+
+dog_registry = DogRegistry()
+
+
+def resolve_dog_id(dog_id: Optional[int]) -> int:
+    """Apply the default dog and reject unknown dog ids"""
+    if dog_id is None:
+        dog_id = DEFAULT_DOG_ID
+    if not dog_registry.exists(dog_id):
+        logger.error(f"Unknown dog_id: {dog_id}")
+        raise HTTPException(status_code=404, detail=f"Dog {dog_id} not found")
+    return dog_id
+
+
+# Percentage of the average interval at which a type is in alarm (LED flashes red)
+ALARM_PERCENTAGE = 90
+
+
+def calculate_led_color(percentage: float) -> Dict[str, int]:
+    """
+    Calculate RGB color based on percentage of average time elapsed
+    0-60%: Green
+    60-75%: Green to Yellow transition
+    75-90%: Yellow to Red transition
+    90%+: Red (will flash on device)
+    """
+    if percentage < 60:
+        # Green
+        return {"r": 0, "g": 255, "b": 0}
+    elif percentage < 75:
+        # Transition from Green to Yellow (60-75%)
+        # Green stays at 255, Red increases from 0 to 255
+        progress = (percentage - 60) / 15  # 0 to 1
+        red = int(255 * progress)
+        return {"r": red, "g": 255, "b": 0}
+    elif percentage < 90:
+        # Transition from Yellow to Red (75-90%)
+        # Red stays at 255, Green decreases from 255 to 0
+        progress = (percentage - 75) / 15  # 0 to 1
+        green = int(255 * (1 - progress))
+        return {"r": 255, "g": green, "b": 0}
+    else:
+        # Red (90%+)
+        return {"r": 255, "g": 0, "b": 0}
+
+
+def get_status_for_type(event_type: str, dog_id: int = DEFAULT_DOG_ID) -> Dict:
+    """Get current status for a specific event type from the in-memory stats store"""
+    last_event, avg_interval = interval_stats.snapshot(dog_id, event_type)
+
+    if last_event is None:
+        rate_limited_log((dog_id, event_type, "no_events"), logging.WARNING,
+                         f"No events found for dog {dog_id} {event_type}, returning urgent status")
+        # No events yet - show as urgent
+        return {
+            "color": {"r": 255, "g": 0, "b": 0},
+            "alarm": True,
+            "time_since": 0.0,
+            "percentage": 100.0,
+            "average_interval": avg_interval
+        }
+
+    time_since = (time.time() - last_event) / 3600  # hours
+    percentage = (time_since / avg_interval) * 100 if avg_interval > 0 else 0
+
+    status = {
+        "color": calculate_led_color(percentage),
+        "alarm": percentage >= ALARM_PERCENTAGE,
+        "time_since": round(time_since, 2),
+        "percentage": round(percentage, 1),
+        "average_interval": round(avg_interval, 2)
+    }
+
+    # Alarms are logged once per crossing by the alarm scheduler, not on every poll
+    return status
+
+
+# ===== STATUS SNAPSHOT CACHE =====
+# The status payload only changes when an event is logged or as time passes, so
+# it is built once and served from memory. Writes invalidate it immediately and
+# a short TTL keeps time_since and the percentages fresh.
+
+def request_not_modified(request: Request, etag: str, last_modified: Optional[int]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against a representation's validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _validator_headers(etag: str, last_modified: Optional[int]) -> Dict[str, str]:
+    if last_modified is None:
+        return {"ETag": etag, "Cache-Control": "no-cache"}
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+
+
+# Same bytes json.dumps(status.model_dump(), separators=(",", ":")) would give, without the model walk
+STATUS_JSON_TEMPLATE = ('{"pee":{"r":%d,"g":%d,"b":%d},"poo":{"r":%d,"g":%d,"b":%d},"pee_alarm":%s,"poo_alarm":%s,'
+                        '"pee_time_since":%r,"poo_time_since":%r,"pee_percentage":%r,"poo_percentage":%r}')
+
+
+def encode_status(status: LEDStatus) -> bytes:
+    return (STATUS_JSON_TEMPLATE % (
+        status.pee["r"], status.pee["g"], status.pee["b"], status.poo["r"], status.poo["g"], status.poo["b"],
+        "true" if status.pee_alarm else "false", "true" if status.poo_alarm else "false",
+        float(status.pee_time_since), float(status.poo_time_since),
+        float(status.pee_percentage), float(status.poo_percentage)
+    )).encode()
+
+
+# Row tuples from fetch_events and fetch_accidents hold these columns in this
+# order, times already as local ISO text, followed by the epoch seconds of
+# the row as its sort and cursor key
+EVENT_COLUMNS = ("id", "event_type", "timestamp", "created_at", "device_id", "client_seq", "dog_id")
+ACCIDENT_COLUMNS = ("id", "event_type", "estimated_time", "location", "notes", "created_at", "dog_id")
+
+EVENT_JSON_TEMPLATE = ('{"id":%d,"event_type":"%s","timestamp":"%s","created_at":%s,"device_id":%s,'
+                       '"client_seq":%s,"dog_id":%d}')
+ACCIDENT_JSON_TEMPLATE = ('{"id":%d,"event_type":"%s","estimated_time":"%s","location":%s,"notes":%s,'
+                          '"created_at":%s,"dog_id":%d}')
+
+
+def _json_text(value: Optional[str]) -> str:
+    return "null" if value is None else _encode_basestring(value)
+
+
+def encode_events(rows: List[tuple]) -> List[str]:
+    return [EVENT_JSON_TEMPLATE % (row[0], row[1], row[2], _json_text(row[3]), _json_text(row[4]),
+                                   "null" if row[5] is None else row[5], row[6]) for row in rows]
+
+
+def encode_accidents(rows: List[tuple]) -> List[str]:
+    return [ACCIDENT_JSON_TEMPLATE % (row[0], row[1], row[2], _json_text(row[3]), _json_text(row[4]),
+                                      _json_text(row[5]), row[6]) for row in rows]
+
+
+def encode_page(key: str, items: List[str], next_cursor: Optional[str]) -> bytes:
+    """Same bytes json_bytes({key: rows, "count": ..., "next_cursor": ...}) gives for the row dicts"""
+    return ('{"%s":[%s],"count":%d,"next_cursor":%s}' % (key, ",".join(items), len(items),
+                                                         _json_text(next_cursor))).encode()
+
+
+class StatusSnapshot:
+    """
+    Pre-serialized status payload with its HTTP validators.
+    `changed_at` is the whole second the content took effect; `last_modified`
+    is the same second, or None when that isn't newer than the previous
+    content's and a Last-Modified header couldn't tell the two apart.
+    """
+
+    def __init__(self, status: LEDStatus, last_modified: Optional[int], changed_at: int):
+        self.status = status
+        self.body = encode_status(status)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        self.last_modified = last_modified
+        self.changed_at = changed_at
+        self.headers = _validator_headers(self.etag, self.last_modified)
+        self._compact: Dict[str, "CompactStatus"] = {}
+
+    def is_not_modified(self, request: Request) -> bool:
+        return request_not_modified(request, self.etag, self.last_modified)
+
+    def compact(self, fmt: str) -> "CompactStatus":
+        """Compact encoding of this snapshot, built on first use and kept with it"""
+        encoded = self._compact.get(fmt)
+        if encoded is None:
+            encoded = self._compact[fmt] = CompactStatus(self.status, self.last_modified, fmt)
+        return encoded
+
+
+# Fixed little-endian layout for microcontrollers (16 bytes):
+#   version u8, flags u8 (bit0 pee alarm, bit1 poo alarm), pee r,g,b u8, poo r,g,b u8,
+#   pee/poo percentage u16 (tenths of a percent), pee/poo time since u16 (minutes)
+COMPACT_STATUS_VERSION = 1
+COMPACT_STATUS_STRUCT = struct.Struct("<BB3B3BHHHH")
+COMPACT_MEDIA_TYPES = {"bin": "application/octet-stream", "csv": "text/csv"}
+
+
+class CompactStatus:
+    """
+    Status as a fixed binary struct or one CSV line, with its own validators.
+    Minutes/tenths resolution means it changes less often than the JSON, so
+    conditional polls get more 304s.
+    """
+
+    def __init__(self, status: LEDStatus, last_modified: Optional[int], fmt: str):
+        percentages = [min(65535, max(0, round(value * 10))) for value in (status.pee_percentage, status.poo_percentage)]
+        minutes = [min(65535, max(0, round(value * 60))) for value in (status.pee_time_since, status.poo_time_since)]
+        colors = [status.pee[channel] for channel in "rgb"] + [status.poo[channel] for channel in "rgb"]
+        flags = (1 if status.pee_alarm else 0) | (2 if status.poo_alarm else 0)
+
+        if fmt == "bin":
+            self.body = COMPACT_STATUS_STRUCT.pack(COMPACT_STATUS_VERSION, flags, *colors, *percentages, *minutes)
+        else:
+            # Same fields and order as the struct
+            fields = [COMPACT_STATUS_VERSION, flags, *colors, *percentages, *minutes]
+            self.body = (",".join(str(field) for field in fields) + "\n").encode()
+
+        self.media_type = COMPACT_MEDIA_TYPES[fmt]
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        self.last_modified = last_modified
+        self.headers = _validator_headers(self.etag, last_modified)
+
+    def is_not_modified(self, request: Request) -> bool:
+        return request_not_modified(request, self.etag, self.last_modified)
+
+
+class StatusSnapshotCache:
+    """Per-dog status snapshots (LRU) with write-through invalidation and a time-based refresh"""
+
+    def __init__(self, ttl: float, capacity: int):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # dog_id -> (snapshot, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dog_id: int = DEFAULT_DOG_ID) -> StatusSnapshot:
+        with self._lock:
+            entry = self._entries.get(dog_id)
+            if entry is not None:
+                self._entries.move_to_end(dog_id)
+                if time.monotonic() < entry[1]:
+                    self.hits += 1
+                    return entry[0]
+            self.misses += 1
+
+        status = build_led_status(dog_id)
+        previous = entry[0] if entry is not None else None
+        if previous is not None and previous.status == status:
+            # Content unchanged, keep the original Last-Modified
+            snapshot = StatusSnapshot(status, previous.last_modified, previous.changed_at)
+        else:
+            # HTTP dates have one-second resolution: a second change within the same
+            # second goes without Last-Modified, so If-Modified-Since can't match it
+            changed_at = int(time.time())
+            dated = previous is None or changed_at > previous.changed_at
+            snapshot = StatusSnapshot(status, changed_at if dated else None, changed_at)
+
+        with self._lock:
+            self._entries[dog_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(dog_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, dog_id: int = DEFAULT_DOG_ID):
+        with self._lock:
+            entry = self._entries.get(dog_id)
+            if entry is not None:
+                self._entries[dog_id] = (entry[0], 0.0)
+
+    def invalidate_all(self):
+        with self._lock:
+            for dog_id, entry in self._entries.items():
+                self._entries[dog_id] = (entry[0], 0.0)
+
+
+def build_led_status(dog_id: int = DEFAULT_DOG_ID) -> LEDStatus:
+    """Compute the LED status for both event types of one dog"""
+    pee_status = get_status_for_type("pee", dog_id)
+    poo_status = get_status_for_type("poo", dog_id)
+
+    # Values computed here already have the right types; skip validation
+    return LEDStatus.model_construct(
+        pee=pee_status["color"],
+        poo=poo_status["color"],
+        pee_alarm=pee_status["alarm"],
+        poo_alarm=poo_status["alarm"],
+        pee_time_since=float(pee_status["time_since"]),
+        poo_time_since=float(poo_status["time_since"]),
+        pee_percentage=float(pee_status["percentage"]),
+        poo_percentage=float(poo_status["percentage"])
+    )
+
+
+status_cache = StatusSnapshotCache(settings.STATUS_CACHE_TTL, STATUS_CACHE_MAX_DOGS)
+
+
+# ===== STATUS BROADCASTER =====
+# One shared fan-out for push subscribers. A status is published when an event
+# is logged, or when the periodic check sees an LED color or alarm change.
+# Each subscriber has a single-slot queue: a slow client only ever receives the
+# newest status, older undelivered ones are dropped.
+
+def _status_signature(status: LEDStatus) -> tuple:
+    """The parts of a status that devices actually display"""
+    return (
+        tuple(status.pee.values()), tuple(status.poo.values()),
+        status.pee_alarm, status.poo_alarm
+    )
+
+
+def _content_version(signature: tuple) -> int:
+    """Status version that every process computes identically for the same display"""
+    return int.from_bytes(hashlib.blake2b(repr(signature).encode(), digest_size=6).digest(), "big")
+
+
+class StatusBroadcaster:
+    """
+    Fan-out of status changes, grouped by dog: push subscribers (SSE) get the
+    new snapshot, long-poll waiters are woken through a per-dog condition.
+    Every change bumps the dog's status version.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._conditions: Dict[int, asyncio.Condition] = {}
+        self._waiting: Dict[int, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._last_signature: Dict[int, tuple] = {}
+        # Versions come from one counter seeded with the start time, so they keep
+        # increasing across restarts and a stale `since` never matches. Cluster
+        # workers derive them from the displayed status instead, so a client can
+        # long-poll any worker with the version another one returned.
+        self._counter = int(time.time() * 1000)
+        self._content_versions = CLUSTER_ROLE == "worker"
+        self._versions: Dict[int, int] = {}
+        self._loading: Set[int] = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    @property
+    def waiter_count(self) -> int:
+        return sum(self._waiting.values())
+
+    def _watched(self, dog_id: int) -> bool:
+        return dog_id in self._subscribers or dog_id in self._conditions
+
+    def start(self):
+        """Bind to the running event loop (called on startup)"""
+        self._loop = asyncio.get_running_loop()
+
+    def notify(self, dog_id: int):
+        """Signal that a dog's status changed; safe to call from any thread"""
+        if self._loop is None or dog_id not in self._versions:
+            return
+        self._loop.call_soon_threadsafe(self._refresh, dog_id, True)
+
+    def notify_all(self):
+        """Signal that every tracked dog's status may have changed"""
+        for dog_id in list(self._versions):
+            self.notify(dog_id)
+
+    def version(self, dog_id: int) -> int:
+        """Current status version, first catching up on any change since the last look"""
+        self._refresh(dog_id)
+        return self._versions[dog_id]
+
+    def _refresh(self, dog_id: int, force: bool = False):
+        if not self._watched(dog_id) and force and not self._content_versions:
+            # Nobody is listening: just move the version, the snapshot is built on the next look
+            self._bump(dog_id)
+            self._last_signature.pop(dog_id, None)
+            return
+        if dog_id in self._versions and not interval_stats.is_loaded(dog_id):
+            # Evicted since the last look: read it back on the DB executor, not on the loop
+            if dog_id not in self._loading:
+                self._loading.add(dog_id)
+                asyncio.ensure_future(self._load_and_refresh(dog_id, force))
+            return
+        snapshot = status_cache.get(dog_id)
+        signature = _status_signature(snapshot.status)
+        previous = self._last_signature.get(dog_id)
+        self._last_signature[dog_id] = signature
+        if dog_id not in self._versions:
+            self._versions[dog_id] = _content_version(signature) if self._content_versions else self._counter
+            return
+        if not force and (previous is None or signature == previous):
+            return
+        self._bump(dog_id, signature)
+        self._publish(dog_id, snapshot)
+
+    async def _load_and_refresh(self, dog_id: int, force: bool):
+        try:
+            await ensure_dog_loaded(dog_id)
+        except Exception as e:
+            logger.error(f"Status broadcaster: loading dog {dog_id} failed: {e}")
+            return
+        finally:
+            self._loading.discard(dog_id)
+        # Evicted again already: the next notify or tick tries again
+        if interval_stats.is_loaded(dog_id):
+            self._refresh(dog_id, force)
+
+    def _bump(self, dog_id: int, signature: Optional[tuple] = None):
+        if self._content_versions and signature is not None:
+            version = _content_version(signature)
+            if version == self._versions.get(dog_id):
+                return
+        else:
+            self._counter += 1
+            version = self._counter
+        self._versions[dog_id] = version
+        if dog_id in self._conditions:
+            asyncio.ensure_future(self._wake(dog_id))
+
+    async def _wake(self, dog_id: int):
+        condition = self._conditions.get(dog_id)
+        if condition is not None:
+            async with condition:
+                condition.notify_all()
+
+    def _publish(self, dog_id: int, snapshot: StatusSnapshot):
+        self.published += 1
+        for subscriber in self._subscribers.get(dog_id, ()):
+            if subscriber.full():
+                subscriber.get_nowait()
+                self.dropped += 1
+            subscriber.put_nowait(snapshot)
+
+    def _ensure_ticker(self):
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._tick())
+
+    def _stop_ticker_if_idle(self):
+        if not self._subscribers and not self._conditions and self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+
+    async def _tick(self):
+        # Catches LED color / alarm flips that happen just because time passes
+        while self._subscribers or self._conditions:
+            await asyncio.sleep(self.check_interval)
+            for dog_id in set(self._subscribers) | set(self._conditions):
+                self._refresh(dog_id)
+
+    @asynccontextmanager
+    async def subscribe(self, dog_id: int):
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.version(dog_id)
+        self._subscribers.setdefault(dog_id, set()).add(subscriber)
+        self._ensure_ticker()
+        try:
+            yield subscriber
+        finally:
+            subscribers = self._subscribers.get(dog_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[dog_id]
+            self._stop_ticker_if_idle()
+
+    async def wait_for_change(self, dog_id: int, since: int, timeout: float) -> int:
+        """Park until the dog's version differs from `since` or the timeout passes; returns the version"""
+        if self.version(dog_id) != since or timeout <= 0:
+            return self._versions[dog_id]
+
+        condition = self._conditions.get(dog_id)
+        if condition is None:
+            condition = self._conditions[dog_id] = asyncio.Condition()
+        self._waiting[dog_id] = self._waiting.get(dog_id, 0) + 1
+        self._ensure_ticker()
+        try:
+            async with condition:
+                await asyncio.wait_for(condition.wait_for(lambda: self._versions[dog_id] != since), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiting[dog_id] -= 1
+            if not self._waiting[dog_id]:
+                del self._waiting[dog_id]
+                del self._conditions[dog_id]
+            self._stop_ticker_if_idle()
+        return self._versions[dog_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscriber_count,
+            "long_poll_waiters": self.waiter_count,
+            "dogs": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+
+status_broadcaster = StatusBroadcaster(settings.STATUS_STREAM_CHECK_INTERVAL)
+
+
+# ===== ALARM SCHEDULER =====
+# Given the last event and the average interval, the moment each threshold is
+# crossed is known in advance. Crossing times for every dog and event type sit
+# in one heap and a single task sleeps until the earliest, so alarms fire on
+# time, exactly once, without polling or queries.
+
+webhook_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alarm-webhook")
+
+
+def post_alarm_webhook(url: str, alarm: Dict[str, Any], attempts: int = 3):
+    """POST an alarm as JSON, retrying with a short backoff"""
+    import urllib.request
+
+    body = json.dumps(alarm).encode()
+    for attempt in range(1, attempts + 1):
+        try:
+            request = urllib.request.Request(url, data=body, method="POST",
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=config.current.ALARM_WEBHOOK_TIMEOUT) as response:
+                response.read()
+            return True
+        except Exception as e:
+            logger.warning(f"Alarm webhook {url} failed (attempt {attempt}/{attempts}): {e}")
+            if attempt < attempts:
+                time.sleep(attempt)
+    alarm_scheduler.webhook_failures += 1
+    return False
+
+
+class AlarmScheduler:
+    """Deadline heap of threshold crossings per (dog, event type)"""
+
+    def __init__(self, thresholds: List[int]):
+        self.thresholds = thresholds
+        self._heap: List[tuple] = []  # (deadline, seq, dog_id, event_type, threshold, generation)
+        self._generation: Dict[tuple, int] = {}  # bumping it orphans a subject's queued entries
+        self._fired: Dict[tuple, tuple] = {}  # subject -> (last_event, thresholds already fired)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.recent: deque = deque(maxlen=100)
+        self.fired = 0
+        self.webhook_failures = 0
+
+    def _schedule(self, dog_id: int, event_type: str, last_event: Optional[int], average: float,
+                  now: float, skip_past: bool = False):
+        """Queue this subject's upcoming crossings (caller holds the lock)"""
+        subject = (dog_id, event_type)
+        generation = self._generation.get(subject, 0) + 1
+        self._generation[subject] = generation
+        if last_event is None:
+            # No events yet: status is already urgent, there is nothing to cross
+            self._fired.pop(subject, None)
+            return
+
+        fired = self._fired.get(subject)
+        new_last_event = fired is None or fired[0] != last_event
+        if new_last_event:
+            fired = self._fired[subject] = (last_event, set())
+        deadlines = {threshold: last_event + average * 3600 * threshold / 100
+                     for threshold in self.thresholds if threshold not in fired[1]}
+        passed = [threshold for threshold, deadline in deadlines.items() if deadline <= now]
+        if passed:
+            # Crossed while the server was down, or by a back-dated event: that happened
+            # in the past, don't announce it late. With the same last event the average
+            # moved and they are crossed now, but only the highest one is news.
+            announce = None if skip_past or new_last_event else max(passed)
+            fired[1].update(threshold for threshold in passed if threshold != announce)
+        for threshold, deadline in deadlines.items():
+            if threshold not in fired[1]:
+                heapq.heappush(self._heap, (deadline, next(self._seq), dog_id, event_type, threshold, generation))
+
+        # Superseded entries are dropped lazily; rebuild if they start to dominate
+        if len(self._heap) > 8 * len(self._generation) + 1024:
+            self._heap = [entry for entry in self._heap
+                          if entry[5] == self._generation.get((entry[2], entry[3]))]
+            heapq.heapify(self._heap)
+
+    def _wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def reschedule(self, dog_id: int):
+        """Recompute a dog's crossings from the in-memory stats (after an insert)"""
+        if not interval_stats.is_loaded(dog_id):
+            # Don't block the caller on a stats load; one grouped query on the DB executor instead
+            db_executor.submit(self.load, [dog_id], False)
+            return
+        now = time.time()
+        snapshots = [(event_type,) + interval_stats.snapshot(dog_id, event_type, now) for event_type in ("pee", "poo")]
+        with self._lock:
+            for event_type, last_event, average in snapshots:
+                self._schedule(dog_id, event_type, last_event, average, now)
+        self._wake()
+
+    def load(self, dog_ids: List[int], skip_past: bool = True):
+        """Schedule many dogs at once from one grouped query (startup / config change)"""
+        now = time.time()
+        rows = fetch_bulk_interval_rows(dog_ids, STATS_WINDOW_DAYS)
+        predicted = predicted_intervals(rows)
+        with self._lock:
+            for index, (dog_id, event_type, count, first, window_last, last_event) in enumerate(rows):
+                if predicted is not None:
+                    average = predicted[index]
+                elif count >= 2:
+                    average = (window_last - first) / 3600 / (count - 1)
+                else:
+                    average = default_interval(event_type)
+                self._schedule(dog_id, event_type, last_event, average, now, skip_past)
+        self._wake()
+        logger.info(f"Alarm scheduler loaded {len(dog_ids)} dogs, {len(self._heap)} pending crossings")
+
+    def start(self):
+        """Start the timer task on the running loop (called on startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                next_deadline = self._heap[0][0] if self._heap else None
+            timeout = None if next_deadline is None else max(0.0, next_deadline - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self._fire_due(time.time())
+            except Exception as e:
+                logger.error(f"Alarm scheduler error: {e}", exc_info=True)
+
+    def _fire_due(self, now: float):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if entry[5] == self._generation.get((entry[2], entry[3])):
+                    due.append(entry)
+
+        for deadline, _, dog_id, event_type, threshold, generation in due:
+            subject = (dog_id, event_type)
+            last_event, average = None, None
+            if interval_stats.is_loaded(dog_id):
+                # The average drifts as old events leave the window; re-check before firing
+                last_event, average = interval_stats.snapshot(dog_id, event_type, now)
+                actual = last_event + average * 3600 * threshold / 100 if last_event is not None else None
+                if actual is not None and actual > now + 1:
+                    with self._lock:
+                        if generation == self._generation.get(subject):
+                            heapq.heappush(self._heap, (actual, next(self._seq), dog_id, event_type, threshold, generation))
+                    continue
+            with self._lock:
+                fired = self._fired.get(subject)
+                if fired is None or threshold in fired[1]:
+                    continue
+                fired[1].add(threshold)
+                last_event = fired[0]
+            self._fire(dog_id, event_type, threshold, last_event, average, deadline)
+
+    def _fire(self, dog_id: int, event_type: str, threshold: int, last_event: int,
+              average: Optional[float], deadline: float):
+        alarm = {
+            "dog_id": dog_id,
+            "event_type": event_type,
+            "threshold": threshold,
+            "alarm": threshold >= ALARM_PERCENTAGE,
+            "crossed_at": epoch_to_iso(int(deadline)),
+            "last_event": epoch_to_iso(last_event),
+            "average_interval_hours": round(average, 2) if average is not None else None
+        }
+        self.fired += 1
+        self.recent.append(alarm)
+        if alarm["alarm"]:
+            logger.warning(f"Dog {dog_id} {event_type} alarm triggered! {threshold}% of the average interval since {alarm['last_event']}")
+        else:
+            logger.info(f"Dog {dog_id} {event_type} reached {threshold}% of the average interval")
+
+        # Devices watching this dog get the new color right at the crossing
+        status_cache.invalidate(dog_id)
+        status_broadcaster.notify(dog_id)
+        for url in config.current.ALARM_WEBHOOK_URLS:
+            webhook_executor.submit(post_alarm_webhook, url, alarm)
+
+    def upcoming(self, dog_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(entry for entry in self._heap
+                             if entry[5] == self._generation.get((entry[2], entry[3]))
+                             and (dog_id is None or entry[2] == dog_id))
+        return [{"dog_id": entry[2], "event_type": entry[3], "threshold": entry[4],
+                 "at": epoch_to_iso(int(entry[0]))} for entry in entries]
+
+    def overview(self, dog_id: Optional[int] = None) -> Dict[str, Any]:
+        """Upcoming crossings and the most recently fired alarms, newest first"""
+        recent = [alarm for alarm in self.recent if dog_id is None or alarm["dog_id"] == dog_id]
+        return {"thresholds": self.thresholds, "upcoming": self.upcoming(dog_id), "recent": recent[::-1]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = len(self._heap)
+        return {"queued": queued, "fired": self.fired, "webhook_failures": self.webhook_failures}
+
+
+alarm_scheduler = AlarmScheduler(settings.ALARM_THRESHOLDS)
+
+
+def notify_status_changed(dog_id: int):
+    """Invalidate a dog's cached status, push the new one to its subscribers and reschedule its alarms"""
+    status_cache.invalidate(dog_id)
+    analytics_cache.invalidate(dog_id)
+    status_broadcaster.notify(dog_id)
+    alarm_scheduler.reschedule(dog_id)
+    if cluster_coordinator is not None:
+        cluster_coordinator.publish_changed(dog_id)
+
+
+def apply_config_change(old: Settings, new: Settings, changed: List[str]):
+    """Push hot-reloaded settings into the long-lived objects that cache them"""
+    if "LOG_LEVEL" in changed:
+        logging.getLogger().setLevel(getattr(logging, new.LOG_LEVEL))
+    if "STATUS_CACHE_TTL" in changed:
+        status_cache.ttl = new.STATUS_CACHE_TTL
+    if "STATUS_STREAM_CHECK_INTERVAL" in changed:
+        status_broadcaster.check_interval = new.STATUS_STREAM_CHECK_INTERVAL
+    if "DEFAULT_PEE_INTERVAL" in changed or "DEFAULT_POO_INTERVAL" in changed:
+        # Dogs without enough history fall back to these, so their LEDs may change
+        status_cache.invalidate_all()
+        status_broadcaster.notify_all()
+        if CLUSTER_ROLE != "worker":
+            db_executor.submit(alarm_scheduler.load, dog_registry.ids(), False)
+
+
+config.on_change(apply_config_change)
+
+
+def format_sse(snapshot: StatusSnapshot) -> bytes:
+    return b"event: status\nid: " + snapshot.etag.strip('"').encode() + b"\ndata: " + snapshot.body + b"\n\n"
+
+
+# ===== DATA ACCESS =====
+# sqlite3 is blocking, so endpoints never touch it directly. All queries live in
+# the synchronous helpers below and run on a dedicated executor sized to the
+# connection pool via run_db(), keeping the event loop free for status polls.
+
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database helper on the DB executor (keeping the request id for its log lines)"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+@timed("check_db")
+def check_db() -> bool:
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        return cursor.fetchone() is not None
+
+
+def find_event_by_key(cursor: sqlite3.Cursor, device_id: str, sequence: int, timestamp: int) -> Optional[int]:
+    """Id of the event already stored under a (device_id, sequence) key, in SQLite or the archive"""
+    cursor.execute("SELECT id FROM events WHERE device_id = ? AND client_seq = ?", (device_id, sequence))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    # Only months before the boundary are archived, so live events never touch it
+    if timestamp < event_archive.boundary:
+        return event_archive.find_key(device_id, sequence)
+    return None
+
+
+@timed("insert_events")
+def insert_events(rows: List[tuple], ids: Optional[List[int]] = None) -> List[tuple]:
+    """
+    Insert (dog_id, event_type, timestamp, device_id, sequence) rows in one transaction.
+    Rows whose (device_id, sequence) key already exists, in the table, the archive
+    or earlier in the same batch, are skipped. Returns (event_id, created) per row.
+    `ids` pre-assigns the row ids (ingest journal); otherwise SQLite picks them.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            results: List[Optional[tuple]] = [None] * len(rows)
+            new_rows = []
+            new_indexes = []
+            pending_keys: Dict[tuple, int] = {}  # key -> position in new_rows
+            models: Dict[tuple, Dict[str, Any]] = {}  # (dog_id, event_type) -> updated predictor state
+            batch_duplicates: Dict[int, int] = {}  # row index -> position in new_rows
+
+            for index, (dog_id, event_type, timestamp, device_id, sequence) in enumerate(rows):
+                if device_id is not None and sequence is not None:
+                    key = (device_id, sequence)
+                    if key in pending_keys:
+                        batch_duplicates[index] = pending_keys[key]
+                        continue
+                    existing = find_event_by_key(cursor, device_id, sequence, timestamp)
+                    if existing is not None:
+                        results[index] = (existing, False)
+                        continue
+                    pending_keys[key] = len(new_rows)
+                new_indexes.append(index)
+                new_rows.append((dog_id, event_type, timestamp, device_id, sequence))
+
+            if new_rows:
+                if ids is not None:
+                    new_ids = [ids[index] for index in new_indexes]
+                    cursor.executemany("""
+                        INSERT INTO events (id, dog_id, event_type, timestamp, device_id, client_seq)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, [(row_id,) + row for row_id, row in zip(new_ids, new_rows)])
+                else:
+                    cursor.executemany("""
+                        INSERT INTO events (dog_id, event_type, timestamp, device_id, client_seq)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, new_rows)
+                    # Rows inserted by one statement inside a write transaction get consecutive ids
+                    cursor.execute("SELECT last_insert_rowid()")
+                    first_id = cursor.fetchone()[0] - len(new_rows) + 1
+                    new_ids = list(range(first_id, first_id + len(new_rows)))
+                for position, index in enumerate(new_indexes):
+                    results[index] = (new_ids[position], True)
+                for index, position in batch_duplicates.items():
+                    results[index] = (new_ids[position], False)
+
+                touched: Dict[tuple, List[int]] = {}
+                for dog_id, event_type, timestamp, _, _ in new_rows:
+                    touched.setdefault((dog_id, event_type), []).append(timestamp)
+                for (dog_id, event_type), timestamps in touched.items():
+                    refresh_rollups(cursor, dog_id, event_type, timestamps)
+                    if predictor is not None:
+                        models[(dog_id, event_type)] = update_predictor_state(cursor, dog_id, event_type, timestamps)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    if models:
+        interval_stats.set_models(models)
+
+    for event_type in ("pee", "poo"):
+        created = sum(1 for row in new_rows if row[1] == event_type)
+        if created:
+            events_ingested.inc(event_type, amount=created)
+    return results
+
+
+def insert_event(dog_id: int, event_type: str, timestamp: int,
+                 device_id: Optional[str] = None, sequence: Optional[int] = None):
+    """Insert a single event, returns (event_id, created)"""
+    return insert_events([(dog_id, event_type, timestamp, device_id, sequence)])[0]
+
+
+def encode_cursor(timestamp: int, row_id: int) -> str:
+    """Opaque keyset cursor pointing just after (timestamp, id) in descending order"""
+    return f"{timestamp}.{row_id}"
+
+
+def decode_cursor(cursor: str) -> tuple:
+    timestamp, row_id = cursor.split(".")
+    return int(timestamp), int(row_id)
+
+
+@timed("fetch_events")
+def fetch_events(dog_id: int, event_type: Optional[str], cutoff: int, limit: int,
+                 before: Optional[tuple] = None):
+    """
+    Newest-first events since cutoff, continuing after the `before` (timestamp, id) key.
+    Returns (rows, next_cursor) with rows laid out as EVENT_COLUMNS; next_cursor is None on the last page.
+    """
+    conditions = ["dog_id = ?", "timestamp >= ?"]
+    params: List[Any] = [dog_id, cutoff]
+    if event_type:
+        conditions.append("event_type = ?")
+        params.append(event_type)
+    if before is not None:
+        conditions.append("(timestamp, id) < (?, ?)")
+        params.extend(before)
+    params.append(limit)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"""
+            SELECT id, event_type, strftime('%Y-%m-%dT%H:%M:%S', timestamp, 'unixepoch', 'localtime'),
+                   created_at, device_id, client_seq, dog_id, timestamp
+            FROM events
+            WHERE {" AND ".join(conditions)}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        """, params)
+        rows = cursor.fetchall()
+
+    if cutoff < event_archive.boundary:
+        rows = sorted(rows + event_archive.fetch(dog_id, event_type, cutoff, limit, before),
+                      key=lambda row: (row[7], row[0]), reverse=True)[:limit]
+
+    next_cursor = encode_cursor(rows[-1][7], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_cursor
+
+
+@timed("window_stats")
+def window_stats(dog_id: int, cutoff: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Per event type counts and interval statistics for everything since cutoff.
+    Whole days come from rollup_daily, whole hours before the first day
+    boundary from rollup_hourly, and only the partial hour at the start of
+    the window is read from the raw tables.
+    """
+    first_hour = -(-cutoff // 3600) * 3600
+    first_day = -(-cutoff // 86400) * 86400
+    totals = {
+        event_type: {"count": 0, "interval_count": 0, "interval_sum": 0,
+                      "interval_min": None, "interval_max": None, "accidents": 0}
+        for event_type in ("pee", "poo")
+    }
+
+    def merge(event_type, count, interval_count, interval_sum, interval_min, interval_max, accidents):
+        entry = totals[event_type]
+        entry["count"] += count or 0
+        entry["interval_count"] += interval_count or 0
+        entry["interval_sum"] += interval_sum or 0
+        entry["accidents"] += accidents or 0
+        if interval_min is not None:
+            entry["interval_min"] = interval_min if entry["interval_min"] is None else min(entry["interval_min"], interval_min)
+        if interval_max is not None:
+            entry["interval_max"] = interval_max if entry["interval_max"] is None else max(entry["interval_max"], interval_max)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        # Raw tail: the partial hour at the start of the window
+        if cutoff < first_hour:
+            for event_type in ("pee", "poo"):
+                cursor.execute("""
+                    SELECT MAX(timestamp) FROM events
+                    WHERE dog_id = ? AND event_type = ? AND timestamp < ?
+                """, (dog_id, event_type, cutoff))
+                previous = cursor.fetchone()[0]
+                cursor.execute("""
+                    SELECT timestamp FROM events
+                    WHERE dog_id = ? AND event_type = ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp
+                """, (dog_id, event_type, cutoff, first_hour))
+                intervals = []
+                timestamps = event_archive.merge_timestamps(dog_id, event_type, cutoff, first_hour,
+                                                            [row[0] for row in cursor.fetchall()])
+                previous = event_archive.merge_previous(dog_id, event_type, cutoff, previous)
+                for timestamp in timestamps:
+                    if previous is not None:
+                        intervals.append(timestamp - previous)
+                    previous = timestamp
+                cursor.execute("""
+                    SELECT COUNT(*) FROM accidents
+                    WHERE dog_id = ? AND event_type = ? AND estimated_time >= ? AND estimated_time < ?
+                """, (dog_id, event_type, cutoff, first_hour))
+                merge(event_type, len(timestamps), len(intervals), sum(intervals),
+                      min(intervals) if intervals else None, max(intervals) if intervals else None,
+                      cursor.fetchone()[0])
+
+        # Whole hours up to the first day boundary, then whole days
+        for table, start, end in (("rollup_hourly", first_hour, first_day), ("rollup_daily", first_day, None)):
+            if end is not None and start >= end:
+                continue
+            cursor.execute(f"""
+                SELECT event_type, SUM(event_count), SUM(interval_count), SUM(interval_sum),
+                       MIN(interval_min), MAX(interval_max), SUM(accident_count)
+                FROM {table}
+                WHERE dog_id = ? AND bucket >= ? {"AND bucket < ?" if end is not None else ""}
+                GROUP BY event_type
+            """, (dog_id, start, end) if end is not None else (dog_id, start))
+            for row in cursor.fetchall():
+                if row[0] in totals:
+                    merge(*row)
+
+    return totals
+
+
+@timed("insert_accidents")
+def insert_accidents(rows: List[tuple], ids: Optional[List[int]] = None) -> List[int]:
+    """Insert (dog_id, event_type, estimated_time, location, notes) rows in one transaction, returns their ids"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            accident_ids = []
+            for index, (dog_id, event_type, estimated_time, location, notes) in enumerate(rows):
+                cursor.execute("""
+                    INSERT INTO accidents (id, dog_id, event_type, estimated_time, location, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (ids[index] if ids is not None else None, dog_id, event_type, estimated_time, location, notes))
+                accident_ids.append(cursor.lastrowid)
+                refresh_rollups(cursor, dog_id, event_type, [estimated_time], events_changed=False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return accident_ids
+
+
+def insert_accident(dog_id: int, event_type: str, estimated_time: int, location: str, notes: Optional[str]) -> int:
+    return insert_accidents([(dog_id, event_type, estimated_time, location, notes)])[0]
+
+
+@timed("fetch_accidents")
+def fetch_accidents(dog_id: int, cutoff: int, limit: Optional[int] = None,
+                    before: Optional[tuple] = None):
+    """
+    Newest-first accidents since cutoff, continuing after the `before` (estimated_time, id) key.
+    Returns (rows, next_cursor) with rows laid out as ACCIDENT_COLUMNS; next_cursor is None
+    on the last page or without a limit.
+    """
+    conditions = ["dog_id = ?", "estimated_time >= ?"]
+    params: List[Any] = [dog_id, cutoff]
+    if before is not None:
+        conditions.append("(estimated_time, id) < (?, ?)")
+        params.extend(before)
+    params.append(limit if limit is not None else -1)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"""
+            SELECT id, event_type, strftime('%Y-%m-%dT%H:%M:%S', estimated_time, 'unixepoch', 'localtime'),
+                   location, notes, created_at, dog_id, estimated_time
+            FROM accidents
+            WHERE {" AND ".join(conditions)}
+            ORDER BY estimated_time DESC, id DESC
+            LIMIT ?
+        """, params)
+        rows = cursor.fetchall()
+
+    next_cursor = encode_cursor(rows[-1][7], rows[-1][0]) if limit is not None and len(rows) == limit else None
+    return rows, next_cursor
+
+
+def insert_household(name: str) -> Dict[str, Any]:
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO households (name) VALUES (?)", (name,))
+        conn.commit()
+        cursor.execute("SELECT * FROM households WHERE id = ?", (cursor.lastrowid,))
+        return dict(cursor.fetchone())
+
+
+def fetch_households() -> List[Dict[str, Any]]:
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT h.*, COUNT(d.id) AS dog_count
+            FROM households h LEFT JOIN dogs d ON d.household_id = h.id
+            GROUP BY h.id
+            ORDER BY h.id
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def insert_dog(name: str, household_id: int) -> Optional[Dict[str, Any]]:
+    """Create a dog, returns None if the household does not exist"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM households WHERE id = ?", (household_id,))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("INSERT INTO dogs (household_id, name) VALUES (?, ?)", (household_id, name))
+        conn.commit()
+        cursor.execute("SELECT * FROM dogs WHERE id = ?", (cursor.lastrowid,))
+        return dict(cursor.fetchone())
+
+
+def fetch_dogs(household_id: Optional[int]) -> List[Dict[str, Any]]:
+    with get_db() as conn:
+        cursor = conn.cursor()
+        if household_id is not None:
+            cursor.execute("SELECT * FROM dogs WHERE household_id = ? ORDER BY id", (household_id,))
+        else:
+            cursor.execute("SELECT * FROM dogs ORDER BY id")
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@timed("fetch_bulk_interval_rows")
+def fetch_bulk_interval_rows(dog_ids: List[int], window_days: int) -> List[tuple]:
+    """
+    Per (dog, event_type): events in the window, first and last event in the
+    window, and the last event overall. One grouped query covers the window;
+    only pairs without events in the window need a second lookup.
+    """
+    cutoff = to_epoch(datetime.now() - timedelta(days=window_days))
+    dog_list = json.dumps(dog_ids)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT dog_id, event_type, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM events
+            WHERE dog_id IN (SELECT value FROM json_each(?)) AND timestamp >= ?
+            GROUP BY dog_id, event_type
+        """, (dog_list, cutoff))
+        rows = {(row[0], row[1]): (row[2], row[3], row[4], row[4]) for row in cursor.fetchall()}
+
+        missing = [dog_id for dog_id in dog_ids if (dog_id, "pee") not in rows or (dog_id, "poo") not in rows]
+        if missing:
+            cursor.execute("""
+                SELECT dog_id, event_type, MAX(timestamp)
+                FROM events
+                WHERE dog_id IN (SELECT value FROM json_each(?))
+                GROUP BY dog_id, event_type
+            """, (json.dumps(missing),))
+            for dog_id, event_type, last_event in cursor.fetchall():
+                rows.setdefault((dog_id, event_type), (0, None, None, last_event))
+
+    return [
+        (dog_id, event_type) + rows.get((dog_id, event_type), (0, None, None, None))
+        for dog_id in dog_ids for event_type in ("pee", "poo")
+    ]
+
+
+@timed("predicted_intervals")
+def predicted_intervals(rows: List[tuple]) -> Optional[List[float]]:
+    """
+    The configured predictor's interval for each fetch_bulk_interval_rows row,
+    from the persisted states in one query. States that are missing or stale
+    go through the interval stats store, which replays and re-saves them.
+    Returns None when PREDICTOR is "mean" (callers use the window rows).
+    """
+    if predictor is None:
+        return None
+    dog_ids = list(dict.fromkeys(row[0] for row in rows))
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT dog_id, event_type, last_event, state FROM predictor_state
+            WHERE predictor = ? AND dog_id IN (SELECT value FROM json_each(?))
+        """, (predictor.key, json.dumps(dog_ids)))
+        states = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+
+    predicted = []
+    for dog_id, event_type, _, _, _, last_event in rows:
+        stored = states.get((dog_id, event_type))
+        if stored is not None and stored[0] == last_event:
+            predicted.append(predictor.estimate(json.loads(stored[1]), last_event, default_interval(event_type)))
+        else:
+            predicted.append(interval_stats.snapshot(dog_id, event_type)[1])
+    return predicted
+
+
+def compute_bulk_status(dog_ids: List[int], now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    LED status for many dogs in one vectorized pass.
+    Mirrors get_status_for_type / calculate_led_color element-wise.
+    """
+    import numpy as np
+
+    now = now if now is not None else time.time()
+    rows = fetch_bulk_interval_rows(dog_ids, STATS_WINDOW_DAYS)
+    predicted = predicted_intervals(rows)
+    result: Dict[str, Any] = {"dog_ids": dog_ids, "count": len(dog_ids)}
+
+    for offset, event_type in enumerate(("pee", "poo")):
+        typed = rows[offset::2]
+        count = np.array([row[2] for row in typed], dtype=np.float64)
+        first = np.array([row[3] if row[3] is not None else np.nan for row in typed], dtype=np.float64)
+        window_last = np.array([row[4] if row[4] is not None else np.nan for row in typed], dtype=np.float64)
+        last = np.array([row[5] if row[5] is not None else np.nan for row in typed], dtype=np.float64)
+
+        default = default_interval(event_type)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if predicted is not None:
+                average = np.array(predicted[offset::2], dtype=np.float64)
+            else:
+                average = np.where(count >= 2, (window_last - first) / 3600 / (count - 1), default)
+            time_since = (now - last) / 3600
+            percentage = np.where(average > 0, time_since / average * 100, 0.0)
+
+        has_events = ~np.isnan(last)
+        # No events yet - show as urgent
+        time_since = np.where(has_events, time_since, 0.0)
+        percentage = np.where(has_events, percentage, 100.0)
+
+        red = np.where(percentage < 60, 0,
+                       np.where(percentage < 75, np.trunc(255 * ((percentage - 60) / 15)), 255))
+        green = np.where(percentage < 75, 255,
+                         np.where(percentage < 90, np.trunc(255 * (1 - (percentage - 75) / 15)), 0))
+
+        result[event_type] = {
+            "r": red.astype(np.int64).tolist(),
+            "g": green.astype(np.int64).tolist(),
+            "b": [0] * len(dog_ids),
+            "alarm": (percentage >= 90).tolist(),
+            "time_since": np.round(time_since, 2).tolist(),
+            "percentage": np.round(percentage, 1).tolist(),
+            "average_interval": np.round(average, 2).tolist()
+        }
+
+    return result
+
+
+async def ensure_dog_loaded(dog_id: int):
+    """Load a dog's interval stats on the DB executor so status reads stay in memory"""
+    if not interval_stats.is_loaded(dog_id):
+        await run_db(interval_stats.load, dog_id)
+
+
+# ===== ANALYTICS SERIES =====
+# Chart data for dashboards: hour-of-day histograms, per-day counts and mean
+# intervals with a linear trend, interval percentiles and accident rates. One
+# query per table loads the raw event and accident times of the window and the
+# rest is NumPy over those arrays. Results are memoized per (dog, days). The
+# window starts on a whole hour, so a cached result stays exact until the next
+# hour begins or the dog gets a new event or accident.
+
+INTERVAL_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def local_offsets(timestamps):
+    """UTC offset in seconds of local time at each epoch timestamp in an array"""
+    import numpy as np
+
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([calendar.timegm(time.localtime(int(hour) * 3600)) - int(hour) * 3600 for hour in hours],
+                       dtype=np.int64)
+    return offsets[inverse]
+
+
+@timed("analytics_series")
+def analytics_series(dog_id: int, start: int) -> Dict[str, Any]:
+    """Histograms, daily series, interval percentiles and accident rates for everything since start"""
+    import numpy as np
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT event_type, timestamp FROM events
+            WHERE dog_id = ? AND timestamp >= ?
+            ORDER BY timestamp
+        """, (dog_id, start))
+        events = cursor.fetchall()
+        cursor.execute("""
+            SELECT event_type, estimated_time FROM accidents
+            WHERE dog_id = ? AND estimated_time >= ?
+        """, (dog_id, start))
+        accidents = cursor.fetchall()
+        previous = {}
+        for event_type in ("pee", "poo"):
+            cursor.execute("""
+                SELECT MAX(timestamp) FROM events
+                WHERE dog_id = ? AND event_type = ? AND timestamp < ?
+            """, (dog_id, event_type, start))
+            previous[event_type] = event_archive.merge_previous(dog_id, event_type, start, cursor.fetchone()[0])
+
+    def split(rows):
+        kinds = np.array([row[0] for row in rows], dtype=object)
+        times = np.array([row[1] for row in rows], dtype=np.int64)
+        return {event_type: times[kinds == event_type] for event_type in ("pee", "poo")}
+
+    event_times, accident_times = split(events), split(accidents)
+    if start < event_archive.boundary:
+        for event_type in ("pee", "poo"):
+            archived = np.array(event_archive.timestamps(dog_id, event_type, start, 2 ** 62), dtype=np.int64)
+            event_times[event_type] = np.sort(np.concatenate((archived, event_times[event_type])))
+
+    # Local calendar days, numbered from the day the window starts
+    local_events = {event_type: times + local_offsets(times) for event_type, times in event_times.items()}
+    local_accidents = {event_type: times + local_offsets(times) for event_type, times in accident_times.items()}
+    bounds = np.array([start, int(time.time())], dtype=np.int64)
+    local_bounds = bounds + local_offsets(bounds)
+    first_day = int(local_bounds[0]) // 86400
+    last_day = max([int(local_bounds[1]) // 86400] + [int(times.max()) // 86400 for times in
+                                                       (*local_events.values(), *local_accidents.values()) if len(times)])
+    days = last_day - first_day + 1
+
+    result = {
+        "days": [(datetime(1970, 1, 1) + timedelta(days=first_day + offset)).date().isoformat() for offset in range(days)]
+    }
+    for event_type in ("pee", "poo"):
+        times, local = event_times[event_type], local_events[event_type]
+        accident_local = local_accidents[event_type]
+        # Clamped because a DST fall-back right after start can map an event to the day before
+        day_index = np.maximum(local // 86400 - first_day, 0)
+        accident_day_index = np.maximum(accident_local // 86400 - first_day, 0)
+
+        chained = times if previous[event_type] is None else np.concatenate(([previous[event_type]], times))
+        intervals = np.diff(chained) / 3600
+        interval_days = day_index[len(day_index) - len(intervals):]
+        interval_count = np.bincount(interval_days, minlength=days)
+        interval_sum = np.bincount(interval_days, weights=intervals, minlength=days)
+        daily_average = np.divide(interval_sum, interval_count, out=np.full(days, np.nan), where=interval_count > 0)
+
+        trend = None
+        with_intervals = np.nonzero(interval_count)[0]
+        if len(with_intervals) >= 2:
+            trend = round(float(np.polyfit(with_intervals, daily_average[with_intervals], 1)[0]), 3)
+
+        percentiles = None
+        if len(intervals):
+            percentiles = {f"p{pct}": round(float(value), 2)
+                           for pct, value in zip(INTERVAL_PERCENTILES, np.percentile(intervals, INTERVAL_PERCENTILES))}
+
+        result[event_type] = {
+            "count": len(times),
+            "accidents": len(accident_local),
+            "accident_rate": round(len(accident_local) / len(times), 3) if len(times) else None,
+            "hourly": np.bincount(local // 3600 % 24, minlength=24).tolist(),
+            "accident_hourly": np.bincount(accident_local // 3600 % 24, minlength=24).tolist(),
+            "interval_average_hours": round(float(intervals.mean()), 2) if len(intervals) else None,
+            "interval_percentiles_hours": percentiles,
+            "interval_trend_hours_per_day": trend,
+            "daily": {
+                "count": np.bincount(day_index, minlength=days).tolist(),
+                "accidents": np.bincount(accident_day_index, minlength=days).tolist(),
+                "average_interval_hours": [None if np.isnan(value) else value
+                                           for value in np.round(daily_average, 2).tolist()]
+            }
+        }
+    return result
+
+
+class AnalyticsCache:
+    """Memoized analytics_series results per (dog_id, days) (LRU), dropped when the dog gets new data"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (dog_id, days) -> (start, result)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dog_id: int, days: int) -> Dict[str, Any]:
+        start = (int(time.time()) // 3600 - days * 24) * 3600
+        key = (dog_id, days)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == start:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        result = analytics_series(dog_id, start)
+
+        with self._lock:
+            # An insert that landed while we were reading may not be in the result
+            if generation == self._generation:
+                self._entries[key] = (start, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, dog_id: int):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key[0] == dog_id]:
+                del self._entries[key]
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+analytics_cache = AnalyticsCache(ANALYTICS_CACHE_SIZE)
+
+
+# ===== INGEST JOURNAL =====
+# With INGEST_MODE=journal, writes don't wait for a SQLite commit. The journal
+# thread appends each group of submissions to an append-only file with one
+# write + fsync and acknowledges them; ids are assigned up front so the
+# response can carry them. The commit thread then inserts whatever has
+# accumulated in one transaction per INGEST_BATCH_MAX records. A record is
+# durable once acknowledged: on startup, anything in the journal that never
+# reached SQLite (matched by id) is committed before requests are served.
+# Acknowledged events show up in reads once the commit thread has caught up,
+# normally within a few milliseconds.
+
+class IngestJournal:
+    """Append-only journal in front of insert_events / insert_accidents"""
+
+    def __init__(self, path: str, fsync: bool, batch_max: int, commit_delay: float, max_bytes: int):
+        self.path = path
+        self.fsync = fsync
+        self.batch_max = batch_max
+        self.commit_delay = commit_delay
+        self.max_bytes = max_bytes
+        self._incoming: "queue.Queue" = queue.Queue()    # (kind, rows, future) from requests
+        self._committing: "queue.Queue" = queue.Queue()  # journaled records waiting for SQLite
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._next_ids = {"e": 0, "a": 0}
+        self._pending_keys: Dict[tuple, int] = {}  # (device_id, sequence) -> id, journaled but not committed
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self.written = 0
+        self.committed = 0
+        self.commits = 0
+        self.fsyncs = 0
+        self.replayed = 0
+
+    def recover(self):
+        """Commit whatever a previous run journaled but didn't get into SQLite (startup, any INGEST_MODE)"""
+        if not os.path.exists(self.path):
+            return
+        records = []
+        with open(self.path, "rb") as journal:
+            for number, line in enumerate(journal, 1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated")
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A crash mid-append leaves a torn last record; it was never acknowledged
+                    logger.warning(f"Ingest journal: ignoring torn record at line {number}")
+                    break
+        replayed = 0
+        for start in range(0, len(records), self.batch_max):
+            replayed += self._commit(records[start:start + self.batch_max])
+        self.replayed = replayed
+        if replayed:
+            logger.warning(f"Ingest journal: committed {replayed} records left over from the last run")
+        with open(self.path, "wb") as journal:
+            os.fsync(journal.fileno())
+
+    def start(self):
+        """Open the journal and start the journal and commit threads (after recover)"""
+        with get_db() as conn:
+            # sqlite_sequence remembers ids of rows that have since been archived
+            for kind, table in (("e", "events"), ("a", "accidents")):
+                self._next_ids[kind] = max(
+                    conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0,
+                    conn.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()[0] or 0
+                ) + 1
+        self._file = open(self.path, "ab")
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._journal_loop, name="ingest-journal", daemon=True),
+            threading.Thread(target=self._commit_loop, name="ingest-commit", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Ingest journal at {self.path} (fsync={self.fsync}, batch={self.batch_max})")
+
+    def stop(self):
+        """Journal and commit everything already submitted, then close the file"""
+        if not self._threads:
+            return
+        self._stopping = True
+        self._incoming.put(None)
+        self._threads[0].join()
+        self._committing.put(None)
+        self._threads[1].join()
+        self._threads = []
+        with self._file_lock:
+            if self.committed == self.written:
+                self._file.truncate(0)
+            self._file.close()
+            self._file = None
+
+    async def submit_events(self, rows: List[tuple]) -> List[tuple]:
+        """Journal (dog_id, event_type, timestamp, device_id, sequence) rows, returns (event_id, created) per row"""
+        future: "Future" = Future()
+        self._incoming.put(("e", rows, future))
+        return await asyncio.wrap_future(future)
+
+    async def submit_accidents(self, rows: List[tuple]) -> List[int]:
+        """Journal (dog_id, event_type, estimated_time, location, notes) rows, returns their ids"""
+        future: "Future" = Future()
+        self._incoming.put(("a", rows, future))
+        return await asyncio.wrap_future(future)
+
+    def _journal_loop(self):
+        while True:
+            batch = [self._incoming.get()]
+            while True:
+                try:
+                    batch.append(self._incoming.get_nowait())
+                except queue.Empty:
+                    break
+            submissions = [item for item in batch if item is not None]
+            if submissions:
+                self._append(submissions)
+            if len(submissions) != len(batch):
+                return
+
+    def _existing_event(self, cursor: sqlite3.Cursor, device_id: Optional[str], sequence: Optional[int],
+                        timestamp: int):
+        if device_id is None or sequence is None:
+            return None
+        with self._lock:
+            pending = self._pending_keys.get((device_id, sequence))
+        if pending is not None:
+            return pending
+        return find_event_by_key(cursor, device_id, sequence, timestamp)
+
+    def _append(self, submissions: List[tuple]):
+        """Assign ids, write and fsync one group of submissions, then acknowledge them"""
+        records: List[list] = []
+        replies = []
+        keys = []
+        try:
+            with get_db() as conn:
+                cursor = conn.cursor()
+                for kind, rows, future in submissions:
+                    results = []
+                    for row in rows:
+                        if kind == "e":
+                            existing = self._existing_event(cursor, row[3], row[4], row[2])
+                            if existing is not None:
+                                results.append((existing, False))
+                                continue
+                        row_id = self._next_ids[kind]
+                        self._next_ids[kind] += 1
+                        if kind == "e" and row[3] is not None and row[4] is not None:
+                            keys.append((row[3], row[4]))
+                            with self._lock:
+                                self._pending_keys[keys[-1]] = row_id
+                        records.append([kind, row_id, *row])
+                        results.append((row_id, True) if kind == "e" else row_id)
+                    replies.append((future, results))
+
+            # A group of nothing but duplicates has nothing to make durable
+            if records:
+                data = b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records)
+                with self._file_lock:
+                    self._file.write(data)
+                    self._file.flush()
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                    self.written += len(records)
+                    self.fsyncs += 1
+        except Exception as e:
+            logger.error(f"Ingest journal: append of {len(records)} records failed: {e}", exc_info=True)
+            with self._lock:
+                for key in keys:
+                    self._pending_keys.pop(key, None)
+            for _, _, future in submissions:
+                future.set_exception(e)
+            return
+
+        for future, results in replies:
+            future.set_result(results)
+        for record in records:
+            self._committing.put(record)
+
+    def _commit_loop(self):
+        while True:
+            record = self._committing.get()
+            if record is None:
+                return
+            batch = [record]
+            stopping = False
+            deadline = time.monotonic() + self.commit_delay
+            while len(batch) < self.batch_max:
+                try:
+                    record = self._committing.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._commit_with_retry(batch)
+            if stopping:
+                return
+
+    def _commit_with_retry(self, batch: List[list]):
+        delay = 0.1
+        while True:
+            try:
+                self._commit(batch)
+                break
+            except Exception as e:
+                if self._stopping:
+                    logger.error(f"Ingest journal: {len(batch)} records left for replay on next startup: {e}")
+                    return
+                logger.error(f"Ingest journal: commit of {len(batch)} records failed, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+        with self._lock:
+            self.committed += len(batch)
+            self.commits += 1
+            for record in batch:
+                if record[0] == "e" and record[5] is not None and record[6] is not None:
+                    self._pending_keys.pop((record[5], record[6]), None)
+        with self._file_lock:
+            if self.committed == self.written and self._file.tell() > self.max_bytes:
+                self._file.truncate(0)
+
+    def _commit(self, records: List[list]) -> int:
+        """Insert journaled records that aren't in SQLite yet, returns how many were"""
+        committed = 0
+        dogs: Set[int] = set()
+        for kind, table in (("e", "events"), ("a", "accidents")):
+            typed = [record for record in records if record[0] == kind]
+            if not typed:
+                continue
+            with get_db() as conn:
+                existing = {row[0] for row in conn.execute(
+                    f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([record[1] for record in typed]),))}
+            if kind == "e":
+                # Events committed before the crash may have been archived since
+                boundary = event_archive.boundary
+                archived = [record[1] for record in typed if record[1] not in existing and record[4] < boundary]
+                if archived:
+                    existing |= event_archive.existing_ids(archived)
+            typed = [record for record in typed if record[1] not in existing]
+            if not typed:
+                continue
+            rows = [tuple(record[2:]) for record in typed]
+            ids = [record[1] for record in typed]
+            if kind == "e":
+                results = insert_events(rows, ids)
+                created = [row[:3] for row, (_, was_created) in zip(rows, results) if was_created]
+                interval_stats.record_many(created)
+            else:
+                insert_accidents(rows, ids)
+                created = rows
+            dogs.update(row[0] for row in created)
+            committed += len(typed)
+        for dog_id in dogs:
+            notify_status_changed(dog_id)
+        return committed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": INGEST_MODE, "written": self.written, "committed": self.committed,
+                    "lag": self.written - self.committed, "commits": self.commits, "fsyncs": self.fsyncs,
+                    "avg_batch": round(self.committed / self.commits, 1) if self.commits else 0,
+                    "replayed": self.replayed}
+
+
+ingest_journal = IngestJournal(settings.INGEST_JOURNAL_PATH, settings.INGEST_FSYNC, settings.INGEST_BATCH_MAX,
+                               settings.INGEST_COMMIT_DELAY, settings.INGEST_JOURNAL_MAX_BYTES)
+
+
+async def store_events(rows: List[tuple]) -> List[tuple]:
+    """Persist event rows through the configured ingest path, returns (event_id, created) per row"""
+    if cluster_worker is not None:
+        results = [tuple(result) for result in await cluster_worker.call("events", rows)]
+        # Don't wait for the coordinator's broadcast to stop serving stale status from here
+        await cluster_worker.invalidate({row[0] for row, (_, created) in zip(rows, results) if created})
+        return results
+    if INGEST_MODE == "journal":
+        return await ingest_journal.submit_events(rows)
+    results = await run_db(insert_events, rows)
+    created = [row[:3] for row, (_, was_created) in zip(rows, results) if was_created]
+    if created:
+        interval_stats.record_many(created)
+        for dog_id in {row[0] for row in created}:
+            notify_status_changed(dog_id)
+    return results
+
+
+async def store_accident(dog_id: int, event_type: str, estimated_time: int, location: str, notes: Optional[str]) -> int:
+    """Persist an accident through the configured ingest path, returns its id"""
+    row = (dog_id, event_type, estimated_time, location, notes)
+    if cluster_worker is not None:
+        accident_id = await cluster_worker.call("accident", *row)
+        await cluster_worker.invalidate([dog_id])
+        return accident_id
+    if INGEST_MODE == "journal":
+        return (await ingest_journal.submit_accidents([row]))[0]
+    accident_id = (await run_db(insert_accidents, [row]))[0]
+    notify_status_changed(dog_id)
+    return accident_id
+
+
+# ===== CLUSTER =====
+# With WORKERS > 1, `python main.py` starts one coordinator process and
+# WORKERS uvicorn worker processes. The coordinator is the only process that
+# writes to SQLite: workers forward events, accidents, households and dogs to
+# it over a Unix socket (CLUSTER_SOCKET) and read everything else straight
+# from the database. After each commit the coordinator publishes the changed
+# dogs on the same connections, and every worker reloads its cached interval
+# stats for them on the DB executor, drops their status snapshots and wakes
+# its own stream and long-poll clients. Alarms, webhooks, archiving and the ingest journal only run in the
+# coordinator. Messages are length-prefixed JSON.
+
+CLUSTER_WRITE_TIMEOUT = 30.0
+
+
+def _frame(message: Any) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode()
+    return struct.pack("<I", len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Any:
+    (length,) = struct.unpack("<I", await reader.readexactly(4))
+    return json.loads(await reader.readexactly(length))
+
+
+class ClusterCoordinator:
+    """Single-writer side: runs the writes workers forward and publishes what changed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._handling: Set[asyncio.Task] = set()  # requests in progress, referenced until done
+        self._changed: Set[int] = set()
+        self.requests = 0
+        self.published = 0
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"Cluster coordinator listening on {self.path}")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        # Writes already running finish and get their reply, so no worker reports a committed write as failed
+        await asyncio.gather(*self._handling, return_exceptions=True)
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        logger.info(f"Cluster worker connected ({len(self._writers)} connected)")
+        try:
+            while True:
+                message = await _read_frame(reader)
+                task = asyncio.create_task(self._handle(message, writer))
+                self._handling.add(task)
+                task.add_done_callback(self._handled)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _handled(self, task: asyncio.Task):
+        self._handling.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Cluster request handler failed: {task.exception()}", exc_info=task.exception())
+
+    async def _handle(self, message: Dict[str, Any], writer: asyncio.StreamWriter):
+        self.requests += 1
+        try:
+            reply = {"id": message["id"], "result": await self._execute(message["op"], message["args"])}
+        except HTTPException as e:
+            reply = {"id": message["id"], "status": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Cluster {message['op']} request failed: {e}", exc_info=True)
+            reply = {"id": message["id"], "status": 500, "error": str(e)}
+        if not writer.is_closing():
+            writer.write(_frame(reply))
+
+    async def _execute(self, op: str, args: list):
+        if op == "events":
+            return await store_events([tuple(row) for row in args[0]])
+        if op == "accident":
+            return await store_accident(*args)
+        if op == "household":
+            return await run_db(insert_household, *args)
+        if op == "dog":
+            created = await run_db(insert_dog, *args)
+            if created is not None:
+                dog_registry.add(created["id"], created["household_id"])
+                self._broadcast({"op": "dogs"})
+            return created
+        if op == "alarms":
+            return alarm_scheduler.overview(*args)
+        raise ValueError(f"Unknown cluster operation {op}")
+
+    def publish_changed(self, dog_id: int):
+        """Tell every worker a dog's status changed; safe to call from any thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._queue_changed, dog_id)
 
+    def _queue_changed(self, dog_id: int):
+        # Changes made in the same loop iteration go out as one message
+        if not self._changed:
+            self._loop.call_soon(self._flush_changed)
+        self._changed.add(dog_id)
 
-def init_db():
-    """Initialize the database with required tables"""
-    logger.info(f"Initializing database at {DB_PATH}")
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+    def _flush_changed(self):
+        dog_ids, self._changed = sorted(self._changed), set()
+        self._broadcast({"op": "changed", "dogs": dog_ids})
 
-            # Events table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    event_type TEXT NOT NULL,
-                    timestamp DATETIME NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Accidents table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS accidents (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    event_type TEXT NOT NULL,
-                    estimated_time DATETIME NOT NULL,
-                    location TEXT NOT NULL,
-                    notes TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+    def _broadcast(self, message: Dict[str, Any]):
+        self.published += 1
+        data = _frame(message)
+        for writer in list(self._writers):
+            if not writer.is_closing():
+                writer.write(data)
 
-            conn.commit()
-            logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Error initializing database: {e}", exc_info=True)
-        raise
+    def stats(self) -> Dict[str, Any]:
+        return {"role": CLUSTER_ROLE, "workers_connected": len(self._writers),
+                "requests": self.requests, "published": self.published}
 
 
-def calculate_average_interval(event_type: str, days: int = 7) -> float:
-    """Calculate average time between events in hours"""
-    logger.debug(f"Calculating average interval for {event_type} over {days} days")
-    with get_db() as conn:
-        cursor = conn.cursor()
+class ClusterWorker:
+    """Worker side: forwards writes to the coordinator and applies its invalidations"""
 
-        # Get events from last N days
-        cutoff_date = datetime.now() - timedelta(days=days)
-        cursor.execute("""
-            SELECT timestamp FROM events
-            WHERE event_type = ? AND timestamp >= ?
-            ORDER BY timestamp ASC
-        """, (event_type, cutoff_date.isoformat()))
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._invalidating: Set[asyncio.Task] = set()
+        self.connections = 0
+        self.invalidations = 0
 
-        events = cursor.fetchall()
+    async def start(self, timeout: float = 60.0):
+        """Connect to the coordinator, waiting for it to come up"""
+        self._connected = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), timeout)
 
-        if len(events) < 2:
-            # Default averages if not enough data (from environment or hardcoded defaults)
-            default_interval = DEFAULT_PEE_INTERVAL if event_type == "pee" else DEFAULT_POO_INTERVAL
-            logger.debug(f"Insufficient data for {event_type} ({len(events)} events), using default: {default_interval}h")
-            return default_interval
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._invalidating):
+            task.cancel()
+        if self._writer is not None:
+            self._writer.close()
 
-        # Calculate intervals between consecutive events
-        intervals = []
-        for i in range(1, len(events)):
-            prev_time = datetime.fromisoformat(events[i - 1]['timestamp'])
-            curr_time = datetime.fromisoformat(events[i]['timestamp'])
-            interval_hours = (curr_time - prev_time).total_seconds() / 3600
-            intervals.append(interval_hours)
+    async def _run(self):
+        delay = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2.0)
+                continue
+            delay = 0.1
+            if self.connections:
+                # Invalidations sent while we were disconnected are lost, start over
+                await self.reset()
+            self.connections += 1
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    message = await _read_frame(reader)
+                    if "id" in message:
+                        future = self._futures.pop(message["id"], None)
+                        if future is not None and not future.done():
+                            future.set_result(message)
+                    elif message["op"] == "changed":
+                        # Replies keep flowing while the reload runs on the DB executor
+                        task = asyncio.create_task(self.invalidate(message["dogs"]))
+                        self._invalidating.add(task)
+                        task.add_done_callback(self._invalidated)
+                    elif message["op"] == "dogs":
+                        await run_db(dog_registry.load)
+            except (asyncio.IncompleteReadError, ConnectionError, OSError):
+                pass
+            logger.warning("Lost connection to the cluster coordinator, reconnecting")
+            self._writer = None
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(HTTPException(status_code=503, detail="Writer unavailable"))
+            self._futures.clear()
 
-        # Return average (use environment-configured defaults as fallback)
-        avg = sum(intervals) / len(intervals) if intervals else (DEFAULT_PEE_INTERVAL if event_type == "pee" else DEFAULT_POO_INTERVAL)
-        logger.debug(f"Average interval for {event_type}: {avg:.2f}h (from {len(events)} events)")
-        return avg
+    async def invalidate(self, dog_ids):
+        """Forget cached state for dogs another process wrote to"""
+        self.invalidations += 1
+        # Reload the interval stats before dropping the snapshots, so rebuilding
+        # them (right away for stream and long-poll clients) needs no query on the loop
+        await run_db(self._reload, dog_ids)
+        for dog_id in dog_ids:
+            status_cache.invalidate(dog_id)
+            analytics_cache.invalidate(dog_id)
+            status_broadcaster.notify(dog_id)
 
+    def _invalidated(self, task: asyncio.Task):
+        self._invalidating.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Cluster invalidation failed: {task.exception()}", exc_info=task.exception())
 
-def get_last_event_time(event_type: str) -> Optional[datetime]:
-    """Get the timestamp of the last event of a given type"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT timestamp FROM events 
-            WHERE event_type = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        """, (event_type,))
-
-        result = cursor.fetchone()
-        if result:
-            return datetime.fromisoformat(result['timestamp'])
-        return None
+    @staticmethod
+    def _reload(dog_ids):
+        for dog_id in dog_ids:
+            if interval_stats.is_loaded(dog_id):
+                interval_stats.load(dog_id)
+            else:
+                # Makes a load that is already running read again
+                interval_stats.evict(dog_id)
 
+    async def reset(self):
+        await run_db(dog_registry.load)
+        await run_db(self._reload, interval_stats.dog_ids())
+        status_cache.invalidate_all()
+        analytics_cache.invalidate_all()
+        status_broadcaster.notify_all()
 
-def calculate_led_color(percentage: float) -> Dict[str, int]:
-    """
-    Calculate RGB color based on percentage of average time elapsed
-    0-60%: Green
-    60-75%: Green to Yellow transition
-    75-90%: Yellow to Red transition
-    90%+: Red (will flash on device)
-    """
-    if percentage < 60:
-        # Green
-        return {"r": 0, "g": 255, "b": 0}
-    elif percentage < 75:
-        # Transition from Green to Yellow (60-75%)
-        # Green stays at 255, Red increases from 0 to 255
-        progress = (percentage - 60) / 15  # 0 to 1
-        red = int(255 * progress)
-        return {"r": red, "g": 255, "b": 0}
-    elif percentage < 90:
-        # Transition from Yellow to Red (75-90%)
-        # Red stays at 255, Green decreases from 255 to 0
-        progress = (percentage - 75) / 15  # 0 to 1
-        green = int(255 * (1 - progress))
-        return {"r": 255, "g": green, "b": 0}
-    else:
-        # Red (90%+)
-        return {"r": 255, "g": 0, "b": 0}
+    async def call(self, op: str, *args):
+        """Run a write on the coordinator; its HTTP errors are re-raised here"""
+        if self._writer is None:
+            raise HTTPException(status_code=503, detail="Writer unavailable")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        self._writer.write(_frame({"id": request_id, "op": op, "args": list(args)}))
+        try:
+            reply = await asyncio.wait_for(future, CLUSTER_WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._futures.pop(request_id, None)
+            raise HTTPException(status_code=503, detail="Writer unavailable")
+        if "error" in reply:
+            raise HTTPException(status_code=reply["status"], detail=reply["error"])
+        return reply["result"]
 
+    def stats(self) -> Dict[str, Any]:
+        return {"role": CLUSTER_ROLE, "connected": self._writer is not None, "pid": os.getpid(),
+                "connections": self.connections, "invalidations": self.invalidations,
+                "in_flight": len(self._futures)}
 
-def get_status_for_type(event_type: str) -> Dict:
-    """Get current status for a specific event type"""
-    last_event = get_last_event_time(event_type)
-    avg_interval = calculate_average_interval(event_type)
 
-    if last_event is None:
-        logger.warning(f"No events found for {event_type}, returning urgent status")
-        # No events yet - show as urgent
-        return {
-            "color": {"r": 255, "g": 0, "b": 0},
-            "alarm": True,
-            "time_since": 0.0,
-            "percentage": 100.0,
-            "average_interval": avg_interval
-        }
+cluster_coordinator = ClusterCoordinator(settings.CLUSTER_SOCKET) if CLUSTER_ROLE == "coordinator" else None
+cluster_worker = ClusterWorker(settings.CLUSTER_SOCKET) if CLUSTER_ROLE == "worker" else None
 
-    time_since = (datetime.now() - last_event).total_seconds() / 3600  # hours
-    percentage = (time_since / avg_interval) * 100 if avg_interval > 0 else 0
 
-    status = {
-        "color": calculate_led_color(percentage),
-        "alarm": percentage >= 90,
-        "time_since": round(time_since, 2),
-        "percentage": round(percentage, 1),
-        "average_interval": round(avg_interval, 2)
-    }
+async def run_coordinator():
+    """Body of the coordinator process started by run_cluster"""
+    await startup_event()
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+    await shutdown_event()
 
-    if status["alarm"]:
-        logger.warning(f"{event_type} alarm triggered! Time since last: {status['time_since']}h, percentage: {status['percentage']}%")
 
-    return status
+def run_cluster(workers: int):
+    """Start the coordinator, then serve HTTP from `workers` uvicorn processes"""
+    import subprocess
+    import uvicorn
+
+    if os.path.exists(CLUSTER_SOCKET):
+        os.unlink(CLUSTER_SOCKET)
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    stopping = threading.Event()
+    processes: List[Any] = []
+
+    def spawn():
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--coordinator"],
+                                          env=dict(os.environ, POOMASTER_CLUSTER_ROLE="coordinator")))
+
+    def supervise():
+        # Workers keep serving reads while the coordinator is down and reconnect when it is back
+        while not stopping.is_set():
+            returncode = processes[-1].wait()
+            if not stopping.is_set():
+                logger.error(f"Coordinator exited with status {returncode}, restarting")
+                time.sleep(1.0)
+                spawn()
+
+    spawn()
+    try:
+        while not os.path.exists(CLUSTER_SOCKET):
+            if processes[-1].poll() is not None:
+                raise SystemExit(f"Coordinator exited with status {processes[-1].returncode}")
+            time.sleep(0.1)
+        threading.Thread(target=supervise, name="coordinator-supervisor", daemon=True).start()
+        os.environ["POOMASTER_CLUSTER_ROLE"] = "worker"
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=workers, app_dir=backend_dir)
+    finally:
+        stopping.set()
+        processes[-1].terminate()
+        processes[-1].wait(timeout=60)
 
 
 # API Endpoints
 
+config_watcher: Optional[asyncio.Task] = None
+archiver: Optional[asyncio.Task] = None
+
+
+async def archive_periodically():
+    """Move newly cold months into the archive every ARCHIVE_CHECK_INTERVAL seconds"""
+    while True:
+        try:
+            moved = await run_db(event_archive.archive, settings.ARCHIVE_AFTER_DAYS)
+            if moved:
+                logger.info(f"Archive pass moved {moved} events")
+        except Exception as e:
+            logger.error(f"Archive pass failed: {e}", exc_info=True)
+        await asyncio.sleep(settings.ARCHIVE_CHECK_INTERVAL)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
+    logger.info(f"Starting Puppy Bathroom Tracker API v{APP_VERSION}")
+    logger.info(f"Configuration: DB={DB_PATH}, LOG_LEVEL={settings.LOG_LEVEL}, HOST={HOST}, PORT={PORT}")
     logger.info("Application starting up...")
-    init_db()
+    status_broadcaster.start()
+    global config_watcher
+    config_watcher = asyncio.create_task(config.watch())
+    if cluster_worker is not None:
+        # The coordinator has migrated the database and runs the background jobs
+        await run_db(dog_registry.load)
+        await cluster_worker.start()
+        logger.info(f"Puppy Bathroom Tracker API worker {os.getpid()} is ready")
+        return
+    await run_db(init_db)
+    await run_db(dog_registry.load)
+    await run_db(ingest_journal.recover)
+    if INGEST_MODE == "journal":
+        await run_db(ingest_journal.start)
+    await run_db(interval_stats.check_consistency)
+    alarm_scheduler.start()
+    await run_db(alarm_scheduler.load, dog_registry.ids())
+    if settings.ARCHIVE_AFTER_DAYS:
+        global archiver
+        archiver = asyncio.create_task(archive_periodically())
+    if cluster_coordinator is not None:
+        await cluster_coordinator.start()
     logger.info("Puppy Bathroom Tracker API is ready")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled database connections on shutdown"""
+    if config_watcher is not None:
+        config_watcher.cancel()
+    if archiver is not None:
+        archiver.cancel()
+    if cluster_coordinator is not None:
+        await cluster_coordinator.stop()
+    if cluster_worker is not None:
+        await cluster_worker.stop()
+    alarm_scheduler.stop()
+    ingest_journal.stop()
+    webhook_executor.shutdown(wait=False)
+    db_executor.shutdown(wait=True)
+    db_pool.close_all()
+    logger.info("Database connections closed")
+
+
 @app.get("/")
 async def root():
     """API root endpoint"""
@@ -346,14 +4308,76 @@ async def root():
         "endpoints": {
             "health": "/health",
             "status": f"/api/{API_VERSION}/status",
+            "status_stream": f"/api/{API_VERSION}/status/stream",
+            "status_bulk": f"/api/{API_VERSION}/status/bulk",
+            "status_compact": f"/api/{API_VERSION}/status/compact",
             "log_event": f"/api/{API_VERSION}/events",
+            "log_events_batch": f"/api/{API_VERSION}/events/batch",
             "history": f"/api/{API_VERSION}/history",
             "analytics": f"/api/{API_VERSION}/analytics",
-            "accidents": f"/api/{API_VERSION}/accidents"
+            "analytics_series": f"/api/{API_VERSION}/analytics/series",
+            "accidents": f"/api/{API_VERSION}/accidents",
+            "export": f"/api/{API_VERSION}/export",
+            "alarms": f"/api/{API_VERSION}/alarms",
+            "households": f"/api/{API_VERSION}/households",
+            "dogs": f"/api/{API_VERSION}/dogs",
+            "admin_config": "/admin/config",
+            "metrics": "/metrics"
         }
     }
 
 
+def _gauge(name: str, help_text: str, samples: List[tuple]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{_format_labels(labels)} {value:g}" for labels, value in samples)
+    return lines
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of all collected metrics"""
+    pool = db_pool.stats()
+    stats_store = interval_stats.stats()
+    lines = []
+    for metric in (http_requests, http_latency, db_query_latency, events_ingested):
+        lines.extend(metric.render())
+
+    for cache, hits, misses in (("interval_stats", stats_store["hits"], stats_store["misses"]),
+                                ("status_snapshot", status_cache.hits, status_cache.misses),
+                                ("analytics", analytics_cache.hits, analytics_cache.misses)):
+        lines.extend(_gauge(f"poomaster_{cache}_cache_hit_ratio", f"Hit ratio of the {cache} cache",
+                            [({}, hits / (hits + misses) if hits + misses else 0.0)]))
+        lines.extend([f"# HELP poomaster_{cache}_cache_lookups_total Lookups in the {cache} cache",
+                      f"# TYPE poomaster_{cache}_cache_lookups_total counter",
+                      f'poomaster_{cache}_cache_lookups_total{{result="hit"}} {hits}',
+                      f'poomaster_{cache}_cache_lookups_total{{result="miss"}} {misses}'])
+
+    lines.extend(_gauge("poomaster_polling_devices", "Clients that polled status within METRICS_DEVICE_WINDOW",
+                        [({}, polling_devices.count())]))
+    lines.extend(_gauge("poomaster_status_stream_subscribers", "Open status push streams",
+                        [({}, status_broadcaster.subscriber_count)]))
+    lines.extend(_gauge("poomaster_db_pool_connections", "Pooled SQLite connections",
+                        [({"state": "open"}, pool["open_connections"]), ({"state": "in_use"}, pool["in_use"])]))
+    lines.extend(_gauge("poomaster_db_pool_wait_seconds_max", "Longest wait for a pooled connection",
+                        [({}, pool["wait_time_max_ms"] / 1000)]))
+    lines.extend(_gauge("poomaster_log_records_dropped", "Log records dropped because the log queue was full",
+                        [({}, logging_pipeline.stats().get("dropped", 0))]))
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics (request counts/latency per route, DB helper timings, cache ratios, ingest)"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/config")
+async def get_admin_config():
+    """Effective configuration, where each value came from, and changes waiting on a restart"""
+    return config.describe()
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -362,16 +4386,21 @@ async def health_check():
     """
     try:
         # Check database connectivity
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            db_healthy = cursor.fetchone() is not None
+        db_healthy = await run_db(check_db)
 
-        logger.info("Health check successful")
+        rate_limited_log("health", logging.INFO, "Health check successful")
         return {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "database": "connected" if db_healthy else "disconnected",
+            "db_pool": db_pool.stats(),
+            "interval_stats": interval_stats.stats(),
+            "status_stream": status_broadcaster.stats(),
+            "alarms": alarm_scheduler.stats(),
+            "ingest": ingest_journal.stats(),
+            "archive": event_archive.stats(),
+            "cluster": (cluster_coordinator or cluster_worker).stats() if CLUSTER_ROLE != "single" else {"role": "single"},
+            "logging": logging_pipeline.stats(),
             "version": APP_VERSION,
             "api_version": API_VERSION
         }
@@ -387,24 +4416,121 @@ async def health_check():
         }
 
 
+async def await_status_version(dog_id: int, wait: Optional[float], since: Optional[int]) -> int:
+    """Long-poll support: hold the request until the dog's status version moves past `since`"""
+    if wait is None or since is None:
+        return status_broadcaster.version(dog_id)
+    return await status_broadcaster.wait_for_change(dog_id, since, min(wait, config.current.STATUS_WAIT_MAX))
+
+
 @app.get("/api/v1/status", response_model=LEDStatus)
-async def get_status():
+async def get_status(
+        request: Request,
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)"),
+        wait: Optional[float] = Query(None, ge=0, description="Seconds to wait for a change (long poll)"),
+        since: Optional[int] = Query(None, description="X-Status-Version the client already has")
+):
     """
     Get current status for both pee and poo with LED colors
-    This endpoint is polled by ESP32 devices
+    This endpoint is polled by ESP32 devices and is served from the snapshot cache.
+    Supports If-None-Match / If-Modified-Since for cheap 304 responses.
+    With wait and since, the request is held until the status version changes
+    (an event is logged, or an LED color or alarm flips) or the wait expires.
     """
-    pee_status = get_status_for_type("pee")
-    poo_status = get_status_for_type("poo")
+    dog_id = resolve_dog_id(dog_id)
+    await ensure_dog_loaded(dog_id)
+    version = await await_status_version(dog_id, wait, since)
+    snapshot = status_cache.get(dog_id)
+    headers = dict(snapshot.headers, **{"X-Status-Version": str(version)})
 
-    return LEDStatus(
-        pee=pee_status["color"],
-        poo=poo_status["color"],
-        pee_alarm=pee_status["alarm"],
-        poo_alarm=poo_status["alarm"],
-        pee_time_since=pee_status["time_since"],
-        poo_time_since=poo_status["time_since"],
-        pee_percentage=pee_status["percentage"],
-        poo_percentage=poo_status["percentage"]
+    if snapshot.is_not_modified(request):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/v1/status/compact")
+async def get_compact_status(
+        request: Request,
+        format: str = Query("bin", description="'bin' (16-byte struct) or 'csv' (one line)"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)"),
+        wait: Optional[float] = Query(None, ge=0, description="Seconds to wait for a change (long poll)"),
+        since: Optional[int] = Query(None, description="X-Status-Version the client already has")
+):
+    """
+    Status for microcontrollers: a 16-byte struct or a short CSV line instead of JSON
+    The encoded bytes are cached with the status snapshot and support ETag / 304
+    and the same wait/since long polling as /api/v1/status.
+    """
+    if format not in COMPACT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'bin' or 'csv'")
+
+    dog_id = resolve_dog_id(dog_id)
+    await ensure_dog_loaded(dog_id)
+    version = await await_status_version(dog_id, wait, since)
+    compact = status_cache.get(dog_id).compact(format)
+    headers = dict(compact.headers, **{"X-Status-Version": str(version)})
+
+    if compact.is_not_modified(request):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=compact.body, media_type=compact.media_type, headers=headers)
+
+
+@app.get("/api/v1/status/bulk")
+async def get_bulk_status(
+        dog_ids: Optional[str] = Query(None, description="Comma-separated dog ids"),
+        household_id: Optional[int] = Query(None, description="All dogs of this household")
+):
+    """
+    LED status for many dogs at once (kennel wall displays)
+    Column-oriented: each field is an array aligned with dog_ids.
+    Without filters every dog is returned.
+    """
+    if dog_ids:
+        try:
+            selected = [int(value) for value in dog_ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="dog_ids must be a comma-separated list of integers")
+        unknown = [dog_id for dog_id in selected if not dog_registry.exists(dog_id)]
+        if unknown:
+            logger.error(f"Unknown dog_ids in bulk status request: {unknown[:10]}")
+            raise HTTPException(status_code=404, detail={"message": "Unknown dog_id", "dog_ids": unknown})
+    elif household_id is not None:
+        selected = dog_registry.ids(household_id)
+    else:
+        selected = dog_registry.ids()
+
+    logger.debug(f"Bulk status request for {len(selected)} dogs")
+    return json_response(await run_db(compute_bulk_status, selected))
+
+
+@app.get("/api/v1/status/stream")
+async def stream_status(dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")):
+    """
+    Server-Sent Events stream of LEDStatus updates
+    Sends the current status on connect, then a new one whenever an event is
+    logged or the LED color / alarm state changes. Comment lines are sent as
+    keepalives when nothing changes.
+    """
+    dog_id = resolve_dog_id(dog_id)
+    await ensure_dog_loaded(dog_id)
+
+    async def event_stream():
+        async with status_broadcaster.subscribe(dog_id) as subscriber:
+            yield format_sse(status_cache.get(dog_id))
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(subscriber.get(), timeout=config.current.STATUS_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(snapshot)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -420,135 +4546,275 @@ async def log_event(event: EventCreate):
         logger.error(f"Invalid event_type received: {event.event_type}")
         raise HTTPException(status_code=400, detail="event_type must be 'pee' or 'poo'")
 
-    timestamp = event.timestamp or datetime.now()
+    dog_id = resolve_dog_id(event.dog_id)
+    timestamp = to_local_naive(event.timestamp) if event.timestamp else datetime.now()
 
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO events (event_type, timestamp)
-                VALUES (?, ?)
-            """, (event.event_type, timestamp.isoformat()))
-            conn.commit()
-            event_id = cursor.lastrowid
+        [(event_id, created)] = await store_events([(dog_id, event.event_type, to_epoch(timestamp),
+                                                     event.device_id, event.sequence)])
 
-        logger.info(f"Event logged successfully: ID={event_id}, type={event.event_type}, timestamp={timestamp.isoformat()}")
+        if created:
+            logger.info(f"Event logged successfully: ID={event_id}, dog={dog_id}, type={event.event_type}, timestamp={timestamp.isoformat()}")
+        else:
+            logger.info(f"Duplicate event ignored: ID={event_id}, device={event.device_id}, sequence={event.sequence}")
 
         return {
             "success": True,
             "event_id": event_id,
+            "dog_id": dog_id,
             "event_type": event.event_type,
-            "timestamp": timestamp.isoformat()
+            "timestamp": timestamp.isoformat(),
+            "duplicate": not created
         }
     except Exception as e:
         logger.error(f"Error logging event: {e}", exc_info=True)
         raise
 
 
+@app.post("/api/v1/events/batch")
+async def log_events_batch(events: List[EventCreate]):
+    """
+    Log many events in one request and one transaction
+    Used by devices replaying their offline buffer and for bulk imports.
+    Events carrying device_id + sequence are deduplicated, so a batch can be
+    safely retried.
+    """
+    logger.info(f"Received batch event logging request: {len(events)} events")
+
+    batch_max = config.current.EVENT_BATCH_MAX
+    if len(events) > batch_max:
+        logger.error(f"Batch too large: {len(events)} events (max {batch_max})")
+        raise HTTPException(status_code=413, detail=f"Batch may contain at most {batch_max} events")
+
+    invalid = [index for index, event in enumerate(events) if event.event_type not in ["pee", "poo"]]
+    if invalid:
+        logger.error(f"Invalid event_type in batch at positions {invalid[:10]}")
+        raise HTTPException(status_code=400, detail={
+            "message": "event_type must be 'pee' or 'poo'",
+            "invalid_indexes": invalid
+        })
+
+    dog_ids = [DEFAULT_DOG_ID if event.dog_id is None else event.dog_id for event in events]
+    unknown = [index for index, dog_id in enumerate(dog_ids) if not dog_registry.exists(dog_id)]
+    if unknown:
+        logger.error(f"Unknown dog_id in batch at positions {unknown[:10]}")
+        raise HTTPException(status_code=404, detail={
+            "message": "Unknown dog_id",
+            "invalid_indexes": unknown
+        })
+
+    now = datetime.now()
+    timestamps = [to_local_naive(event.timestamp) if event.timestamp else now for event in events]
+    rows = [(dog_id, event.event_type, to_epoch(timestamp), event.device_id, event.sequence)
+            for event, dog_id, timestamp in zip(events, dog_ids, timestamps)]
+
+    try:
+        results = await store_events(rows) if rows else []
+        created = sum(1 for _, was_created in results if was_created)
+
+        logger.info(f"Batch logged: {created} created, {len(rows) - created} duplicates")
+
+        return {
+            "success": True,
+            "created": created,
+            "duplicates": len(rows) - created,
+            "results": [
+                {
+                    "index": index,
+                    "event_id": event_id,
+                    "dog_id": dog_id,
+                    "event_type": event.event_type,
+                    "timestamp": timestamp.isoformat(),
+                    "duplicate": not was_created
+                }
+                for index, (event, dog_id, timestamp, (event_id, was_created))
+                in enumerate(zip(events, dog_ids, timestamps, results))
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error logging event batch: {e}", exc_info=True)
+        raise
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    """Decode a pagination cursor from a query string, 400 if malformed"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        logger.error(f"Invalid pagination cursor: {cursor}")
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @app.get("/api/v1/history")
 async def get_history(
         event_type: Optional[str] = Query(None, description="Filter by 'pee' or 'poo'"),
         days: int = Query(7, description="Number of days to retrieve"),
-        limit: int = Query(100, description="Maximum number of events")
+        limit: int = Query(100, ge=1, description="Maximum number of events"),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")
 ):
     """
-    Get event history
+    Get event history, newest first
+    Pass the returned next_cursor to fetch the following page.
     """
-    logger.info(f"History request: event_type={event_type}, days={days}, limit={limit}")
-
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-
-            cutoff_date = datetime.now() - timedelta(days=days)
+    logger.info(f"History request: dog_id={dog_id}, event_type={event_type}, days={days}, limit={limit}")
 
-            if event_type:
-                if event_type not in ["pee", "poo"]:
-                    logger.error(f"Invalid event_type in history request: {event_type}")
-                    raise HTTPException(status_code=400, detail="event_type must be 'pee' or 'poo'")
+    if event_type and event_type not in ["pee", "poo"]:
+        logger.error(f"Invalid event_type in history request: {event_type}")
+        raise HTTPException(status_code=400, detail="event_type must be 'pee' or 'poo'")
 
-                cursor.execute("""
-                    SELECT * FROM events
-                    WHERE event_type = ? AND timestamp >= ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """, (event_type, cutoff_date.isoformat(), limit))
-            else:
-                cursor.execute("""
-                    SELECT * FROM events
-                    WHERE timestamp >= ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """, (cutoff_date.isoformat(), limit))
+    dog_id = resolve_dog_id(dog_id)
+    before = parse_cursor(cursor)
 
-            events = [dict(row) for row in cursor.fetchall()]
+    try:
+        cutoff_date = datetime.now() - timedelta(days=days)
+        events, next_cursor = await run_db(fetch_events, dog_id, event_type, to_epoch(cutoff_date), limit, before)
 
         logger.info(f"History retrieved: {len(events)} events")
-        return {"events": events, "count": len(events)}
+        return Response(content=encode_page("events", encode_events(events), next_cursor),
+                        media_type="application/json")
     except Exception as e:
         logger.error(f"Error retrieving history: {e}", exc_info=True)
         raise
 
 
-@app.get("/api/v1/analytics")
-async def get_analytics(days: int = Query(7, description="Number of days for analytics")):
+EXPORT_COLUMNS = {
+    "events": ["id", "dog_id", "event_type", "timestamp", "device_id", "client_seq", "created_at"],
+    "accidents": ["id", "dog_id", "event_type", "estimated_time", "location", "notes", "created_at"]
+}
+
+
+@app.get("/api/v1/export")
+async def export_history(
+        kind: str = Query("events", description="'events' or 'accidents'"),
+        format: str = Query("ndjson", description="'ndjson' or 'csv'"),
+        event_type: Optional[str] = Query(None, description="Filter by 'pee' or 'poo' (events only)"),
+        days: Optional[int] = Query(None, description="Number of days to export (default: everything)"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")
+):
     """
-    Get analytics including averages, counts, and trends
+    Stream the full history as NDJSON or CSV
+    Rows are read in keyset-paginated chunks and written as they arrive, so
+    memory use is constant and the first rows are sent immediately.
     """
-    logger.info(f"Analytics request for {days} days")
+    logger.info(f"Export request: kind={kind}, format={format}, dog_id={dog_id}, days={days}")
 
-    try:
-        pee_status = get_status_for_type("pee")
-        poo_status = get_status_for_type("poo")
+    if kind not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=400, detail="kind must be 'events' or 'accidents'")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    if event_type and event_type not in ["pee", "poo"]:
+        raise HTTPException(status_code=400, detail="event_type must be 'pee' or 'poo'")
 
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cutoff_date = datetime.now() - timedelta(days=days)
+    dog_id = resolve_dog_id(dog_id)
+    cutoff = to_epoch(datetime.now() - timedelta(days=days)) if days is not None else 0
+    columns = EXPORT_COLUMNS[kind]
+    indices = [(EVENT_COLUMNS if kind == "events" else ACCIDENT_COLUMNS).index(column) for column in columns]
+    chunk_size = config.current.EXPORT_CHUNK_SIZE
 
-            # Count events by type
-            cursor.execute("""
-                SELECT event_type, COUNT(*) as count
-                FROM events
-                WHERE timestamp >= ?
-                GROUP BY event_type
-            """, (cutoff_date.isoformat(),))
+    async def fetch_chunks():
+        before = None
+        while True:
+            if kind == "events":
+                rows, next_cursor = await run_db(fetch_events, dog_id, event_type, cutoff, chunk_size, before)
+            else:
+                rows, next_cursor = await run_db(fetch_accidents, dog_id, cutoff, chunk_size, before)
+            if rows:
+                yield rows
+            if next_cursor is None:
+                return
+            before = decode_cursor(next_cursor)
 
-            counts = {row['event_type']: row['count'] for row in cursor.fetchall()}
+    async def ndjson_stream():
+        async for rows in fetch_chunks():
+            yield b"".join(json_bytes({column: row[index] for column, index in zip(columns, indices)}) + b"\n" for row in rows)
 
-            # Get accident counts
-            cursor.execute("""
-                SELECT event_type, COUNT(*) as count
-                FROM accidents
-                WHERE estimated_time >= ?
-                GROUP BY event_type
-            """, (cutoff_date.isoformat(),))
+    async def csv_stream():
+        import csv
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        async for rows in fetch_chunks():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([row[index] for index in indices] for row in rows)
+            yield buffer.getvalue()
+
+    filename = f"{kind}-dog{dog_id}-{datetime.now():%Y%m%d}.{'ndjson' if format == 'ndjson' else 'csv'}"
+    return StreamingResponse(
+        ndjson_stream() if format == "ndjson" else csv_stream(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/v1/analytics")
+async def get_analytics(
+        days: int = Query(7, description="Number of days for analytics"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")
+):
+    """
+    Get analytics including averages, counts, and trends
+    """
+    logger.info(f"Analytics request for dog {dog_id}, {days} days")
+
+    dog_id = resolve_dog_id(dog_id)
+
+    try:
+        await ensure_dog_loaded(dog_id)
+        pee_status = get_status_for_type("pee", dog_id)
+        poo_status = get_status_for_type("poo", dog_id)
+
+        cutoff_date = datetime.now() - timedelta(days=days)
+        totals = await run_db(window_stats, dog_id, to_epoch(cutoff_date))
 
-            accident_counts = {row['event_type']: row['count'] for row in cursor.fetchall()}
+        logger.info(f"Analytics generated: pee={totals['pee']['count']} events, poo={totals['poo']['count']} events")
 
-        logger.info(f"Analytics generated: pee={counts.get('pee', 0)} events, poo={counts.get('poo', 0)} events")
+        def summarize(current: Dict, window: Dict) -> Dict[str, Any]:
+            return {
+                "count": window["count"],
+                "average_interval_hours": current["average_interval"],
+                "time_since_last_hours": current["time_since"],
+                "current_percentage": current["percentage"],
+                "accidents": window["accidents"],
+                "window_average_interval_hours": round(window["interval_sum"] / window["interval_count"] / 3600, 2) if window["interval_count"] else None,
+                "window_min_interval_hours": round(window["interval_min"] / 3600, 2) if window["interval_min"] is not None else None,
+                "window_max_interval_hours": round(window["interval_max"] / 3600, 2) if window["interval_max"] is not None else None
+            }
 
         return {
             "period_days": days,
-            "pee": {
-                "count": counts.get("pee", 0),
-                "average_interval_hours": pee_status["average_interval"],
-                "time_since_last_hours": pee_status["time_since"],
-                "current_percentage": pee_status["percentage"],
-                "accidents": accident_counts.get("pee", 0)
-            },
-            "poo": {
-                "count": counts.get("poo", 0),
-                "average_interval_hours": poo_status["average_interval"],
-                "time_since_last_hours": poo_status["time_since"],
-                "current_percentage": poo_status["percentage"],
-                "accidents": accident_counts.get("poo", 0)
-            }
+            "dog_id": dog_id,
+            "pee": summarize(pee_status, totals["pee"]),
+            "poo": summarize(poo_status, totals["poo"])
         }
     except Exception as e:
         logger.error(f"Error generating analytics: {e}", exc_info=True)
         raise
 
 
+@app.get("/api/v1/analytics/series")
+async def get_analytics_series(
+        days: int = Query(7, ge=1, le=366, description="Number of days for analytics"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")
+):
+    """
+    Chart series per event type: hour-of-day histograms of events and accidents,
+    daily counts and mean intervals with their trend, interval percentiles and
+    the accident rate. The window starts on the hour; results are cached until
+    the dog gets a new event or accident.
+    """
+    logger.info(f"Analytics series request for dog {dog_id}, {days} days")
+
+    dog_id = resolve_dog_id(dog_id)
+    series = await run_db(analytics_cache.get, dog_id, days)
+    return json_response(dict(series, period_days=days, dog_id=dog_id))
+
+
 @app.post("/api/v1/accidents")
 async def log_accident(accident: AccidentCreate):
     """
@@ -560,22 +4826,18 @@ async def log_accident(accident: AccidentCreate):
         logger.error(f"Invalid event_type in accident: {accident.event_type}")
         raise HTTPException(status_code=400, detail="event_type must be 'pee' or 'poo'")
 
+    dog_id = resolve_dog_id(accident.dog_id)
+
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO accidents (event_type, estimated_time, location, notes)
-                VALUES (?, ?, ?, ?)
-            """, (accident.event_type, accident.estimated_time.isoformat(),
-                  accident.location, accident.notes))
-            conn.commit()
-            accident_id = cursor.lastrowid
+        accident_id = await store_accident(dog_id, accident.event_type, to_epoch(accident.estimated_time),
+                                           accident.location, accident.notes)
 
-        logger.info(f"Accident logged: ID={accident_id}, type={accident.event_type}, location={accident.location}")
+        logger.info(f"Accident logged: ID={accident_id}, dog={dog_id}, type={accident.event_type}, location={accident.location}")
 
         return {
             "success": True,
-            "accident_id": accident_id
+            "accident_id": accident_id,
+            "dog_id": dog_id
         }
     except Exception as e:
         logger.error(f"Error logging accident: {e}", exc_info=True)
@@ -583,33 +4845,122 @@ async def log_accident(accident: AccidentCreate):
 
 
 @app.get("/api/v1/accidents")
-async def get_accidents(days: int = Query(7, description="Number of days to retrieve")):
+async def get_accidents(
+        days: int = Query(7, description="Number of days to retrieve"),
+        limit: Optional[int] = Query(None, ge=1, description="Maximum number of accidents (default: all)"),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        dog_id: Optional[int] = Query(None, description="Dog id (defaults to the default dog)")
+):
     """
-    Get accident history
+    Get accident history, newest first
+    With a limit, pass the returned next_cursor to fetch the following page.
     """
-    logger.info(f"Accident history request for {days} days")
+    logger.info(f"Accident history request for dog {dog_id}, {days} days")
 
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cutoff_date = datetime.now() - timedelta(days=days)
-
-            cursor.execute("""
-                SELECT * FROM accidents
-                WHERE estimated_time >= ?
-                ORDER BY estimated_time DESC
-            """, (cutoff_date.isoformat(),))
+    dog_id = resolve_dog_id(dog_id)
+    before = parse_cursor(cursor)
 
-            accidents = [dict(row) for row in cursor.fetchall()]
+    try:
+        cutoff_date = datetime.now() - timedelta(days=days)
+        accidents, next_cursor = await run_db(fetch_accidents, dog_id, to_epoch(cutoff_date), limit, before)
 
         logger.info(f"Accident history retrieved: {len(accidents)} accidents")
-        return {"accidents": accidents, "count": len(accidents)}
+        return Response(content=encode_page("accidents", encode_accidents(accidents), next_cursor),
+                        media_type="application/json")
     except Exception as e:
         logger.error(f"Error retrieving accident history: {e}", exc_info=True)
         raise
 
 
+@app.get("/api/v1/alarms")
+async def get_alarms(dog_id: Optional[int] = Query(None, description="Only this dog (default: all dogs)")):
+    """Upcoming threshold crossings and the most recently fired alarms"""
+    if dog_id is not None:
+        dog_id = resolve_dog_id(dog_id)
+    if cluster_worker is not None:
+        return await cluster_worker.call("alarms", dog_id)
+    return alarm_scheduler.overview(dog_id)
+
+
+@app.post("/api/v1/households")
+async def create_household(household: HouseholdCreate):
+    """
+    Create a household (a home or kennel that owns dogs)
+    """
+    if cluster_worker is not None:
+        created = await cluster_worker.call("household", household.name)
+    else:
+        created = await run_db(insert_household, household.name)
+    logger.info(f"Household created: ID={created['id']}, name={household.name}")
+    return created
+
+
+@app.get("/api/v1/households")
+async def list_households():
+    """
+    List households with their number of dogs
+    """
+    households = await run_db(fetch_households)
+    return {"households": households, "count": len(households)}
+
+
+@app.post("/api/v1/dogs")
+async def create_dog(dog: DogCreate):
+    """
+    Register a dog in a household
+    """
+    if cluster_worker is not None:
+        created = await cluster_worker.call("dog", dog.name, dog.household_id)
+    else:
+        created = await run_db(insert_dog, dog.name, dog.household_id)
+    if created is None:
+        logger.error(f"Cannot create dog, household {dog.household_id} not found")
+        raise HTTPException(status_code=404, detail=f"Household {dog.household_id} not found")
+
+    dog_registry.add(created["id"], created["household_id"])
+    logger.info(f"Dog created: ID={created['id']}, name={dog.name}, household={dog.household_id}")
+    return created
+
+
+@app.get("/api/v1/dogs")
+async def list_dogs(household_id: Optional[int] = Query(None, description="Only dogs of this household")):
+    """
+    List dogs, optionally filtered by household
+    """
+    dogs = await run_db(fetch_dogs, household_id)
+    return {"dogs": dogs, "count": len(dogs)}
+
+
 if __name__ == "__main__":
-    import uvicorn
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Puppy Bathroom Tracker API server")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Recompute the analytics rollup tables from raw events and exit")
+    parser.add_argument("--archive", type=int, metavar="DAYS",
+                        help="Move events older than DAYS into the archive, compact the database and exit")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS,
+                        help="HTTP worker processes (above 1 adds a coordinator process that owns all writes)")
+    parser.add_argument("--coordinator", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rebuild_rollups:
+        init_db()
+        rebuild_rollups()
+    elif args.archive is not None:
+        init_db()
+        moved = event_archive.archive(args.archive)
+        if moved:
+            with get_db() as conn:
+                conn.execute("VACUUM")
+        logger.info(f"Archived {moved} events to {settings.ARCHIVE_DIR}")
+    elif args.coordinator:
+        asyncio.run(run_coordinator())
+    elif args.workers > 1 and hasattr(socket, "AF_UNIX"):
+        run_cluster(args.workers)
+    else:
+        import uvicorn
 
-    uvicorn.run(app, host=HOST, port=PORT)
+        if args.workers > 1:
+            logger.warning("Multiple workers need Unix domain sockets, starting a single worker")
+        uvicorn.run(app, host=HOST, port=PORT)
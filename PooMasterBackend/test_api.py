@@ -15,7 +15,7 @@ def log_event(event_type, timestamp=None):
     if timestamp:
         data["timestamp"] = timestamp.isoformat()
     
-    response = requests.post(f"{BASE_URL}/api/events", json=data)
+    response = requests.post(f"{BASE_URL}/api/v1/events", json=data)
     return response.json()
 
 def log_accident(event_type, estimated_time, location, notes):
@@ -26,17 +26,17 @@ def log_accident(event_type, estimated_time, location, notes):
         "location": location,
         "notes": notes
     }
-    response = requests.post(f"{BASE_URL}/api/accidents", json=data)
+    response = requests.post(f"{BASE_URL}/api/v1/accidents", json=data)
     return response.json()
 
 def get_status():
     """Get current status"""
-    response = requests.get(f"{BASE_URL}/api/status")
+    response = requests.get(f"{BASE_URL}/api/v1/status")
     return response.json()
 
 def get_analytics(days=7):
     """Get analytics"""
-    response = requests.get(f"{BASE_URL}/api/analytics", params={"days": days})
+    response = requests.get(f"{BASE_URL}/api/v1/analytics", params={"days": days})
     return response.json()
 
 def populate_sample_data():
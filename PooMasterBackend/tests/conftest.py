@@ -0,0 +1,56 @@
+"""
+Shared setup: point main.py at a throwaway database, journal, archive and
+socket before it is imported, and create the schema once.
+"""
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="poomaster-test-")
+
+os.environ.update(
+    DB_PATH=os.path.join(WORKDIR, "test.db"),
+    LOG_FILE=os.path.join(WORKDIR, "test.log"),
+    INGEST_JOURNAL_PATH=os.path.join(WORKDIR, "ingest.journal"),
+    ARCHIVE_DIR=os.path.join(WORKDIR, "archive"),
+    CLUSTER_SOCKET=os.path.join(WORKDIR, "poomaster.sock"),
+    LOG_LEVEL="WARNING",
+    METRICS_ENABLED="false",
+)
+sys.path.insert(0, BACKEND_DIR)
+
+import main  # noqa: E402
+
+main.init_db()
+
+
+@pytest.fixture
+def dog_id():
+    """A new dog with no history, so tests don't see each other's events"""
+    dog = main.insert_dog("test", 1)
+    main.dog_registry.add(dog["id"], dog["household_id"])
+    return dog["id"]
+
+
+@contextmanager
+def checkout_threads():
+    """Record the thread of every database checkout"""
+    threads = []
+    original = main.db_pool.connection
+
+    @contextmanager
+    def connection():
+        threads.append(threading.get_ident())
+        with original() as conn:
+            yield conn
+
+    main.db_pool.connection = connection
+    try:
+        yield threads
+    finally:
+        main.db_pool.connection = original
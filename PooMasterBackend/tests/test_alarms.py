@@ -0,0 +1,59 @@
+"""Alarm scheduler: which threshold crossings get announced"""
+import time
+
+import main
+
+HOUR = 3600
+
+
+def log(scheduler, dog_id, *timestamps):
+    """Insert pee events the way store_events does and let due alarms fire"""
+    rows = [(dog_id, "pee", timestamp, None, None) for timestamp in timestamps]
+    main.insert_events(rows)
+    main.interval_stats.record_many([row[:3] for row in rows])
+    scheduler.reschedule(dog_id)
+    scheduler._fire_due(time.time())
+
+
+def test_back_dated_events_announce_nothing(dog_id):
+    scheduler = main.AlarmScheduler([60, 75, 90])
+    main.interval_stats.load(dog_id)
+    start = int(time.time()) - 7 * 24 * HOUR
+    for n in range(5):
+        log(scheduler, dog_id, start + n * 4 * HOUR)
+    assert scheduler.fired == 0
+
+
+def test_shrinking_average_announces_the_highest_crossing_once(dog_id):
+    scheduler = main.AlarmScheduler([60, 75, 90])
+    main.interval_stats.load(dog_id)
+    now = int(time.time())
+    log(scheduler, dog_id, now - 10 * HOUR, now - 6 * HOUR, now - 2 * HOUR)
+    assert scheduler.fired == 0  # half of the 4h average
+
+    # Two forgotten trips logged late: the average drops to 2h, so the dog is due right now
+    log(scheduler, dog_id, now - 8 * HOUR, now - 4 * HOUR)
+    assert [alarm["threshold"] for alarm in scheduler.recent] == [90]
+    scheduler._fire_due(time.time() + 1)
+    assert scheduler.fired == 1
+
+
+def test_crossings_are_precomputed_and_fire_once_each(dog_id):
+    scheduler = main.AlarmScheduler([60, 75, 90])
+    main.interval_stats.load(dog_id)
+    now = int(time.time())
+    last = now - HOUR
+    log(scheduler, dog_id, last - 8 * HOUR, last - 4 * HOUR, last)
+
+    # 4h average: 60/75/90% of it after the last event
+    assert scheduler.upcoming(dog_id) == [
+        {"dog_id": dog_id, "event_type": "pee", "threshold": threshold,
+         "at": main.epoch_to_iso(last + int(4 * HOUR * threshold / 100))}
+        for threshold in (60, 75, 90)
+    ]
+    scheduler._fire_due(last + 3.1 * HOUR)
+    assert [alarm["threshold"] for alarm in scheduler.recent] == [60, 75]
+    scheduler._fire_due(last + 10 * HOUR)
+    scheduler._fire_due(last + 20 * HOUR)
+    assert [alarm["threshold"] for alarm in scheduler.recent] == [60, 75, 90]
+    assert scheduler.upcoming(dog_id) == []
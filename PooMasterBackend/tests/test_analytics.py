@@ -0,0 +1,67 @@
+"""Analytics series: the NumPy pass against a plain Python reference"""
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+
+import main
+
+HOUR = 3600
+
+
+def test_series_match_a_python_reference(dog_id):
+    rng = random.Random(dog_id)
+    now = int(time.time())
+    start = (now // HOUR - 10 * 24) * HOUR
+    times = sorted(start + rng.randint(0, now - start) for _ in range(150))
+    main.insert_events([(dog_id, "pee", start - 2 * HOUR, None, None)] +  # chains into the first interval
+                       [(dog_id, "pee", timestamp, None, None) for timestamp in times])
+    accidents = [start + rng.randint(0, now - start) for _ in range(12)]
+    main.insert_accidents([(dog_id, "pee", timestamp, "hall", None) for timestamp in accidents])
+
+    series = main.analytics_series(dog_id, start)
+    pee = series["pee"]
+    local = [datetime.fromtimestamp(timestamp) for timestamp in times]
+    intervals = [(end - begin) / 3600 for begin, end in zip([start - 2 * HOUR] + times, times)]
+
+    assert (pee["count"], pee["accidents"]) == (150, 12)
+    assert pee["accident_rate"] == round(12 / 150, 3)
+    assert pee["hourly"] == [Counter(moment.hour for moment in local)[hour] for hour in range(24)]
+    assert pee["accident_hourly"] == [Counter(datetime.fromtimestamp(t).hour for t in accidents)[hour]
+                                      for hour in range(24)]
+    # Rounded to 0.01h, and the two float paths may round a tie apart
+    assert abs(pee["interval_average_hours"] - statistics.mean(intervals)) <= 0.0051
+    quantiles = statistics.quantiles(intervals, n=100, method="inclusive")
+    assert list(pee["interval_percentiles_hours"]) == [f"p{pct}" for pct in main.INTERVAL_PERCENTILES]
+    for pct in main.INTERVAL_PERCENTILES:
+        assert abs(pee["interval_percentiles_hours"][f"p{pct}"] - quantiles[pct - 1]) <= 0.0051
+
+    days = series["days"]
+    daily = Counter(moment.date().isoformat() for moment in local)
+    assert pee["daily"]["count"] == [daily[day] for day in days]
+    assert sum(pee["daily"]["accidents"]) == 12
+    assert series["poo"]["count"] == 0 and series["poo"]["interval_percentiles_hours"] is None
+
+
+def test_trend_follows_lengthening_intervals(dog_id):
+    now = int(time.time())
+    start = (now // HOUR - 8 * 24) * HOUR
+    # Intervals grow by half an hour a day
+    times, timestamp = [], start + HOUR
+    while timestamp < now:
+        times.append(timestamp)
+        day = (timestamp - start) // 86400
+        timestamp += int((2 + 0.5 * day) * HOUR)
+    main.insert_events([(dog_id, "poo", timestamp, None, None) for timestamp in times])
+    trend = main.analytics_series(dog_id, start)["poo"]["interval_trend_hours_per_day"]
+    assert 0.3 < trend < 0.7
+
+
+def test_cache_drops_a_dog_on_new_data(dog_id):
+    cache = main.AnalyticsCache(4)
+    first = cache.get(dog_id, 7)
+    assert cache.get(dog_id, 7) is first and cache.hits == 1
+    main.insert_events([(dog_id, "pee", int(time.time()) - 60, None, None)])
+    cache.invalidate(dog_id)
+    assert cache.get(dog_id, 7)["pee"]["count"] == first["pee"]["count"] + 1
@@ -0,0 +1,82 @@
+"""Event archive: moving cold months out of SQLite and deduplicating across it"""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import main
+
+DAY = 86400
+
+
+@pytest.fixture
+def archived(dog_id):
+    """100 days of keyed events for a new dog, then everything older than 60 days archived"""
+    now = int(time.time())
+    rows = [(dog_id, "pee" if n % 3 else "poo", now - 100 * DAY + n * 6 * 3600, f"collar-{dog_id}", n)
+            for n in range(400)]
+    results = main.insert_events(rows)
+    before, _ = main.fetch_events(dog_id, None, 0, 1000)
+    moved = main.event_archive.archive(60)
+    return dog_id, rows, results, before, moved
+
+
+def hot_count(dog_id):
+    with main.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM events WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+
+
+def test_round_trip(archived):
+    dog_id, rows, _, before, moved = archived
+    assert moved > 0
+    assert hot_count(dog_id) == len(rows) - moved
+    after, _ = main.fetch_events(dog_id, None, 0, 1000)
+    assert after == before
+
+
+def test_replay_after_archiving_is_deduplicated(archived):
+    dog_id, rows, results, _, _ = archived
+    replayed = main.insert_events(rows)
+    assert replayed == [(event_id, False) for event_id, _ in results]
+    after, _ = main.fetch_events(dog_id, None, 0, 1000)
+    assert len(after) == len(rows)
+
+
+def test_journal_replay_after_archiving(archived, tmp_path):
+    dog_id, rows, results, _, _ = archived
+    journal = main.IngestJournal(str(tmp_path / "ingest.journal"), False, 100, 0.0, 1 << 20)
+
+    # A journal left behind by a crash after its records were committed, and some of them archived since
+    records = [["e", event_id, *row] for (event_id, _), row in zip(results, rows)]
+    with open(journal.path, "w") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+    journal.recover()
+    assert journal.replayed == 0
+    assert os.path.getsize(journal.path) == 0
+    after, _ = main.fetch_events(dog_id, None, 0, 1000)
+    assert len(after) == len(rows)
+
+    # A device re-sending archived events while the journal is running
+    journal.start()
+    try:
+        resent = asyncio.run(journal.submit_events(rows[:5]))
+    finally:
+        journal.stop()
+    assert resent == [(event_id, False) for event_id, _ in results[:5]]
+    assert journal.written == 0
+
+
+def test_statistics_are_unchanged_by_archiving(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee" if n % 4 else "poo", now - 120 * DAY + n * 5 * 3600, None, None)
+                        for n in range(500)])
+    main.insert_accidents([(dog_id, "pee", now - day * DAY, "hall", None) for day in range(0, 120, 7)])
+    cutoffs = (0, now - 90 * DAY, now - 60 * DAY - 5000)
+    before = [main.window_stats(dog_id, cutoff) for cutoff in cutoffs], main.analytics_series(dog_id, now - 100 * DAY)
+
+    main.event_archive.archive(60)
+    assert hot_count(dog_id) < 500
+    after = [main.window_stats(dog_id, cutoff) for cutoff in cutoffs], main.analytics_series(dog_id, now - 100 * DAY)
+    assert after == before
@@ -0,0 +1,27 @@
+"""Bulk status: the vectorized pass against the per-dog status path"""
+import time
+
+import main
+
+HOUR = 3600
+
+
+def test_bulk_status_matches_per_dog_status(dog_id):
+    now = int(time.time())
+    dogs = [dog_id] + [main.insert_dog("test", 1)["id"] for _ in range(3)]
+    # Every 4 hours, last one 1h, 3.3h and 5h ago: green, yellow and red; the last dog has no events
+    for dog, age in zip(dogs, (1, 3.3, 5)):
+        last = now - int(age * HOUR)
+        main.insert_events([(dog, "pee", last - n * 4 * HOUR, None, None) for n in range(5)] +
+                           [(dog, "poo", last - n * 12 * HOUR, None, None) for n in range(3)])
+
+    bulk = main.compute_bulk_status(dogs)
+    assert bulk["count"] == len(dogs)
+    for event_type in ("pee", "poo"):
+        for index, dog in enumerate(dogs):
+            single = main.get_status_for_type(event_type, dog)
+            assert {channel: bulk[event_type][channel][index] for channel in "rgb"} == single["color"]
+            assert bulk[event_type]["alarm"][index] == single["alarm"]
+            assert abs(bulk[event_type]["time_since"][index] - single["time_since"]) <= 0.01
+            assert abs(bulk[event_type]["percentage"][index] - single["percentage"]) <= 0.1
+    assert [bulk["pee"]["alarm"][index] for index in range(4)] == [False, False, True, True]
@@ -0,0 +1,114 @@
+"""Cluster worker: applying the coordinator's invalidations"""
+import asyncio
+import os
+import threading
+import time
+
+import main
+from conftest import checkout_threads
+
+
+async def fake_coordinator(path):
+    """Accept one worker connection and hand back its writer"""
+    connected = asyncio.get_running_loop().create_future()
+
+    async def serve(reader, writer):
+        connected.set_result(writer)
+
+    server = await asyncio.start_unix_server(serve, path=path)
+    return server, connected
+
+
+def test_broadcast_invalidation_reloads_off_the_loop(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - 7200, None, None), (dog_id, "pee", now - 3600, None, None)])
+
+    async def run():
+        main.status_broadcaster.start()
+        path = os.path.join(os.path.dirname(main.DB_PATH), f"cluster-{dog_id}.sock")
+        server, connected = await fake_coordinator(path)
+        worker = main.ClusterWorker(path)
+        await worker.start()
+        coordinator = await connected
+        try:
+            await main.ensure_dog_loaded(dog_id)
+            main.status_broadcaster.version(dog_id)  # a long-poll client is watching this dog
+            before = main.status_cache.get(dog_id).status.pee_time_since
+
+            # Another worker's write, committed by the coordinator
+            main.insert_events([(dog_id, "pee", now - 60, None, None)])
+            with checkout_threads() as threads:
+                coordinator.write(main._frame({"op": "changed", "dogs": [dog_id]}))
+                await coordinator.drain()
+                while worker.invalidations == 0:
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.2)  # the reload, then the broadcaster's refresh
+                after = main.status_cache.get(dog_id).status.pee_time_since
+
+            assert threads, "the reload should have read the database"
+            assert threading.get_ident() not in threads
+            assert after < before
+        finally:
+            await worker.stop()
+            coordinator.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_coordinator_answers_and_publishes(dog_id, monkeypatch):
+    errors = []
+    monkeypatch.setattr(main.logger, "error", lambda message, **kwargs: errors.append(message))
+
+    async def run():
+        main.status_broadcaster.start()
+        path = os.path.join(os.path.dirname(main.DB_PATH), f"coordinator-{dog_id}.sock")
+        coordinator = main.ClusterCoordinator(path)
+        await coordinator.start()
+        worker = main.ClusterWorker(path)
+        await worker.start()
+        try:
+            results = await asyncio.gather(*(worker.call("alarms", dog_id) for _ in range(20)))
+            assert all(result["upcoming"] == [] for result in results)
+
+            coordinator.publish_changed(dog_id)
+            while worker.invalidations == 0:
+                await asyncio.sleep(0.01)
+
+            # A malformed request fails in its handler task: logged, and the task is let go
+            worker._writer.write(main._frame({"op": "alarms", "args": [dog_id]}))
+            while not any(error.startswith("Cluster request handler failed") for error in errors):
+                await asyncio.sleep(0.01)
+            assert coordinator.requests == 21
+            assert not coordinator._handling
+        finally:
+            await worker.stop()
+            await coordinator.stop()
+
+    asyncio.run(run())
+
+
+def test_workers_agree_on_versions_for_the_same_display(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - 8 * 3600, None, None), (dog_id, "pee", now - 4 * 3600, None, None)])
+    main.interval_stats.load(dog_id)
+
+    async def run():
+        workers = [main.StatusBroadcaster(1.0) for _ in range(2)]
+        for worker in workers:
+            worker._content_versions = True
+            worker.start()
+        first = [worker.version(dog_id) for worker in workers]
+
+        # Only one worker sees the write; the other catches up on its next look
+        main.insert_events([(dog_id, "pee", now - 60, None, None)])
+        main.interval_stats.record(dog_id, "pee", now - 60)
+        main.status_cache.invalidate(dog_id)
+        workers[0]._refresh(dog_id, force=True)
+        second = [worker.version(dog_id) for worker in workers]
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first[0] == first[1]
+    assert second[0] == second[1] != first[0]
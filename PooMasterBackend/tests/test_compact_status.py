@@ -0,0 +1,48 @@
+"""Compact status: the 16-byte struct and CSV line for microcontrollers"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+
+
+def status(**overrides):
+    fields = dict(pee={"r": 255, "g": 127, "b": 0}, poo={"r": 0, "g": 255, "b": 0}, pee_alarm=True, poo_alarm=False,
+                  pee_time_since=3.5, poo_time_since=2000.0, pee_percentage=87.46, poo_percentage=12.0)
+    fields.update(overrides)
+    return main.LEDStatus(**fields)
+
+
+def test_struct_and_csv_layout():
+    encoded = main.CompactStatus(status(), 1700000000, "bin")
+    assert len(encoded.body) == main.COMPACT_STATUS_STRUCT.size == 16
+    # Percentages in tenths, times in minutes, clamped to u16
+    assert main.COMPACT_STATUS_STRUCT.unpack(encoded.body) == (1, 1, 255, 127, 0, 0, 255, 0, 875, 120, 210, 65535)
+    assert encoded.media_type == "application/octet-stream"
+
+    line = main.CompactStatus(status(), 1700000000, "csv")
+    assert line.body == b"1,1,255,127,0,0,255,0,875,120,210,65535\n"
+    assert line.etag != encoded.etag
+
+
+def test_changes_below_the_resolution_keep_the_etag():
+    first = main.CompactStatus(status(), None, "bin")
+    assert main.CompactStatus(status(pee_time_since=3.502, pee_percentage=87.47), None, "bin").etag == first.etag
+    assert main.CompactStatus(status(pee_time_since=3.52), None, "bin").etag != first.etag
+
+
+def test_endpoint_answers_304_for_a_matching_etag(dog_id):
+    def get(fmt, **headers):
+        request = Request({"type": "http", "method": "GET",
+                           "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+        return asyncio.run(main.get_compact_status(request, format=fmt, dog_id=dog_id, wait=None, since=None))
+
+    response = get("bin")
+    assert response.status_code == 200 and len(response.body) == 16
+    assert main.status_cache.get(dog_id).compact("bin").body == response.body
+    assert get("bin", if_none_match=response.headers["etag"]).status_code == 304
+    with pytest.raises(HTTPException) as error:
+        get("json")
+    assert error.value.status_code == 400
@@ -0,0 +1,62 @@
+"""Config hot reload"""
+import json
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"DEFAULT_PEE_INTERVAL": 3.0}))
+    manager = main.ConfigManager(str(path))
+    manager.load()
+    return manager
+
+
+def rewrite(manager, values):
+    with open(manager.path, "w") as f:
+        json.dump(values, f)
+    # Writes within one mtime tick look unchanged to check(); move the mtime on
+    os.utime(manager.path, ns=(0, os.stat(manager.path).st_mtime_ns + 1))
+
+
+def test_valid_change_applies_and_calls_back(manager):
+    seen = []
+    manager.on_change(lambda old, new, changed: seen.append((old.DEFAULT_PEE_INTERVAL, new.DEFAULT_PEE_INTERVAL, changed)))
+    rewrite(manager, {"DEFAULT_PEE_INTERVAL": 5.0})
+    assert manager.check() == ["DEFAULT_PEE_INTERVAL"]
+    assert manager.current.DEFAULT_PEE_INTERVAL == 5.0
+    assert seen == [(3.0, 5.0, ["DEFAULT_PEE_INTERVAL"])]
+    assert manager.sources["DEFAULT_PEE_INTERVAL"] == "config.json"
+
+
+def test_invalid_value_keeps_every_previous_setting(manager):
+    before = manager.current
+    rewrite(manager, {"DEFAULT_PEE_INTERVAL": -1, "STATUS_CACHE_TTL": 9.0})
+    assert manager.check() == []
+    assert manager.current is before
+    assert manager.current.DEFAULT_PEE_INTERVAL == 3.0
+    assert "DEFAULT_PEE_INTERVAL" in manager.last_error
+
+    rewrite(manager, {"DEFAULT_PEE_INTERVAL": 4.0})
+    assert manager.check() == ["DEFAULT_PEE_INTERVAL"]
+    assert manager.last_error is None
+
+
+def test_broken_file_keeps_previous_settings(manager):
+    before = manager.current
+    with open(manager.path, "w") as f:
+        f.write('{"DEFAULT_PEE_INTERVAL": 4')
+    assert manager.check() == []
+    assert manager.current is before
+    assert manager.last_error
+
+
+def test_restart_only_key_is_reported_pending(manager):
+    rewrite(manager, {"DEFAULT_PEE_INTERVAL": 3.0, "DB_POOL_SIZE": 17})
+    assert manager.check() == []
+    assert manager.pending == {"DB_POOL_SIZE": 17}
+    assert manager.current.DB_POOL_SIZE != 17
@@ -0,0 +1,88 @@
+"""Database layer: the connection pool, schema migrations and the DB executor"""
+import asyncio
+import sqlite3
+import threading
+
+import main
+
+
+def test_pool_reuses_connections_and_bounds_checkouts(tmp_path):
+    pool = main.ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.1)
+    try:
+        with pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == main.DB_JOURNAL_MODE.lower()
+            with pool.connection() as nested:
+                assert nested is conn
+
+            # The only slot is taken: another thread gives up after the timeout
+            errors = []
+
+            def other():
+                try:
+                    with pool.connection():
+                        pass
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join()
+            assert len(errors) == 1
+
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        # Released without a commit: rolled back, and the same connection comes back
+        with pool.connection() as again:
+            assert again is conn
+            assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        assert pool.stats()["open_connections"] == 1
+    finally:
+        pool.close_all()
+
+
+def test_migrations_upgrade_a_legacy_database(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.row_factory = sqlite3.Row
+    # The schema before migrations were tracked: ISO text timestamps, no dogs
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT NOT NULL, "
+                 "timestamp DATETIME NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE TABLE accidents (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT NOT NULL, "
+                 "estimated_time DATETIME NOT NULL, location TEXT NOT NULL, notes TEXT, "
+                 "created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO events (event_type, timestamp) VALUES ('pee', '2024-03-01T08:00:00'), "
+                 "('pee', '2024-03-01T12:30:00')")
+    conn.execute("INSERT INTO accidents (event_type, estimated_time, location) VALUES ('poo', '2024-03-01T10:00:00', 'hall')")
+    conn.commit()
+
+    main.run_migrations(conn)
+    assert main.get_schema_version(conn.cursor()) == main.SCHEMA_VERSION
+    assert [tuple(row) for row in conn.execute("SELECT dog_id, timestamp FROM events ORDER BY id")] == [
+        (main.DEFAULT_DOG_ID, main.to_epoch(main.datetime(2024, 3, 1, 8))),
+        (main.DEFAULT_DOG_ID, main.to_epoch(main.datetime(2024, 3, 1, 12, 30))),
+    ]
+    assert conn.execute("SELECT estimated_time FROM accidents").fetchone()[0] == main.to_epoch(main.datetime(2024, 3, 1, 10))
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT timestamp FROM events WHERE dog_id = 1 AND event_type = 'pee' AND timestamp >= 0"))
+    assert "idx_events_dog_type_timestamp" in plan
+
+    # Already current: nothing to do, and new rows keep their ids after the table rebuild
+    main.run_migrations(conn)
+    conn.execute("INSERT INTO events (event_type, timestamp) VALUES ('poo', 0)")
+    assert conn.execute("SELECT MAX(id) FROM events").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(main.MIGRATIONS)
+    conn.close()
+
+
+def test_run_db_runs_on_the_executor_with_the_request_context():
+    def helper(value):
+        with main.get_db() as conn:
+            conn.execute("SELECT 1")
+        return threading.current_thread().name, main.request_id_var.get(), value
+
+    async def run():
+        main.request_id_var.set("req-1")
+        return threading.current_thread().name, await main.run_db(helper, value=42)
+
+    loop_thread, (helper_thread, request_id, value) = asyncio.run(run())
+    assert helper_thread.startswith("db") and helper_thread != loop_thread
+    assert (request_id, value) == ("req-1", 42)
@@ -0,0 +1,50 @@
+"""Batched event ingestion: deduplication and validation"""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def stored(dog_id):
+    with main.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM events WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+
+
+def test_duplicates_within_one_batch_share_an_id(dog_id):
+    now = int(time.time())
+    device = f"collar-{dog_id}"
+    rows = [(dog_id, "pee", now - 300, device, 1), (dog_id, "poo", now - 200, device, 2),
+            (dog_id, "pee", now - 300, device, 1), (dog_id, "pee", now - 100, None, None),
+            (dog_id, "pee", now - 100, None, None)]
+    results = main.insert_events(rows)
+    assert [created for _, created in results] == [True, True, False, True, True]
+    assert results[2][0] == results[0][0]
+    assert results[3][0] != results[4][0]  # no key, no deduplication
+    assert stored(dog_id) == 4
+
+    # Retrying the whole batch creates nothing
+    assert main.insert_events(rows[:3]) == [(results[0][0], False), (results[1][0], False), (results[0][0], False)]
+    assert stored(dog_id) == 4
+
+
+def test_batch_endpoint_reports_duplicates_and_rejects_bad_rows(dog_id):
+    def event(event_type="pee", sequence=None, dog=dog_id):
+        return main.EventCreate(event_type=event_type, dog_id=dog, timestamp=datetime(2024, 5, 1, 8, sequence or 0),
+                                device_id=f"collar-{dog_id}" if sequence is not None else None, sequence=sequence)
+
+    response = asyncio.run(main.log_events_batch([event(sequence=1), event(sequence=1), event("poo")]))
+    assert (response["created"], response["duplicates"]) == (2, 1)
+    assert [result["duplicate"] for result in response["results"]] == [False, True, False]
+    assert response["results"][0]["event_id"] == response["results"][1]["event_id"]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.log_events_batch([event(), event("wee")]))
+    assert error.value.status_code == 400 and error.value.detail["invalid_indexes"] == [1]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.log_events_batch([event(), event(dog=10 ** 9)]))
+    assert error.value.status_code == 404
+    assert stored(dog_id) == 2
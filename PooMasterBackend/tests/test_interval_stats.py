@@ -0,0 +1,43 @@
+"""Interval statistics: incremental updates against a full scan of the events table"""
+import random
+import time
+
+import main
+
+HOUR = 3600
+
+
+def test_incremental_updates_match_a_full_scan(dog_id):
+    store = main.IntervalStatsStore(window_days=7, capacity=10)
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - 10 * 24 * HOUR, None, None)])
+    store.load(dog_id)
+
+    # Out of order, as devices replaying an offline buffer send them
+    rng = random.Random(dog_id)
+    timestamps = [now - rng.randint(60, 9 * 24 * HOUR) for _ in range(40)]
+    for timestamp in timestamps:
+        main.insert_events([(dog_id, "pee", timestamp, None, None)])
+    store.record_many([(dog_id, "pee", timestamp) for timestamp in timestamps])
+
+    last_event, _ = store.snapshot(dog_id, "pee", now)
+    assert last_event == max(timestamps)
+    assert abs(store.window_average(dog_id, "pee", now) - main.calculate_average_interval("pee", 7, dog_id)) < 1e-3
+    assert store.snapshot(dog_id, "poo", now) == (None, main.default_interval("poo"))
+
+
+def test_least_recently_used_dogs_are_evicted(dog_id):
+    store = main.IntervalStatsStore(window_days=7, capacity=2)
+    dogs = [dog_id] + [main.insert_dog("test", 1)["id"] for _ in range(2)]
+    store.load(dogs[0])
+    store.load(dogs[1])
+    store.snapshot(dogs[0], "pee")
+    store.load(dogs[2])
+    assert store.dog_ids() == [dogs[0], dogs[2]]
+
+    # Writes for an evicted dog are picked up by its next load
+    now = int(time.time())
+    main.insert_events([(dogs[1], "pee", now - HOUR, None, None)])
+    store.record(dogs[1], "pee", now - HOUR)
+    assert store.snapshot(dogs[1], "pee", now)[0] == now - HOUR
+    assert store.stats()["misses"] == 4
@@ -0,0 +1,117 @@
+"""Ingest journal: recovery after a crash"""
+import asyncio
+import json
+import os
+import time
+
+import main
+
+
+def new_journal(path):
+    return main.IngestJournal(str(path), True, 100, 0.0, 1 << 20)
+
+
+def stored(dog_id):
+    with main.get_db() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT id, timestamp, device_id, client_seq FROM events WHERE dog_id = ? ORDER BY id", (dog_id,))]
+
+
+def test_acknowledged_events_survive_a_crash_before_commit(dog_id, tmp_path, monkeypatch):
+    path = tmp_path / "ingest.journal"
+    now = int(time.time())
+    rows = [(dog_id, "pee", now - 60 * n, f"collar-{dog_id}", n) for n in range(10)]
+
+    journal = new_journal(path)
+    journal.start()
+    # The process dies after the journal write but before the SQLite commit
+    monkeypatch.setattr(journal, "_commit_with_retry", lambda batch: None)
+    try:
+        acknowledged = asyncio.run(journal.submit_events(rows))
+    finally:
+        journal.stop()
+    assert stored(dog_id) == []
+    assert os.path.getsize(path) > 0
+
+    recovered = new_journal(path)
+    recovered.recover()
+    assert recovered.replayed == len(rows)
+    assert [row[0] for row in stored(dog_id)] == sorted(event_id for event_id, _ in acknowledged)
+    assert os.path.getsize(path) == 0
+
+    # Devices that never saw the acknowledgement send the same events again
+    recovered.start()
+    try:
+        resent = asyncio.run(recovered.submit_events(rows))
+    finally:
+        recovered.stop()
+    assert resent == [(event_id, False) for event_id, _ in acknowledged]
+    assert len(stored(dog_id)) == len(rows)
+
+
+def test_recover_skips_committed_and_torn_records(dog_id, tmp_path):
+    path = tmp_path / "ingest.journal"
+    now = int(time.time())
+    (committed_id, _), = main.insert_events([(dog_id, "pee", now - 3600, None, None)])
+    with main.get_db() as conn:
+        next_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0] + 1
+    records = [
+        ["e", committed_id, dog_id, "pee", now - 3600, None, None],  # made it into SQLite before the crash
+        ["e", next_id, dog_id, "poo", now - 1800, None, None],       # didn't
+    ]
+    torn = json.dumps(["e", next_id + 1, dog_id, "pee", now, None, None])
+    with open(path, "w") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+        f.write(torn[:len(torn) // 2])  # the crash hit mid-append; never acknowledged
+
+    journal = new_journal(path)
+    journal.recover()
+    assert journal.replayed == 1
+    assert [row[:2] for row in stored(dog_id)] == [(committed_id, now - 3600), (next_id, now - 1800)]
+    assert os.path.getsize(path) == 0
+
+    # Recovering again is a no-op
+    journal.recover()
+    assert len(stored(dog_id)) == 2
+
+
+def test_all_duplicate_submission_skips_the_write(dog_id, tmp_path, monkeypatch):
+    path = tmp_path / "ingest.journal"
+    rows = [(dog_id, "pee", int(time.time()) - 60 * n, f"collar-{dog_id}", n) for n in range(3)]
+    (event_id, _), = main.insert_events(rows[:1])
+
+    journal = new_journal(path)
+    journal.start()
+    fsyncs = []
+    monkeypatch.setattr(main.os, "fsync", fsyncs.append)
+    try:
+        replies = asyncio.run(journal.submit_events(rows[:1]))
+        assert replies == [(event_id, False)]
+        assert (journal.written, journal.fsyncs, fsyncs) == (0, 0, [])
+        assert os.path.getsize(path) == 0
+
+        replies = asyncio.run(journal.submit_events(rows))
+        assert replies[0] == (event_id, False) and all(created for _, created in replies[1:])
+        assert (journal.written, journal.fsyncs, len(fsyncs)) == (2, 1, 1)
+    finally:
+        journal.stop()
+
+
+def test_concurrent_submissions_share_fsyncs(dog_id, tmp_path, monkeypatch):
+    journal = new_journal(tmp_path / "ingest.journal")
+    journal.start()
+    # A slow disk: submissions pile up behind each fsync and go out in groups
+    monkeypatch.setattr(main.os, "fsync", lambda fd: time.sleep(0.01))
+    now = int(time.time())
+
+    async def submit_all():
+        return await asyncio.gather(*(journal.submit_events([(dog_id, "pee", now - n, None, None)]) for n in range(50)))
+
+    try:
+        replies = asyncio.run(submit_all())
+    finally:
+        journal.stop()
+    assert len({event_id for (event_id, _), in replies}) == 50
+    assert journal.written == journal.committed == 50
+    assert journal.fsyncs < 25
+    assert len(stored(dog_id)) == 50
@@ -0,0 +1,23 @@
+"""Load-test suite: a short in-process run completes and records every endpoint"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+
+def test_short_run_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+    subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "load_test.py"),
+                    "--sizes", "10k", "--dogs", "5", "--duration", "1", "--pollers", "2", "--loggers", "1",
+                    "--dashboards", "1", "--seed-dir", str(tmp_path / "seeds"), "--output", str(output)],
+                   cwd=BACKEND_DIR, check=True, capture_output=True, timeout=120)
+
+    run, = json.loads(output.read_text())["runs"]
+    assert (run["size"], run["mode"], run["events"]) == ("10k", "inprocess", 10_000)
+    assert set(run["endpoints"]) == {"GET /api/v1/status", "POST /api/v1/events",
+                                     "GET /api/v1/history", "GET /api/v1/analytics"}
+    for endpoint, result in run["endpoints"].items():
+        assert result["requests"] > 0 and result["errors"] == 0, endpoint
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
@@ -0,0 +1,66 @@
+"""Logging pipeline: JSON lines, request ids, the bounded queue and rate limiting"""
+import io
+import json
+import logging
+import queue
+
+import main
+
+
+def capture(name, *handlers):
+    log = logging.getLogger(f"test.{name}")
+    log.propagate = False
+    log.handlers = list(handlers)
+    log.setLevel(logging.DEBUG)
+    return log
+
+
+def test_json_lines_carry_the_request_id():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(main.JsonFormatter())
+    handler.addFilter(main.RequestIdFilter())
+    log = capture("json", handler)
+
+    token = main.request_id_var.set("req-42")
+    try:
+        log.info("hello %s", "there")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.error("failed", exc_info=True)
+    finally:
+        main.request_id_var.reset(token)
+    log.info("outside a request")
+
+    first, second, third = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert (first["message"], first["level"], first["request_id"]) == ("hello there", "INFO", "req-42")
+    assert "ValueError: boom" in second["exc_info"]
+    assert third["request_id"] == "-"
+
+
+def test_full_queue_drops_and_counts():
+    handler = main.DroppingQueueHandler(queue.Queue(2))
+    log = capture("queue", handler)
+    for n in range(5):
+        log.warning("record %d", n)
+    assert handler.dropped == 3
+    # Messages are resolved before they cross to the writer thread
+    assert handler.queue.get_nowait().msg == "record 0"
+
+
+def test_repeats_are_rate_limited(monkeypatch):
+    monkeypatch.setattr(main.config, "current", main.config.current.model_copy(update={"LOG_RATE_LIMIT": 60.0}))
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    limited = main.RateLimitedLog(capture("rate", handler))
+    for _ in range(4):
+        limited("key", logging.WARNING, "same thing")
+    limited("other", logging.WARNING, "different thing")
+    assert [record.getMessage() for record in records] == ["same thing", "different thing"]
+
+    # Once the interval has passed, the next one reports what was suppressed
+    limited._next["key"] = (0.0, limited._next["key"][1])
+    limited("key", logging.WARNING, "same thing")
+    assert records[-1].getMessage() == "same thing (3 similar suppressed)"
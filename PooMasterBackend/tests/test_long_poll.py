@@ -0,0 +1,34 @@
+"""Long polling: status versions and waiting for a change"""
+import asyncio
+import time
+
+import main
+
+
+def test_versions_move_only_on_change_and_wake_waiters(dog_id, monkeypatch):
+    monkeypatch.setattr(main.config, "current", main.config.current.model_copy(update={"STATUS_WAIT_MAX": 0.2}))
+
+    async def run():
+        broadcaster = main.status_broadcaster
+        broadcaster.start()
+        await main.ensure_dog_loaded(dog_id)
+        version = broadcaster.version(dog_id)
+        assert broadcaster.version(dog_id) == version
+
+        # A stale `since` answers straight away; no change means waiting out the (capped) timeout
+        assert await main.await_status_version(dog_id, 30.0, version - 1) == version
+        start = time.monotonic()
+        assert await main.await_status_version(dog_id, 30.0, version) == version
+        assert 0.15 < time.monotonic() - start < 1.0
+        assert broadcaster.waiter_count == 0
+
+        waiters = [asyncio.ensure_future(main.await_status_version(dog_id, 30.0, version)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert broadcaster.waiter_count == 3
+        await main.store_events([(dog_id, "pee", int(time.time()) - 60, None, None)])
+        new_versions = await asyncio.wait_for(asyncio.gather(*waiters), 0.15)
+        assert len(set(new_versions)) == 1 and new_versions[0] > version
+        assert broadcaster.version(dog_id) == new_versions[0]
+        assert broadcaster.waiter_count == 0
+
+    asyncio.run(run())
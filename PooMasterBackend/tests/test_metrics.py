@@ -0,0 +1,71 @@
+"""Prometheus metrics: helper timings and the /metrics exposition"""
+import asyncio
+import time
+
+import main
+
+
+def sample(name, **labels):
+    """Value of one series in the current /metrics text, 0 when absent"""
+    selector = name + main._format_labels(labels)
+    for line in main.render_metrics().splitlines():
+        if line.startswith(selector + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_insert_events_is_timed_per_call(dog_id):
+    before = sample("poomaster_db_query_duration_seconds_count", helper="insert_events")
+    now = int(time.time())
+    for n in range(3):
+        main.insert_events([(dog_id, "pee", now - n * 60, None, None)])
+    assert sample("poomaster_db_query_duration_seconds_count", helper="insert_events") == before + 3
+
+
+def test_interval_stats_load_is_timed(dog_id):
+    before = sample("poomaster_db_query_duration_seconds_count", helper="interval_stats_load")
+    main.interval_stats.evict(dog_id)
+    main.interval_stats.snapshot(dog_id, "pee")  # a miss loads the dog
+    assert sample("poomaster_db_query_duration_seconds_count", helper="interval_stats_load") == before + 1
+
+
+def test_histogram_exposition():
+    histogram = main.Histogram("test_seconds", "Test histogram", ("path",), buckets=(0.001, 0.01, 1.0))
+    for value in (0.0005, 0.001, 0.5, 20.0):
+        histogram.observe(value, 'say "hi"\n')
+    labels = 'path="say \\"hi\\"\\n"'
+    assert histogram.render() == [
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        f'test_seconds_bucket{{{labels},le="0.001"}} 2',
+        f'test_seconds_bucket{{{labels},le="0.01"}} 2',
+        f'test_seconds_bucket{{{labels},le="1"}} 3',
+        f'test_seconds_bucket{{{labels},le="+Inf"}} 4',
+        f"test_seconds_sum{{{labels}}} 20.501500",
+        f"test_seconds_count{{{labels}}} 4",
+    ]
+
+
+def test_middleware_counts_requests_per_route(monkeypatch):
+    monkeypatch.setattr(main.config, "current", main.config.current.model_copy(update={"METRICS_TIMING": True}))
+
+    async def inner(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200 if scope["path"] == "/api/v1/status" else 404})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = main.MetricsMiddleware(inner)
+    before = {route: sample("poomaster_http_requests_total", route=route, method="GET", status=status)
+              for route, status in (("/api/v1/status", "200"), ("other", "404"))}
+    for path in ("/api/v1/status", "/api/v1/status", "/no/such/path"):
+        scope = {"type": "http", "path": path, "method": "GET", "client": ("10.0.0.7", 1234)}
+        asyncio.run(middleware(scope, None, send))
+
+    assert sample("poomaster_http_requests_total", route="/api/v1/status", method="GET", status="200") == \
+        before["/api/v1/status"] + 2
+    # Unknown paths share one label, so the series stay bounded
+    assert sample("poomaster_http_requests_total", route="other", method="GET", status="404") == before["other"] + 1
+    assert sample("poomaster_http_request_duration_seconds_count", route="other", method="GET") >= 1
+    assert main.polling_devices.count() >= 1
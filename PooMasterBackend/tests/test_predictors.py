@@ -0,0 +1,87 @@
+"""Interval predictors: estimates, persisted state, and the stats store around them"""
+import time
+
+import pytest
+
+import main
+
+HOUR = 3600
+
+
+def use_predictor(monkeypatch, name, **overrides):
+    current = main.config.current.model_copy(update=dict(PREDICTOR=name, **overrides))
+    monkeypatch.setattr(main, "predictor", main.make_predictor(current))
+    return main.predictor
+
+
+def test_model_backed_stats_keep_the_window_bounded(dog_id, monkeypatch):
+    use_predictor(monkeypatch, "ewma")
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - 20 * 24 * HOUR, None, None)])
+    store = main.IntervalStatsStore(window_days=7, capacity=10)
+    store.load(dog_id)
+    for days_ago in (15, 10, 3, 1):
+        timestamp = now - days_ago * 24 * HOUR
+        main.insert_events([(dog_id, "pee", timestamp, None, None)])
+        store.record(dog_id, "pee", timestamp)
+        store.snapshot(dog_id, "pee", now)
+    with store._lock:
+        stats = store._dogs[dog_id]["pee"]
+        assert stats.model is not None
+        assert stats.timestamps == [now - 3 * 24 * HOUR, now - 1 * 24 * HOUR]
+
+
+def feed(model, timestamps):
+    state = model.new_state()
+    for timestamp in timestamps:
+        model.advance(state, timestamp)
+    return state
+
+
+def test_robust_predictors_shrug_off_one_long_gap(monkeypatch):
+    # Every 4 hours with one 12 hour gap: the mean says 5.14h
+    timestamps = [1_700_000_000 + hours * HOUR for hours in (0, 4, 8, 12, 24, 28, 32, 36)]
+    estimates = {}
+    for name in ("ewma", "median", "trimmed"):
+        model = use_predictor(monkeypatch, name, PREDICTOR_ALPHA=0.3, PREDICTOR_WINDOW=5, PREDICTOR_TRIM=0.2)
+        estimates[name] = model.estimate(feed(model, timestamps), timestamps[-1], 99.0)
+    assert estimates["median"] == 4.0
+    assert estimates["trimmed"] == 4.0
+    assert 4.0 < estimates["ewma"] < 36 / 7
+    assert model.estimate(model.new_state(), timestamps[-1], 99.0) == 99.0
+
+
+def test_time_of_day_expects_the_overnight_gap_only_in_the_evening(monkeypatch):
+    model = use_predictor(monkeypatch, "time_of_day", PREDICTOR_ALPHA=0.3, PREDICTOR_MIN_SAMPLES=2)
+    start = main.to_epoch(main.datetime(2024, 3, 4, 8))
+    timestamps = [start + day * 24 * HOUR + hour * HOUR for day in range(4) for hour in (0, 4, 8, 12)]
+    state = feed(model, timestamps)
+    evening, midday = timestamps[-1], timestamps[-3]
+    assert abs(model.estimate(state, evening, 99.0) - 12.0) < 1e-9
+    assert abs(model.estimate(state, midday, 99.0) - 4.0) < 1e-9
+    # Too few samples at this hour: the overall EWMA
+    assert model.estimate(state, evening + 3 * HOUR, 99.0) == state["value"]
+
+
+def test_persisted_state_tracks_inserts_and_back_dated_events(dog_id, monkeypatch):
+    model = use_predictor(monkeypatch, "median", PREDICTOR_WINDOW=5)
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - hours * HOUR, None, None) for hours in (20, 16, 12)])
+    main.insert_events([(dog_id, "pee", now - 9 * HOUR, None, None)])
+    main.insert_events([(dog_id, "pee", now - 14 * HOUR, None, None)])  # back-dated: earlier intervals change
+
+    with main.get_db() as conn:
+        cursor = conn.cursor()
+        stored = main.load_predictor_state(cursor, dog_id, "pee", now - 9 * HOUR)
+        replayed = main.replay_predictor_state(cursor, dog_id, "pee")
+        assert stored == replayed
+        assert stored["recent"] == [4.0, 2.0, 2.0, 3.0]
+
+        # Other parameters never reuse this state
+        use_predictor(monkeypatch, "median", PREDICTOR_WINDOW=2)
+        cursor.execute("SELECT COUNT(*) FROM predictor_state WHERE dog_id = ? AND predictor = ?",
+                       (dog_id, main.predictor.key))
+        assert cursor.fetchone()[0] == 0
+        assert main.load_predictor_state(cursor, dog_id, "pee", now - 9 * HOUR)["recent"] == [2.0, 3.0]
+        conn.commit()
+    assert model.key != main.predictor.key
@@ -0,0 +1,58 @@
+"""Analytics rollups: window statistics against the raw events"""
+import random
+import time
+
+import main
+
+HOUR = 3600
+
+
+def raw_stats(dog_id, event_type, cutoff):
+    """What window_stats should report, straight from the events and accidents tables"""
+    with main.get_db() as conn:
+        times = [row[0] for row in conn.execute(
+            "SELECT timestamp FROM events WHERE dog_id = ? AND event_type = ? ORDER BY timestamp",
+            (dog_id, event_type))]
+        accidents = conn.execute(
+            "SELECT COUNT(*) FROM accidents WHERE dog_id = ? AND event_type = ? AND estimated_time >= ?",
+            (dog_id, event_type, cutoff)).fetchone()[0]
+    # An interval belongs to the event that ends it
+    intervals = [end - start for start, end in zip(times, times[1:]) if end >= cutoff]
+    return {"count": sum(1 for t in times if t >= cutoff), "interval_count": len(intervals),
+            "interval_sum": sum(intervals), "interval_min": min(intervals, default=None),
+            "interval_max": max(intervals, default=None), "accidents": accidents}
+
+
+def test_window_stats_match_raw_events(dog_id):
+    rng = random.Random(dog_id)
+    now = int(time.time())
+    timestamps = [now - rng.randint(0, 20 * 24 * HOUR) for _ in range(300)]
+    # Several batches, out of order, so rollups are refreshed around earlier buckets too
+    for start in range(0, len(timestamps), 50):
+        main.insert_events([(dog_id, rng.choice(("pee", "poo")), timestamp, None, None)
+                            for timestamp in timestamps[start:start + 50]])
+    main.insert_accidents([(dog_id, "pee", now - rng.randint(0, 20 * 24 * HOUR), "hall", None) for _ in range(10)])
+
+    # Cutoffs on and off hour and day boundaries
+    for cutoff in (now - 7 * 24 * HOUR, now - 7 * 24 * HOUR - 1234, (now - 3 * 24 * HOUR) // 86400 * 86400, 0):
+        stats = main.window_stats(dog_id, cutoff)
+        for event_type in ("pee", "poo"):
+            assert stats[event_type] == raw_stats(dog_id, event_type, cutoff), (cutoff, event_type)
+
+
+def test_rebuild_matches_incremental_rollups(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - n * 5000, None, None) for n in range(0, 200, 3)])
+    main.insert_events([(dog_id, "pee", now - n * 5000, None, None) for n in range(1, 200, 3)])
+
+    def rollups():
+        with main.get_db() as conn:
+            return {table: [tuple(row) for row in conn.execute(
+                f"SELECT * FROM {table} WHERE dog_id = ? ORDER BY event_type, bucket", (dog_id,))]
+                for table, _ in main.ROLLUP_TABLES}
+
+    incremental = rollups()
+    with main.get_db() as conn:
+        main._rebuild_rollups(conn.cursor())
+        conn.commit()
+    assert rollups() == incremental
@@ -0,0 +1,49 @@
+"""Pre-encoded responses: byte parity with the generic JSON encoding"""
+import json
+import time
+
+import main
+
+DEVICES = [None, "collar", 'quote " and \\ backslash', "tab\tnewline\n", "hünd \U0001f415", "\x01"]
+
+
+def generic(key, rows, columns, next_cursor):
+    """The dict payload the routes returned before rows were encoded directly"""
+    items = [dict(zip(columns, row[:len(columns)])) for row in rows]
+    payload = {key: items, "count": len(items), "next_cursor": next_cursor}
+    assert main.json_bytes(payload) == main._stdlib_json_bytes(payload)
+    return main.json_bytes(payload)
+
+
+def test_status_template_matches_json_dumps(dog_id):
+    main.interval_stats.load(dog_id)
+    main.insert_events([(dog_id, "pee", int(time.time()) - 5000, None, None)])
+    main.interval_stats.record(dog_id, "pee", int(time.time()) - 5000)
+    status = main.build_led_status(dog_id)
+    assert main.encode_status(status) == json.dumps(status.model_dump(), separators=(",", ":")).encode()
+
+
+def test_history_page_matches_generic_encoding(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee" if n % 2 else "poo", now - n * 3600, device, n if device else None)
+                        for n, device in enumerate(DEVICES)])
+    rows, next_cursor = main.fetch_events(dog_id, None, 0, 4)
+    assert next_cursor is not None
+    assert [row[2] for row in rows] == [main.epoch_to_iso(row[7]) for row in rows]
+    assert main.encode_page("events", main.encode_events(rows), next_cursor) == \
+        generic("events", rows, main.EVENT_COLUMNS, next_cursor)
+
+    rows, next_cursor = main.fetch_events(dog_id, None, 0, 100, main.decode_cursor(next_cursor))
+    assert len(rows) == 2 and next_cursor is None
+    assert main.encode_page("events", main.encode_events(rows), None) == \
+        generic("events", rows, main.EVENT_COLUMNS, None)
+
+
+def test_accident_page_matches_generic_encoding(dog_id):
+    now = int(time.time())
+    main.insert_accidents([(dog_id, "pee", now - n * 3600, device or "kitchen", device) for n, device in enumerate(DEVICES)])
+    rows, _ = main.fetch_accidents(dog_id, 0)
+    assert len(rows) == len(DEVICES)
+    assert [row[2] for row in rows] == [main.epoch_to_iso(row[7]) for row in rows]
+    assert main.encode_page("accidents", main.encode_accidents(rows), None) == \
+        generic("accidents", rows, main.ACCIDENT_COLUMNS, None)
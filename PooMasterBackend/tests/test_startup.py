@@ -0,0 +1,26 @@
+"""Cold start: main.py's own import time stays within the budget benchmarks/startup.py enforces"""
+import json
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR, WORKDIR
+
+IMPORT_BUDGET_MS = 60.0
+
+
+def import_main_ms():
+    """Import main.py in a fresh interpreter with its dependencies already loaded, in milliseconds"""
+    env = dict(os.environ, LOG_FILE=os.path.join(WORKDIR, "startup.log"))
+    output = subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "startup.py"), "--child", "import"],
+                            env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])["main"]
+
+
+def test_import_time_within_budget():
+    # The budget is for a deployed server, which has main.py's bytecode cached
+    py_compile.compile(os.path.join(BACKEND_DIR, "main.py"), doraise=True)
+    median = statistics.median(import_main_ms() for _ in range(3))
+    assert median < IMPORT_BUDGET_MS, f"importing main.py took {median:.1f}ms"
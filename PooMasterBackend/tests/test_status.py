@@ -0,0 +1,96 @@
+"""Status snapshots: conditional requests and change notification"""
+import asyncio
+import threading
+import time
+
+from starlette.requests import Request
+
+import main
+from conftest import checkout_threads
+
+
+def conditional(header, value):
+    return Request({"type": "http", "method": "GET", "headers": [(header.encode(), value.encode())]})
+
+
+def test_change_within_the_same_second_is_not_reported_unmodified(dog_id):
+    main.interval_stats.load(dog_id)
+    first = main.status_cache.get(dog_id)
+    if_modified_since = conditional("if-modified-since", first.headers["Last-Modified"])
+    assert first.is_not_modified(if_modified_since)
+
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now, None, None)])
+    main.interval_stats.record(dog_id, "pee", now)
+    main.status_cache.invalidate(dog_id)
+    second = main.status_cache.get(dog_id)
+
+    assert second.body != first.body
+    assert not second.is_not_modified(if_modified_since)
+    assert second.is_not_modified(conditional("if-none-match", second.etag))
+    assert not second.is_not_modified(conditional("if-none-match", first.etag))
+
+
+def test_notify_for_an_evicted_dog_loads_it_off_the_loop(dog_id):
+    now = int(time.time())
+    main.insert_events([(dog_id, "pee", now - 7200, None, None)])
+
+    async def run():
+        main.status_broadcaster.start()
+        await main.ensure_dog_loaded(dog_id)
+        since = main.status_broadcaster.version(dog_id)
+        waiter = asyncio.ensure_future(main.status_broadcaster.wait_for_change(dog_id, since, 5.0))
+        await asyncio.sleep(0.01)
+
+        # Pushed out of the LRU while a long-poll client is parked on it
+        main.interval_stats.evict(dog_id)
+        main.status_cache.invalidate(dog_id)
+        main.insert_events([(dog_id, "pee", now - 60, None, None)])
+        with checkout_threads() as threads:
+            main.status_broadcaster.notify(dog_id)
+            version = await asyncio.wait_for(waiter, 2.0)
+
+        assert version != since
+        assert threads, "the evicted dog should have been read back"
+        assert threading.get_ident() not in threads
+        assert main.interval_stats.is_loaded(dog_id)
+
+    asyncio.run(run())
+
+
+def test_cache_serves_hits_until_invalidated(dog_id):
+    cache = main.StatusSnapshotCache(ttl=60.0, capacity=1)
+    main.interval_stats.load(dog_id)
+    first = cache.get(dog_id)
+    assert cache.get(dog_id) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Rebuilt after invalidation; the same content keeps its validators
+    cache.invalidate(dog_id)
+    rebuilt = cache.get(dog_id)
+    assert rebuilt is not first
+    assert (rebuilt.etag, rebuilt.last_modified) == (first.etag, first.last_modified)
+
+    # Capacity 1: another dog pushes this one out
+    cache.get(main.DEFAULT_DOG_ID)
+    cache.get(dog_id)
+    assert cache.misses == 4
+
+
+def test_subscribers_get_the_new_snapshot_when_an_event_is_logged(dog_id):
+    async def run():
+        main.status_broadcaster.start()
+        await main.ensure_dog_loaded(dog_id)
+        async with main.status_broadcaster.subscribe(dog_id) as subscriber:
+            before = main.status_cache.get(dog_id)
+            await main.store_events([(dog_id, "pee", int(time.time()) - 60, None, None)])
+            snapshot = await asyncio.wait_for(subscriber.get(), 2.0)
+            assert main.status_broadcaster.subscriber_count == 1
+        assert main.status_broadcaster.subscriber_count == 0
+        return before, snapshot
+
+    before, snapshot = asyncio.run(run())
+    assert snapshot.etag != before.etag
+    assert snapshot.status.pee_time_since < 0.1
+    event = main.format_sse(snapshot)
+    assert event.startswith(b"event: status\n") and event.endswith(b"\ndata: " + snapshot.body + b"\n\n")
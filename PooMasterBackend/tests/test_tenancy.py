@@ -0,0 +1,37 @@
+"""Households and dogs: every read and write is scoped to one dog"""
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def test_dogs_do_not_see_each_others_history():
+    household = main.insert_household("tenancy")
+    dogs = [main.insert_dog(name, household["id"]) for name in ("rex", "fido")]
+    for dog in dogs:
+        main.dog_registry.add(dog["id"], dog["household_id"])
+    assert main.insert_dog("stray", 10 ** 9) is None
+
+    now = int(time.time())
+    main.insert_events([(dogs[0]["id"], "pee", now - 3600, None, None), (dogs[0]["id"], "pee", now - 60, None, None)])
+    main.insert_accidents([(dogs[1]["id"], "poo", now - 600, "hall", None)])
+
+    events, _ = main.fetch_events(dogs[0]["id"], None, 0, 10)
+    assert [row[6] for row in events] == [dogs[0]["id"]] * 2
+    assert main.fetch_events(dogs[1]["id"], None, 0, 10)[0] == []
+    assert main.fetch_accidents(dogs[0]["id"], 0)[0] == []
+    assert [row[6] for row in main.fetch_accidents(dogs[1]["id"], 0)[0]] == [dogs[1]["id"]]
+    assert main.interval_stats.snapshot(dogs[1]["id"], "pee")[0] is None
+
+    assert [dog["id"] for dog in main.fetch_dogs(household["id"])] == [dog["id"] for dog in dogs]
+    assert main.dog_registry.ids(household["id"]) == [dog["id"] for dog in dogs]
+
+
+def test_unknown_dog_is_rejected():
+    main.dog_registry.load()
+    assert main.resolve_dog_id(None) == main.DEFAULT_DOG_ID
+    with pytest.raises(HTTPException) as error:
+        main.resolve_dog_id(10 ** 9)
+    assert error.value.status_code == 404
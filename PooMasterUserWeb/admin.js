@@ -44,6 +44,7 @@ let intervalChart = null;
 
 // Data cache
 let historyData = [];
+let seriesData = null;
 
 // Initialize API Configuration
 async function initializeAPI() {
@@ -149,6 +150,7 @@ async function loadAllData() {
     
     await Promise.all([
         loadAnalytics(days),
+        loadSeries(days),
         loadHistory(days),
         loadAccidents(days)
     ]);
@@ -203,7 +205,10 @@ async function loadHistory(days) {
         historyData = data.events;
         
         renderHistoryTable();
-        updateCharts();
+        if (!apiConfig.endpoints.analytics_series) {
+            // Older servers: build the charts from the raw rows
+            updateCharts();
+        }
         
     } catch (error) {
         console.error('Error loading history:', error);
@@ -211,6 +216,24 @@ async function loadHistory(days) {
     }
 }
 
+// Load precomputed chart series
+async function loadSeries(days) {
+    if (!apiConfig.initialized || !apiConfig.endpoints.analytics_series) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE_URL}${apiConfig.endpoints.analytics_series}?days=${days}`);
+        if (!response.ok) throw new Error('Failed to fetch analytics series');
+        
+        seriesData = await response.json();
+        updateCharts();
+        
+    } catch (error) {
+        console.error('Error loading analytics series:', error);
+    }
+}
+
 // Render history table
 function renderHistoryTable() {
     if (historyData.length === 0) {
@@ -323,19 +346,27 @@ function updateTimelineChart() {
     const ctx = document.getElementById('timeline-chart');
     
     // Prepare data - count events by day
-    const eventsByDay = {};
-    
-    historyData.forEach(event => {
-        const date = new Date(event.timestamp).toLocaleDateString();
-        if (!eventsByDay[date]) {
-            eventsByDay[date] = { pee: 0, poo: 0 };
-        }
-        eventsByDay[date][event.event_type]++;
-    });
-    
-    const dates = Object.keys(eventsByDay).sort();
-    const peeData = dates.map(date => eventsByDay[date].pee);
-    const pooData = dates.map(date => eventsByDay[date].poo);
+    let dates, peeData, pooData;
+    
+    if (seriesData) {
+        dates = seriesData.days.map(day => new Date(`${day}T00:00:00`).toLocaleDateString());
+        peeData = seriesData.pee.daily.count;
+        pooData = seriesData.poo.daily.count;
+    } else {
+        const eventsByDay = {};
+        
+        historyData.forEach(event => {
+            const date = new Date(event.timestamp).toLocaleDateString();
+            if (!eventsByDay[date]) {
+                eventsByDay[date] = { pee: 0, poo: 0 };
+            }
+            eventsByDay[date][event.event_type]++;
+        });
+        
+        dates = Object.keys(eventsByDay).sort();
+        peeData = dates.map(date => eventsByDay[date].pee);
+        pooData = dates.map(date => eventsByDay[date].poo);
+    }
     
     if (timelineChart) {
         timelineChart.destroy();
@@ -383,10 +414,8 @@ function updateTimelineChart() {
     });
 }
 
-// Update interval chart
-function updateIntervalChart() {
-    const ctx = document.getElementById('interval-chart');
-    
+// Average intervals computed from the raw history rows
+function averageIntervalsFromHistory() {
     // Calculate intervals
     const peeEvents = historyData.filter(e => e.event_type === 'pee').sort((a, b) => 
         new Date(a.timestamp) - new Date(b.timestamp)
@@ -411,6 +440,22 @@ function updateIntervalChart() {
     const peeAvg = peeIntervals.length > 0 ? peeIntervals.reduce((a, b) => a + b) / peeIntervals.length : 0;
     const pooAvg = pooIntervals.length > 0 ? pooIntervals.reduce((a, b) => a + b) / pooIntervals.length : 0;
     
+    return [peeAvg, pooAvg];
+}
+
+// Update interval chart
+function updateIntervalChart() {
+    const ctx = document.getElementById('interval-chart');
+    
+    let peeAvg, pooAvg;
+    
+    if (seriesData) {
+        peeAvg = seriesData.pee.interval_average_hours || 0;
+        pooAvg = seriesData.poo.interval_average_hours || 0;
+    } else {
+        [peeAvg, pooAvg] = averageIntervalsFromHistory();
+    }
+    
     if (intervalChart) {
         intervalChart.destroy();
     }